@@ -0,0 +1,194 @@
+"""
+按 (n, v) 索引的本地资源仓库和404缓存喵~
+下载器先查仓库，命中就直接硬链接到本次运行的目录，未命中才去CDN下载，
+下载完成后再放入仓库。仓库总大小超过上限时按最近使用时间淘汰喵~
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "assets")
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3  # 20GB
+DEFAULT_NEGATIVE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "missing.json")
+DEFAULT_NEGATIVE_TTL = 7 * 24 * 3600  # 7天
+
+
+def link_or_copy(src: str, dst: str) -> bool:
+    """优先硬链接，跨盘等情况退回复制，返回是否建立了硬链接喵~"""
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copy2(src, dst)
+        return False
+
+
+class AssetStore:
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """初始化资源仓库喵~"""
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS assets ("
+            " n TEXT NOT NULL, v TEXT NOT NULL, size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL, PRIMARY KEY (n, v))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS assets_last_used ON assets (last_used)")
+        self._db.commit()
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM assets").fetchone()[0]
+
+    def object_path(self, n: str, v: str) -> str:
+        """资源在仓库中的存放路径喵~"""
+        digest = hashlib.sha1(f"{n}\0{v}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, "objects", digest[:2], digest + ".swf")
+
+    def link_into(self, n: str, v: str, dst: str) -> bool:
+        """仓库命中时把资源链接到 dst 并返回 True 喵~
+
+        查到记录之后、链接之前文件可能正好被别的线程淘汰，这时按未命中处理，由调用方正常下载喵~
+        """
+        path = self.object_path(n, v)
+        with self._lock:
+            row = self._db.execute("SELECT size FROM assets WHERE n = ? AND v = ?", (n, v)).fetchone()
+            if row is None or not os.path.exists(path):
+                self.misses += 1
+                return False
+            self._db.execute("UPDATE assets SET last_used = ? WHERE n = ? AND v = ?", (time.time(), n, v))
+            self._db.commit()
+            self.hits += 1
+        try:
+            link_or_copy(path, dst)
+        except FileNotFoundError:
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+            logging.debug(f"仓库中的 {n} ({v}) 刚被淘汰，改为重新下载喵~")
+            return False
+        return True
+
+    def put(self, n: str, v: str, src: str):
+        """把刚下载的文件放入仓库喵~"""
+        if not v:
+            return
+        path = self.object_path(n, v)
+        try:
+            link_or_copy(src, path)
+        except OSError as e:
+            logging.warning(f"写入资源仓库失败: {n} ({v}) -> {e} 喵~")
+            return
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self._db.execute("SELECT size FROM assets WHERE n = ? AND v = ?", (n, v)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO assets (n, v, size, last_used) VALUES (?, ?, ?, ?)",
+                (n, v, size, time.time()),
+            )
+            self._db.commit()
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到低于上限的90%(调用方已持有锁)喵~"""
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for n, v, size in self._db.execute("SELECT n, v, size FROM assets ORDER BY last_used").fetchall():
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(self.object_path(n, v))
+            except FileNotFoundError:
+                pass
+            self._db.execute("DELETE FROM assets WHERE n = ? AND v = ?", (n, v))
+            self.total_bytes -= size
+            removed += 1
+        self._db.commit()
+        logging.info(f"资源仓库淘汰了 {removed} 个文件，当前大小 {self.total_bytes / 1024 ** 2:.1f}MB 喵~")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class NegativeCache:
+    def __init__(self, path: str = DEFAULT_NEGATIVE_CACHE, ttl: float = DEFAULT_NEGATIVE_TTL,
+                 force_recheck: Optional[bool] = None):
+        """记录CDN上返回404的 (n, v)，TTL内不再请求喵~
+
+        force_recheck 为 True 时忽略已有记录(仍会记录本次的404)，
+        未指定时读取环境变量 AOLA_RECHECK_MISSING 喵~
+        """
+        self.path = path
+        self.ttl = ttl
+        if force_recheck is None:
+            force_recheck = os.environ.get("AOLA_RECHECK_MISSING", "") not in ("", "0")
+        self.force_recheck = force_recheck
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取404缓存失败，将重新建立: {e} 喵~")
+
+    @staticmethod
+    def _key(n: str, v: str) -> str:
+        return f"{n}\t{v}"
+
+    def is_missing(self, n: str, v: str) -> bool:
+        """TTL内确认过404则返回 True 喵~"""
+        if self.force_recheck:
+            return False
+        with self._lock:
+            checked_at = self._entries.get(self._key(n, v))
+            if checked_at is None or time.time() - checked_at > self.ttl:
+                return False
+            self.skipped += 1
+        return True
+
+    def add(self, n: str, v: str):
+        with self._lock:
+            self._entries[self._key(n, v)] = time.time()
+            self._dirty = True
+
+    def discard(self, n: str, v: str):
+        with self._lock:
+            if self._entries.pop(self._key(n, v), None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """写回磁盘，顺便清掉过期记录喵~"""
+        with self._lock:
+            now = time.time()
+            expired = [k for k, t in self._entries.items() if now - t > self.ttl]
+            for key in expired:
+                del self._entries[key]
+            if not self._dirty and not expired:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
@@ -1,34 +1,125 @@
 import os
 import time
+import json
 import logging
+import argparse
+import threading
+from functools import cached_property
+from queue import Queue
 from typing import Optional
-import psutil
-from tqdm import tqdm
 
 # 导入其他脚本
-from 自动提取版本xml import VersionMonitor
-from 对比xml import load_xml, compare_xml, write_new_xml
-from 根据版本xml下载对应swf import SwfDownloader
-from ffdec_export import FFDecExporter
+# psutil(resource_sampler)、版本监控、下载和导出模块会间接导入 requests/tqdm 等较重的依赖，在用到时才导入，保证启动速度
+from asset_store import AssetStore, NegativeCache
+from content_index import ContentIndex
+from file_index import FileIndex
+from log_setup import setup_logging
+from metrics import LIVE, RunMetrics
+from origins import OriginPool
+from output_archive import OUTPUT_MODES, ArchiveWriter
+from pipeline import build_extract_pipeline
+from profiling import profiling_enabled
+import process_pool
+import sprite_profiles
+from swf_catalog import SwfCatalog
 
 
 
 
 class AutoExtractor:
-    def __init__(self):
-        """初始化自动提取器喵~"""
+    def __init__(self, cache_dir: Optional[str] = None):
+        """初始化自动提取器；cache_dir 为资源仓库、标签目录和索引所在目录，默认是程序目录下的 cache 喵~"""
         self.setup_logging()
         self.ffdec_path = ""
+        self.ffdec_command = None  # 传给 FFDecExporter，None 表示 java -jar ffdec_path
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.output_dir = os.path.join(self.base_dir, "output")
+        # 资源仓库、标签目录、索引和资源采样器在第一次用到时才打开/启动，见下面的 cached_property
+        self.cache_dir = cache_dir or os.path.join(self.base_dir, "cache")
+        self.origin_pool = OriginPool()
+        self.sprite_profile = sprite_profiles.get_profile(sprite_profiles.DEFAULT_PROFILE)  # sprite 的导出格式
+        self.output_mode = "files"  # archive 时每个版本的导出结果打包进 diff_<旧>_<新>/exported.zip
+        self.poll_interval = 5
+        self.pipeline = None  # 正在运行的流水线，用于取消
+        self.metrics_port = None  # 设置后在本地提供实时指标接口
+        self.metrics_server = None
+        self.profile = profiling_enabled()  # 按阶段 cProfile 剖析(AOLA_PROFILE=1 或 --profile)
         self.setup_system_info()
+        self.register_live_gauges()
+
+    @cached_property
+    def asset_store(self) -> AssetStore:
+        return AssetStore(os.path.join(self.cache_dir, "assets"))
+
+    @cached_property
+    def negative_cache(self) -> NegativeCache:
+        return NegativeCache(os.path.join(self.cache_dir, "missing.json"))
+
+    @cached_property
+    def swf_catalog(self) -> SwfCatalog:
+        """SWF 标签目录：导出时的 sprite/脚本筛选直接查询，不再每个文件 dump 两次喵~"""
+        return SwfCatalog(os.path.join(self.cache_dir, "swf_catalog.db"))
+
+    @cached_property
+    def file_index(self) -> FileIndex:
+        """导出文件的文件名索引，提取工具按文件名查找时不用再遍历输出目录喵~"""
+        return FileIndex(os.path.join(self.cache_dir, "file_index.db"))
+
+    @cached_property
+    def content_index(self) -> ContentIndex:
+        """导出脚本的内容索引，每个版本导出完成后收录新写出的脚本喵~"""
+        return ContentIndex(os.path.join(self.cache_dir, "content_index.db"))
+
+    @cached_property
+    def resource_sampler(self):
+        """后台资源采样，驱动下载池和导出池在阶段内实时伸缩；由 close 停止喵~"""
+        from resource_sampler import ResourceSampler
+        return ResourceSampler().start()
+
+    def close(self):
+        """停止资源采样和共用进程池的子进程，关闭打开过的仓库和索引；没用到的不会为了关闭而创建喵~"""
+        sampler = self.__dict__.pop("resource_sampler", None)
+        if sampler is not None:
+            sampler.stop()
+        process_pool.shutdown_pool()
+        for name in ("asset_store", "swf_catalog", "file_index", "content_index"):
+            db = self.__dict__.pop(name, None)
+            if db is not None:
+                db.close()
+
+    def register_live_gauges(self):
+        """把缓存命中率和系统负载注册到实时指标；对应的对象创建之前读数为 0 喵~"""
+        def reading(name: str, attr: str):
+            # cached_property 创建后才出现在实例字典里，读指标不会触发创建
+            return lambda: getattr(self.__dict__.get(name), attr, 0)
+
+        hits, misses = reading("asset_store", "hits"), reading("asset_store", "misses")
+        LIVE.gauge("asset_store_hits", hits)
+        LIVE.gauge("asset_store_misses", misses)
+        LIVE.gauge("asset_store_hit_ratio", lambda: hits() / max(1, hits() + misses()))
+        LIVE.gauge("negative_cache_skipped", reading("negative_cache", "skipped"))
+        LIVE.gauge("cpu_percent", reading("resource_sampler", "cpu_percent"))
+        LIVE.gauge("memory_percent", reading("resource_sampler", "memory_percent"))
+
+    def start_metrics_server(self):
+        """按 metrics_port 启动本地指标接口喵~"""
+        if self.metrics_port is None or self.metrics_server is not None:
+            return
+        from metrics_server import MetricsServer
+        try:
+            self.metrics_server = MetricsServer(self.metrics_port).start()
+        except OSError as e:
+            logging.error(f"指标接口启动失败(端口 {self.metrics_port}): {e} 喵~")
 
     def setup_system_info(self):
         """设置系统信息和优化线程配置喵~"""
+        import psutil
+        from resource_sampler import probe_cpu_percent
+
         # 获取CPU信息
         self.cpu_count = psutil.cpu_count(logical=True)
         self.physical_cores = psutil.cpu_count(logical=False)
-        self.cpu_percent = psutil.cpu_percent(interval=1)
+        self.cpu_percent = probe_cpu_percent()
         
         # 获取内存信息
         memory = psutil.virtual_memory()
@@ -57,18 +148,7 @@ class AutoExtractor:
 
     def setup_logging(self):
         """设置日志喵~"""
-        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"auto_extract_{time.strftime('%Y%m%d_%H%M%S')}.log")
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        setup_logging("auto_extract")
 
     def get_user_input(self):
         """获取用户输入喵~"""
@@ -81,7 +161,7 @@ class AutoExtractor:
         
         print("\n=== 自动提取配置 ===")
         # 设置默认值
-        default_ffdec = "D:/ffdec_22.0.1/ffdec.jar"
+        default_ffdec = self.ffdec_path or "D:/ffdec_22.0.1/ffdec.jar"
         self.ffdec_path = input(f"请输入FFDec.jar的路径 (默认: {default_ffdec}): ").strip() or default_ffdec
         self.output_dir = input(f"请输入输出目录路径 (默认: {self.output_dir}): ").strip() or self.output_dir
         
@@ -97,22 +177,43 @@ class AutoExtractor:
         except ValueError:
             logging.warning(f"输入的线程数无效，使用建议值 {self.max_workers} 喵~")
 
-    def monitor_system_resources(self):
-        """监控系统资源使用情况喵~"""
-        cpu_percent = psutil.cpu_percent()
-        memory_percent = psutil.virtual_memory().percent
-        
-        if cpu_percent > 90 or memory_percent > 90:
-            logging.warning(f"系统资源使用率过高！CPU: {cpu_percent}%, 内存: {memory_percent}% 喵~")
-            return False
-        return True
+    def apply_config(self, config: dict):
+        """应用配置文件和命令行参数喵~"""
+        if config.get("ffdec_path"):
+            self.ffdec_path = config["ffdec_path"]
+        if config.get("output_dir"):
+            self.output_dir = config["output_dir"]
+        if config.get("workers"):
+            self.max_workers = int(config["workers"])
+        if config.get("poll_interval"):
+            self.poll_interval = float(config["poll_interval"])
+        if config.get("origins"):
+            self.origin_pool = OriginPool(config["origins"])
+        if "recheck_missing" in config:
+            self.negative_cache.force_recheck = bool(config["recheck_missing"])
+        if config.get("profile"):
+            self.profile = True
+        if config.get("metrics_port") is not None:
+            self.metrics_port = int(config["metrics_port"])
+        if config.get("sprite_profile"):
+            self.sprite_profile = sprite_profiles.get_profile(config["sprite_profile"])
+        if config.get("output_mode"):
+            if config["output_mode"] not in OUTPUT_MODES:
+                raise ValueError(f"未知的输出方式 {config['output_mode']}，可选: {', '.join(OUTPUT_MODES)}")
+            self.output_mode = config["output_mode"]
+
+    def process_version_xmls(self, current_version: str, new_version: str,
+                             current_xml: Optional[str] = None, new_xml: Optional[str] = None) -> Optional[str]:
+        """处理版本XML文件并生成差异文件喵~
+
+        未指定XML路径时，从 version_current/version_new 目录中查找最新的XML喵~
+        """
+        from 对比xml import load_xml, compare_xml, write_new_xml
 
-    def process_version_xmls(self, current_version: str, new_version: str) -> Optional[str]:
-        """处理版本XML文件并生成差异文件喵~"""
         try:
             # 获取当前版本和新版本的XML文件路径
-            current_xml = self.find_latest_xml(os.path.join(self.base_dir, "version_current", "binary"))
-            new_xml = self.find_latest_xml(os.path.join(self.base_dir, "version_new", "binary"))
+            current_xml = current_xml or self.find_latest_xml(os.path.join(self.base_dir, "version_current", "binary"))
+            new_xml = new_xml or self.find_latest_xml(os.path.join(self.base_dir, "version_new", "binary"))
             
             if not current_xml or not new_xml:
                 logging.error("未找到XML文件喵~")
@@ -126,7 +227,7 @@ class AutoExtractor:
             # 加载XML文件
             old_root = load_xml(current_xml)
             new_root = load_xml(new_xml)
-            if not old_root or not new_root:
+            if old_root is None or new_root is None:
                 logging.error("XML文件加载失败喵~")
                 return None
 
@@ -158,40 +259,106 @@ class AutoExtractor:
             logging.error(f"查找XML文件时出错: {str(e)} 喵~")
             return None
 
-    def process_version(self, current_version: str, new_version: str) -> bool:
-        """处理版本更新喵~"""
-        try:
-            # 1. 生成差异XML文件
-            diff_xml = self.process_version_xmls(current_version, new_version)
-            if not diff_xml:
-                return False
+    def select_files(self, downloader, job: tuple) -> list:
+        """流水线的差异阶段：生成差异XML，返回需要下载的文件喵~"""
+        diff_xml = self.process_version_xmls(*job)
+        if not diff_xml:
+            return []
+        downloader.load(diff_xml)
+        return downloader.pending_urls()
 
-            # 2. 创建下载目录
-            swf_dir = os.path.join(self.output_dir, f"diff_{current_version}_{new_version}", "swf")
-            os.makedirs(swf_dir, exist_ok=True)
+    def process_version(self, current_version: str, new_version: str,
+                        current_xml: Optional[str] = None, new_xml: Optional[str] = None) -> bool:
+        """处理版本更新喵~
 
-            # 3. 根据差异文件下载SWF
-            downloader = SwfDownloader(diff_xml, swf_dir)
-            if not self.monitor_system_resources():
-                self.max_workers = max(self.physical_cores, self.max_workers // 2)
-                logging.info(f"由于系统负载高，调整线程数为: {self.max_workers} 喵~")
-            successful, failed = downloader.download_all(max_workers=self.max_workers)
-            logging.info(f"SWF下载完成 - 成功: {successful}, 失败: {failed} 喵~")
+        差异 → 下载 → 导出 → 后处理 作为一条流水线运行，各阶段同时进行，
+        每个SWF落盘后立即进入导出阶段，阶段之间的有界队列提供背压喵~
+        """
+        from tqdm import tqdm
+        from 根据版本xml下载对应swf import SwfDownloader
+        from ffdec_export import FFDecExporter
+        from profiling import StageProfiler
+        from resource_sampler import DownloadAutoscaler
 
-            if successful == 0:
-                logging.error("没有成功下载任何SWF文件喵~")
-                return False
+        try:
+            diff_dir = os.path.join(self.output_dir, f"diff_{current_version}_{new_version}")
+            swf_dir = os.path.join(diff_dir, "swf")
+            os.makedirs(swf_dir, exist_ok=True)
 
-            # 4. 使用FFDec导出
             exporter = FFDecExporter()
             exporter.ffdec_path = self.ffdec_path
+            exporter.ffdec_command = self.ffdec_command
+            exporter.catalog = self.swf_catalog
+            exporter.file_index = self.file_index
+            exporter.content_index = self.content_index
+            exporter.sprite_profile = self.sprite_profile
             exporter.target_dir = swf_dir
-            exporter.output_dir = os.path.join(self.output_dir, f"diff_{current_version}_{new_version}", "exported")
+            exporter.output_dir = os.path.join(diff_dir, "exported")
             exporter.max_workers = self.max_workers
-            if not self.monitor_system_resources():
-                exporter.max_workers = max(self.physical_cores, self.max_workers // 2)
-                logging.info(f"由于系统负载高，调整FFDec线程数为: {exporter.max_workers} 喵~")
-            exporter.process_files()
+            exporter.resource_sampler = self.resource_sampler
+            os.makedirs(exporter.output_dir, exist_ok=True)
+            if self.output_mode == "archive":
+                exporter.archive = ArchiveWriter(exporter.output_dir + ".zip")
+            exporter.begin_file_index()
+            exporter.begin_content_index()
+
+            # 下载清单由差异阶段生成后再载入
+            downloader = SwfDownloader(None, swf_dir, asset_store=self.asset_store,
+                                       negative_cache=self.negative_cache, origin_pool=self.origin_pool)
+            downloader.reset_controls(self.max_workers)
+            download_scaler = DownloadAutoscaler(lambda: downloader.concurrency)
+            self.resource_sampler.add_listener(download_scaler)
+
+            name = f"{current_version}->{new_version}"
+            metrics = RunMetrics(name)
+            profiler = StageProfiler(os.path.join(diff_dir, "profile")) if self.profile else None
+            try:
+                with exporter.autoscaling() as export_workers, \
+                        tqdm(desc="导出进度", unit="文件") as exporter.pbar:
+                    self.pipeline = build_extract_pipeline(
+                        name, downloader, exporter, export_workers,
+                        select=lambda job: self.select_files(downloader, job),
+                        metrics=metrics, profiler=profiler)
+                    self.pipeline.run([(current_version, new_version, current_xml, new_xml)])
+                    self.pipeline.log_summary()
+                    successful = self.pipeline.stage("download").emitted
+
+                    # 非404的失败项再走一遍 下载 → 导出 → 后处理
+                    retry_urls = [] if self.pipeline.cancelled else downloader.retry_candidates()
+                    if retry_urls:
+                        logging.info(f"重试 {len(retry_urls)} 个下载失败的文件喵~")
+                        self.pipeline = build_extract_pipeline(f"{name} 重试", downloader, exporter, export_workers,
+                                                               metrics=metrics, profiler=profiler)
+                        self.pipeline.run(retry_urls)
+                        self.pipeline.log_summary()
+                        successful += self.pipeline.stage("download").emitted
+                    cancelled = self.pipeline.cancelled
+            finally:
+                self.pipeline = None
+                self.resource_sampler.remove_listener(download_scaler)
+                self.negative_cache.save()
+                # 每个版本一份运行报告，便于分析时间花在了哪个阶段
+                metrics.log_summary()
+                metrics.write(diff_dir)
+                exporter.log_export_summary()
+                if exporter.archive:
+                    exporter.archive.close()
+                exporter.update_content_index()
+                exporter.update_file_index()
+                if profiler:
+                    profiler.write()
+
+            if not downloader.swf_urls:
+                return False
+            logging.info(f"SWF下载完成 - 成功: {successful}, 失败: {len(downloader.failed_downloads)} 喵~")
+            downloader.save_error_log()
+
+            if cancelled:
+                logging.warning(f"版本 {name} 的处理已取消喵~")
+                return False
+            if successful == 0:
+                logging.error("没有成功下载任何SWF文件喵~")
+                return False
 
             return True
 
@@ -201,11 +368,13 @@ class AutoExtractor:
 
     def run(self):
         """运行自动提取喵~"""
+        from 自动提取版本xml import VersionMonitor
+
         try:
             self.get_user_input()
             
             # 创建版本监控器
-            monitor = VersionMonitor()
+            monitor = VersionMonitor(origin_pool=self.origin_pool)
             
             while True:
                 print("\n等待版本更新...")
@@ -235,9 +404,104 @@ class AutoExtractor:
         except Exception as e:
             logging.error(f"程序执行出错: {str(e)} 喵~")
 
+    def run_daemon(self):
+        """服务模式: 不需要任何输入，持续监控，检测到的版本排队依次处理喵~
+
+        版本监控在主线程中一直运行，处理在后台线程中进行，
+        处理某个版本期间发布的新版本会排队，不会错过喵~
+        """
+        from 自动提取版本xml import VersionMonitor
+
+        if not os.path.isfile(self.ffdec_path):
+            logging.warning(f"找不到FFDec工具：{self.ffdec_path}，导出阶段将会失败喵~")
+        logging.info(f"服务模式启动 - 输出目录: {self.output_dir}, 线程数: {self.max_workers} 喵~")
+
+        jobs = Queue()
+        stop_event = threading.Event()
+        worker = threading.Thread(target=self.daemon_worker, args=(jobs, stop_event), name="version-worker", daemon=True)
+        worker.start()
+
+        monitor = VersionMonitor(origin_pool=self.origin_pool)
+        monitor.ffdec_path = self.ffdec_path
+        LIVE.gauge("version_polls", lambda: monitor.poll_requests)
+        LIVE.gauge("version_polls_not_modified", lambda: monitor.not_modified)
+        LIVE.gauge("version_jobs_queued", jobs.qsize)
+
+        def enqueue(current_version, new_version, current_xml, new_xml):
+            jobs.put((current_version, new_version, current_xml, new_xml))
+            logging.info(f"版本 {current_version} -> {new_version} 已加入处理队列 (排队: {jobs.qsize()}) 喵~")
+
+        try:
+            monitor.watch(enqueue, interval=self.poll_interval, stop_event=stop_event)
+        except KeyboardInterrupt:
+            logging.info("收到停止信号，取消当前任务喵~")
+            if self.pipeline:
+                self.pipeline.cancel()
+        finally:
+            stop_event.set()
+            jobs.put(None)
+            worker.join()
+
+    def daemon_worker(self, jobs: Queue, stop_event: Optional[threading.Event] = None):
+        """服务模式的处理线程，停止后排队中的版本不再处理喵~"""
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            current_version, new_version, current_xml, new_xml = job
+            if stop_event is not None and stop_event.is_set():
+                logging.info(f"已停止，跳过排队中的版本 {current_version} -> {new_version} 喵~")
+                continue
+            start_time = time.time()
+            if self.process_version(current_version, new_version, current_xml, new_xml):
+                logging.info(f"版本 {current_version} -> {new_version} 处理完成，耗时 {time.time() - start_time:.2f}秒 喵~")
+            else:
+                logging.error(f"版本 {current_version} -> {new_version} 处理失败，耗时 {time.time() - start_time:.2f}秒 喵~")
+
+
+def load_config(path: str) -> dict:
+    """读取JSON配置文件喵~"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="奥拉星资源自动提取工具")
+    parser.add_argument("--daemon", action="store_true", help="服务模式: 不交互，持续监控并处理所有更新")
+    parser.add_argument("--config", help="JSON配置文件路径 (参见 config.example.json)")
+    parser.add_argument("--ffdec", dest="ffdec_path", help="FFDec.jar的路径")
+    parser.add_argument("--output", dest="output_dir", help="输出目录路径")
+    parser.add_argument("--workers", type=int, help="线程数")
+    parser.add_argument("--interval", dest="poll_interval", type=float, help="发布窗口内的最短轮询间隔(秒)")
+    parser.add_argument("--metrics-port", dest="metrics_port", type=int,
+                        help="在 127.0.0.1 的该端口提供 Prometheus/JSON 实时指标 (/metrics, /metrics.json)")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="按阶段用 cProfile 剖析，结果写入 diff_<旧>_<新>/profile (等同 AOLA_PROFILE=1)")
+    parser.add_argument("--recheck-missing", dest="recheck_missing", action="store_true", default=None,
+                        help="忽略404缓存，重新检查之前不存在的文件")
+    parser.add_argument("--output-mode", dest="output_mode", choices=OUTPUT_MODES,
+                        help="files(默认): 导出结果保留为文件; archive: 每个版本打包进 exported.zip")
+    parser.add_argument("--sprite-profile", dest="sprite_profile", choices=list(sprite_profiles.PROFILES),
+                        help="sprite 的导出格式: gif(默认)、png、png8、sheet、avi")
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    config = load_config(args.config) if args.config else {}
+    config.update({k: v for k, v in vars(args).items() if v is not None and k not in ("daemon", "config")})
+    daemon = args.daemon or config.get("daemon", False)
+
     extractor = AutoExtractor()
-    extractor.run()
+    try:
+        extractor.apply_config(config)
+        extractor.start_metrics_server()
+        if daemon:
+            extractor.run_daemon()
+        else:
+            extractor.run()
+    finally:
+        extractor.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,23 +1,24 @@
 import os
 import time
 import logging
+from functools import cached_property
 from typing import List, Dict
-import psutil
-from tqdm import tqdm
 import re
 from datetime import datetime
-import tempfile
-import json
-import shutil
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
 import xml.etree.ElementTree as ET
 
 # 导入其他脚本
-from 自动提取版本xml import VersionMonitor
+# psutil、版本监控、下载和导出模块会间接导入 requests/tqdm 等较重的依赖，在用到时才导入，保证启动速度
+from asset_store import AssetStore, NegativeCache
+from content_index import ContentIndex
+from file_index import FileIndex
+from log_setup import setup_logging
+from metrics import RunMetrics
+from origins import OriginPool
+import process_pool
+from pipeline import build_extract_pipeline
+from swf_catalog import SwfCatalog
 from 对比xml import load_xml, compare_xml, write_new_xml
-from 根据版本xml下载对应swf import SwfDownloader
-from ffdec_export import FFDecExporter
 
 class AutoExtractor:
     def __init__(self):
@@ -32,8 +33,44 @@ class AutoExtractor:
         # 添加日期过滤变量
         self.start_date = ""
         self.end_date = ""
-        # 添加版本监视器
-        self.version_monitor = VersionMonitor()
+        # 版本监视器、资源仓库、标签目录和索引在第一次用到时才创建，见下面的 cached_property
+        # 多源站故障切换与对冲请求
+        self.origin_pool = OriginPool()
+
+    @cached_property
+    def version_monitor(self):
+        """版本监视器喵~"""
+        from 自动提取版本xml import VersionMonitor
+        return VersionMonitor()
+
+    @cached_property
+    def asset_store(self) -> AssetStore:
+        """按(n, v)索引的资源仓库，避免重复下载喵~"""
+        return AssetStore()
+
+    @cached_property
+    def negative_cache(self) -> NegativeCache:
+        return NegativeCache()
+
+    @cached_property
+    def swf_catalog(self) -> SwfCatalog:
+        return SwfCatalog()
+
+    @cached_property
+    def file_index(self) -> FileIndex:
+        return FileIndex()
+
+    @cached_property
+    def content_index(self) -> ContentIndex:
+        return ContentIndex()
+
+    def close(self):
+        """停止共用进程池的子进程，关闭打开过的仓库和索引；没用到的不会为了关闭而创建喵~"""
+        process_pool.shutdown_pool()
+        for name in ("asset_store", "swf_catalog", "file_index", "content_index"):
+            db = self.__dict__.pop(name, None)
+            if db is not None:
+                db.close()
 
     @staticmethod
     def parse_version_date(version_str):
@@ -76,10 +113,13 @@ class AutoExtractor:
 
     def setup_system_info(self):
         """设置系统信息和优化线程配置喵~"""
+        import psutil
+        from resource_sampler import probe_cpu_percent
+
         # 获取CPU信息
         self.cpu_count = psutil.cpu_count(logical=True)
         self.physical_cores = psutil.cpu_count(logical=False)
-        self.cpu_percent = psutil.cpu_percent(interval=1)
+        self.cpu_percent = probe_cpu_percent()
         
         # 获取内存信息
         memory = psutil.virtual_memory()
@@ -108,18 +148,7 @@ class AutoExtractor:
 
     def setup_logging(self):
         """设置日志喵~"""
-        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"auto_extract_{time.strftime('%Y%m%d_%H%M%S')}.log")
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        setup_logging("auto_extract")
 
     def get_user_input(self):
         """获取用户输入喵~"""
@@ -274,6 +303,8 @@ class AutoExtractor:
 
     def monitor_system_resources(self):
         """监控系统资源使用情况喵~"""
+        import psutil
+
         cpu_percent = psutil.cpu_percent()
         memory_percent = psutil.virtual_memory().percent
         
@@ -283,24 +314,90 @@ class AutoExtractor:
         return True
 
     def process_version(self):
-        """处理版本XML和下载对应SWF喵~"""
+        """处理版本XML和下载对应SWF喵~
+
+        筛选/对比 → 下载 → 导出 → 后处理 作为一条流水线运行，各阶段同时进行喵~
+        """
+        from tqdm import tqdm
+        from 根据版本xml下载对应swf import SwfDownloader
+        from ffdec_export import FFDecExporter
+
         try:
-            if self.old_xml_path == os.path.join(self.output_dir, "empty.xml"):
-                # 自动模式：直接处理新XML文件中符合时间范围的内容
-                return self.process_single_xml(self.new_xml_path)
-            else:
-                # 手动模式：对比两个XML文件
-                return self.process_compare_xml()
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            swf_dir = os.path.join(self.output_dir, "swf_files", timestamp)
+            os.makedirs(swf_dir, exist_ok=True)
+
+            exporter = FFDecExporter()
+            exporter.ffdec_path = self.ffdec_path
+            exporter.target_dir = swf_dir
+            exporter.output_dir = os.path.join(self.output_dir, "extracted_swf")
+            exporter.max_workers = self.max_workers
+            exporter.catalog = self.swf_catalog
+            exporter.file_index = self.file_index
+            exporter.content_index = self.content_index
+            os.makedirs(exporter.output_dir, exist_ok=True)
+            exporter.begin_file_index()
+            exporter.begin_content_index()
+
+            downloader = SwfDownloader(None, swf_dir, asset_store=self.asset_store,
+                                       negative_cache=self.negative_cache, origin_pool=self.origin_pool)
+            downloader.reset_controls(self.max_workers)
+            metrics = RunMetrics(f"extract_{timestamp}")
+
+            try:
+                with exporter.autoscaling() as export_workers, \
+                        tqdm(desc="导出进度", unit="文件") as exporter.pbar:
+                    pipeline = build_extract_pipeline(
+                        "extract", downloader, exporter, export_workers,
+                        select=lambda job: self.select_files(downloader, timestamp), metrics=metrics)
+                    pipeline.run([(self.old_xml_path, self.new_xml_path)])
+                    pipeline.log_summary()
+                    successful = pipeline.stage("download").emitted
+
+                    retry_urls = [] if pipeline.cancelled else downloader.retry_candidates()
+                    if retry_urls:
+                        logging.info(f"重试 {len(retry_urls)} 个下载失败的文件喵~")
+                        pipeline = build_extract_pipeline("extract 重试", downloader, exporter, export_workers,
+                                                          metrics=metrics)
+                        pipeline.run(retry_urls)
+                        pipeline.log_summary()
+                        successful += pipeline.stage("download").emitted
+            finally:
+                self.negative_cache.save()
+                metrics.log_summary()
+                metrics.write(self.output_dir, f"run_report_{timestamp}")
+                exporter.log_export_summary()
+                exporter.update_content_index()
+                exporter.update_file_index()
+
+            if not downloader.swf_urls:
+                logging.warning("没有SWF文件需要下载喵~")
+                return downloader.xml_path is not None
+            logging.info(f"SWF文件下载完成! 成功: {successful}, 失败: {len(downloader.failed_downloads)}")
+            downloader.save_error_log()
+            logging.info(f"SWF文件处理完成! 文件已导出到: {exporter.output_dir}")
+            return True
         except Exception as e:
             logging.error(f"处理版本时出错: {str(e)} 喵~")
             return False
 
+    def select_files(self, downloader, timestamp: str) -> list:
+        """流水线的第一阶段：生成结果XML(自动模式按时间筛选，手动模式对比两个XML)，返回需要下载的文件喵~"""
+        if self.old_xml_path == os.path.join(self.output_dir, "empty.xml"):
+            result_xml_path = self.process_single_xml(self.new_xml_path, timestamp)
+        else:
+            result_xml_path = self.process_compare_xml(timestamp)
+        if not result_xml_path:
+            return []
+        downloader.load(result_xml_path)
+        return downloader.pending_urls()
+
     def get_thread_count(self):
         """获取最佳线程数喵~"""
         return self.max_workers
 
-    def process_single_xml(self, xml_path):
-        """处理单个XML文件喵~"""
+    def process_single_xml(self, xml_path, timestamp):
+        """从单个XML中筛选符合时间范围的条目，返回结果XML路径喵~"""
         try:
             logging.info(f"加载XML文件: {xml_path}")
             tree = ET.parse(xml_path)
@@ -356,7 +453,6 @@ class AutoExtractor:
             logging.info(f"创建了新的XML树，包含 {valid_elements_count} 个元素")
             
             # 保存结果XML
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             result_xml_path = os.path.join(self.output_dir, f"result_{timestamp}.xml")
             
             # 创建输出目录（如果不存在）
@@ -366,121 +462,15 @@ class AutoExtractor:
             tree = ET.ElementTree(new_root)
             tree.write(result_xml_path, encoding="utf-8", xml_declaration=True)
             logging.info(f"已保存结果XML到文件: {result_xml_path}")
-            
-            # 下载SWF文件
-            swf_dir = os.path.join(self.output_dir, "swf_files", timestamp)
-            os.makedirs(swf_dir, exist_ok=True)
-            
-            logging.info(f"开始从XML下载SWF文件: {result_xml_path}")
-            
-            # 直接使用我们自己的下载方法
-            self.download_swf_files(result_xml_path, swf_dir)
-            
-            # 检查是否有下载的SWF文件
-            swf_files = []
-            for root, dirs, files in os.walk(swf_dir):
-                for file in files:
-                    if file.lower().endswith('.swf'):
-                        swf_files.append(os.path.join(root, file))
-            
-            if swf_files:
-                logging.info(f"找到 {len(swf_files)} 个已下载的SWF文件")
-                # 处理下载的SWF文件
-                self.process_swf_files(swf_dir)
-            else:
-                logging.warning("没有找到已下载的SWF文件，跳过处理步骤")
-            
-            return True
+            return result_xml_path
         except Exception as e:
             logging.error(f"处理XML文件失败: {str(e)}")
             import traceback
             logging.error(traceback.format_exc())
-            return False
-
-    def download_swf_files(self, xml_path, output_dir):
-        """从XML文件下载SWF文件"""
-        try:
-            # 解析XML文件
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            
-            # 收集需要下载的文件
-            files_to_download = []
-            for elem in root.findall(".//f"):
-                if 'n' in elem.attrib and 'v' in elem.attrib:
-                    path = elem.get('n')
-                    version = elem.get('v')
-                    
-                    # 构建URL和本地路径
-                    url = f"https://aola.100bt.com/play/{path}.swf"
-                    local_dir = os.path.join(output_dir, os.path.dirname(path))
-                    local_path = os.path.join(output_dir, f"{path}.swf")
-                    
-                    # 创建目录
-                    os.makedirs(local_dir, exist_ok=True)
-                    
-                    files_to_download.append((url, local_path, version))
-            
-            if not files_to_download:
-                logging.warning("没有找到需要下载的文件")
-                return
-            
-            logging.info(f"找到 {len(files_to_download)} 个文件需要下载")
-            
-            # 使用线程池下载文件
-            successful = 0
-            failed = 0
-            
-            with tqdm(total=len(files_to_download), desc="下载进度") as pbar:
-                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    future_to_url = {
-                        executor.submit(self._download_file, url, local_path): (url, local_path, version)
-                        for url, local_path, version in files_to_download
-                    }
-                    
-                    for future in as_completed(future_to_url):
-                        url, local_path, version = future_to_url[future]
-                        try:
-                            result = future.result()
-                            if result:
-                                successful += 1
-                            else:
-                                failed += 1
-                        except Exception as e:
-                            logging.error(f"下载文件时出错: {url} -> {str(e)}")
-                            failed += 1
-                        finally:
-                            pbar.update(1)
-            
-            logging.info(f"SWF文件下载完成! 成功: {successful}, 失败: {failed}")
-            
-        except Exception as e:
-            logging.error(f"下载SWF文件时出错: {str(e)}")
-            import traceback
-            logging.error(traceback.format_exc())
-
-    def _download_file(self, url, local_path):
-        """下载单个文件"""
-        try:
-            # 创建目录（如果不存在）
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            
-            # 下载文件
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            return True
-        except Exception as e:
-            logging.error(f"下载文件失败: {url} -> {str(e)}")
-            return False
+            return None
 
-    def process_compare_xml(self):
-        """对比两个XML文件喵~（手动模式）"""
+    def process_compare_xml(self, timestamp):
+        """对比两个XML文件，返回新增条目的结果XML路径喵~（手动模式）"""
         try:
             # 加载XML文件
             old_data = load_xml(self.old_xml_path)
@@ -489,147 +479,34 @@ class AutoExtractor:
             # 使用is not None代替布尔检查
             if old_data is None or new_data is None:
                 logging.error("XML加载失败喵~")
-                return False
+                return None
             
             logging.info("XML加载成功，开始对比...")
             
-            # 对比XML文件
-            added_items, modified_items = compare_xml(old_data, new_data)
+            # 对比XML文件(新XML中独有的条目)
+            different_elements = compare_xml(old_data, new_data)
             
             # 应用时间段过滤
             if self.start_date or self.end_date:
                 logging.info(f"应用时间过滤: {self.start_date or '不限'} 到 {self.end_date or '不限'}")
-                
-                filtered_added = []
-                for item in added_items:
-                    if self.is_version_in_timerange(item.get('v')):
-                        filtered_added.append(item)
-                        
-                filtered_modified = []
-                for old_item, new_item in modified_items:
-                    if self.is_version_in_timerange(new_item.get('v')):
-                        filtered_modified.append((old_item, new_item))
-                        
-                logging.info(f"过滤前: {len(added_items)} 个新增项, {len(modified_items)} 个修改项")
-                logging.info(f"过滤后: {len(filtered_added)} 个新增项, {len(filtered_modified)} 个修改项")
-                
-                added_items = filtered_added
-                modified_items = filtered_modified
-            
-            # 创建输出目录
-            os.makedirs(self.output_dir, exist_ok=True)
+                filtered = [elem for elem in different_elements if self.is_version_in_timerange(elem.get('v'))]
+                logging.info(f"过滤前: {len(different_elements)} 个新增项, 过滤后: {len(filtered)} 个新增项")
+                different_elements = filtered
+
+            if not different_elements:
+                logging.info("未发现任何差异喵~")
+                return None
             
             # 生成新的XML文件
-            result_xml_path = os.path.join(self.output_dir, "result.xml")
-            write_new_xml(added_items, modified_items, result_xml_path)
-            
-            # 创建SWF下载目录 - 使用临时目录避免权限问题
-            # 创建唯一的临时目录路径
-            temp_base = os.path.join(tempfile.gettempdir(), "swf_downloader_" + str(int(time.time())))
-            swf_dir = os.path.join(temp_base, "swf")
-            
-            # 确保目录不存在，然后创建它
-            if os.path.exists(swf_dir):
-                try:
-                    shutil.rmtree(swf_dir)  # 递归删除目录及其内容
-                except Exception as e:
-                    logging.warning(f"无法删除已存在的目录: {e}")
-                    # 使用备用名称
-                    swf_dir = os.path.join(temp_base + "_alt", "swf")
-            
-            try:
-                os.makedirs(swf_dir, exist_ok=True)
-                # 确保目录存在且可写
-                test_file = os.path.join(swf_dir, "test.txt")
-                with open(test_file, 'w') as f:
-                    f.write("测试写入权限")
-                os.remove(test_file)  # 删除测试文件
-                logging.info(f"成功创建临时下载目录: {swf_dir}")
-            except Exception as e:
-                logging.error(f"无法创建或写入下载目录: {e}")
-                # 最后尝试使用用户主目录
-                swf_dir = os.path.join(os.path.expanduser("~"), "swf_download_" + str(int(time.time())))
-                os.makedirs(swf_dir, exist_ok=True)
-                logging.info(f"使用备用下载目录: {swf_dir}")
-            
-            try:
-                # 下载SWF文件
-                # 最终修复：根据错误信息推断，构造函数用于配置，download_all用于执行
-                swf_downloader = SwfDownloader(swf_dir, self.get_thread_count())
-                swf_files = swf_downloader.download_all(result_xml_path)
-                
-                if not swf_files:
-                    logging.warning("没有SWF文件需要下载喵~")
-                    return True
-                    
-                # 创建FFDecExporter并设置属性
-                exporter = FFDecExporter()
-                exporter.ffdec_path = self.ffdec_path
-                exporter.target_dir = swf_dir  # 设置下载好的SWF所在目录
-                exporter.output_dir = os.path.join(self.output_dir, "ffdec_output")  # 设置输出目录
-                exporter.max_workers = self.max_workers  # 设置线程数
-                
-                # 调用process_files方法处理所有文件
-                logging.info("开始处理SWF文件...")
-                exporter.process_files()
-                
-                logging.info("SWF文件处理完成 喵~")
-                return True
-            
-            except Exception as e:
-                logging.error(f"SWF处理出错: {str(e)}")
-                # 即使SWF处理失败，也返回True，因为XML处理已经成功
-                return True
+            os.makedirs(self.output_dir, exist_ok=True)
+            result_xml_path = os.path.join(self.output_dir, f"result_{timestamp}.xml")
+            write_new_xml(different_elements, result_xml_path)
+            logging.info(f"已保存结果XML到文件: {result_xml_path}")
+            return result_xml_path
             
         except Exception as e:
             logging.error(f"对比XML文件时出错: {str(e)} 喵~")
-            return False
-
-    def process_swf_files(self, swf_dir):
-        """处理下载的SWF文件喵~"""
-        logging.info(f"开始处理下载的SWF文件...")
-        
-        # 检查目录是否存在
-        if not os.path.exists(swf_dir) or not os.path.isdir(swf_dir):
-            logging.error(f"SWF目录不存在或不是一个目录: {swf_dir}")
-            return False
-        
-        # 检查是否有SWF文件
-        swf_files = []
-        for root, _, files in os.walk(swf_dir):
-            for file in files:
-                if file.lower().endswith('.swf'):
-                    swf_files.append(os.path.join(root, file))
-        
-        if not swf_files:
-            logging.warning("没有找到SWF文件进行处理喵~")
-            return True
-        
-        logging.info(f"找到 {len(swf_files)} 个SWF文件需要处理")
-        
-        # 创建导出目录 - 也放在output文件夹下
-        export_dir = os.path.join(self.output_dir, "extracted_swf")
-        os.makedirs(export_dir, exist_ok=True)
-        
-        # 创建FFDec导出器
-        exporter = FFDecExporter()
-        
-        # 设置FFDec路径
-        exporter.ffdec_path = self.ffdec_path
-        
-        # 设置目标目录和输出目录
-        exporter.target_dir = swf_dir
-        exporter.output_dir = export_dir
-        
-        # 使用我们的线程数设置
-        exporter.max_workers = self.max_workers
-        
-        # 处理文件
-        exporter.process_files()
-        
-        logging.info(f"SWF文件处理完成! 文件已导出到: {export_dir}")
-        
-        return True
+            return None
 
     def run(self):
         """运行程序喵~"""
@@ -657,98 +534,12 @@ class AutoExtractor:
         except Exception as e:
             logging.error(f"程序执行出错: {str(e)} 喵~")
 
-class SwfDownloader:
-    """下载SWF文件的类喵~"""
-    
-    def __init__(self, xml_path, output_dir):
-        """初始化下载器喵~"""
-        self.xml_path = xml_path
-        self.output_dir = output_dir
-        # 确保输出目录存在
-        os.makedirs(self.output_dir, exist_ok=True)
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        self.base_url = "http://res.mmo.qq.com/swf/"
-        self.failed_files = []
-    
-    def download_all(self, max_workers=8):
-        """下载XML中所有的SWF文件喵~
-        
-        Args:
-            xml_path: XML文件路径
-            
-        Returns:
-            下载的SWF文件列表
-        """
-        try:
-            # 解析XML文件
-            tree = ET.parse(self.xml_path)
-            root = tree.getroot()
-            
-            # 提取所有需要下载的文件
-            files_to_download = []
-            for item in root.findall('.//f'):
-                url = item.get('u', '')
-                if url and url.endswith('.swf'):
-                    files_to_download.append(url)
-            
-            if not files_to_download:
-                print("没有找到需要下载的文件")
-                return []
-            
-            # 下载文件
-            downloaded_files = []
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-                for url in files_to_download:
-                    future = executor.submit(self.download_file, url)
-                    futures.append(future)
-                
-                for future in as_completed(futures):
-                    result = future.result()
-                    if result:
-                        downloaded_files.append(result)
-            
-            return downloaded_files
-            
-        except Exception as e:
-            print(f"解析XML文件出错: {str(e)}")
-            return []
-    
-    def download_file(self, url):
-        """下载单个SWF文件喵~
-        
-        Args:
-            url: SWF文件URL
-            
-        Returns:
-            下载的文件路径，如果下载失败则返回None
-        """
-        try:
-            # 提取文件名
-            filename = os.path.basename(url)
-            output_path = os.path.join(self.output_dir, filename)
-            
-            # 下载文件
-            response = self.session.get(url, stream=True)
-            response.raise_for_status()
-            
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            return output_path
-            
-        except Exception as e:
-            logging.error(f"下载文件 {url} 失败: {str(e)}")
-            return None
-
 def main():
     extractor = AutoExtractor()
-    extractor.run()
+    try:
+        extractor.run()
+    finally:
+        extractor.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+端到端基准测试喵~
+在本机启动假 CDN(benchmarks/fake_cdn.py)，用假 FFDec(benchmarks/fake_ffdec.py)替代 java，
+分别驱动两个场景，记录吞吐(文件/秒)和峰值内存：
+  process_version  AutoExtractor.process_version：差异 → 下载 → 导出 → 后处理 整条流水线
+  process_files    FFDecExporter.process_files：只导出本地已有的 SWF
+
+每个 (场景, 文件数) 在独立的子进程中运行，避免缓存、导入和内存峰值互相影响。
+
+    python benchmarks/bench_pipeline.py [--sizes 100 1000 10000] [--latency-ms 20]
+        [--bandwidth 1000000] [--error-rate 0.01] [--missing-rate 0.01]
+        [--startup-ms 300] [--work-ms 50] [--skew 40] [--json result.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKE_FFDEC = os.path.join(BENCH_DIR, "fake_ffdec.py")
+
+SCENARIOS = ("process_version", "process_files")
+
+
+class PeakMemory:
+    def __init__(self, interval: float = 0.05):
+        """后台采样本进程和子进程(假 FFDec)的常驻内存，记录峰值喵~"""
+        import psutil
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_total_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="peak-memory", daemon=True)
+
+    def _run(self):
+        import psutil
+        while not self._stop.is_set():
+            try:
+                rss = self.process.memory_info().rss
+                total = rss
+                for child in self.process.children(recursive=True):
+                    try:
+                        total += child.memory_info().rss
+                    except psutil.Error:
+                        pass
+                self.peak_rss = max(self.peak_rss, rss)
+                self.peak_total_rss = max(self.peak_total_rss, total)
+            except psutil.Error:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def write_version_xml(path: str, size: int):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<root>\n")
+        for i in range(size):
+            f.write(f'  <f n="bench/module{i % 50}/file{i}" v="1"/>\n')
+        f.write("</root>\n")
+
+
+def count_exported(output_dir: str) -> int:
+    """输出目录按SWF相对路径分层，含 sprites/scripts 子目录的就是一个导出完成的SWF喵~"""
+    exported = set()
+    for root, dirs, _ in os.walk(output_dir):
+        if "sprites" in dirs or "scripts" in dirs:
+            exported.add(root)
+    return len(exported)
+
+
+def run_process_version(size: int, cdn_url: str, workdir: str) -> dict:
+    from auto_extract_all import AutoExtractor
+    from origins import OriginPool
+
+    old_xml = os.path.join(workdir, "old.xml")
+    new_xml = os.path.join(workdir, "new.xml")
+    write_version_xml(old_xml, 0)
+    write_version_xml(new_xml, size)
+
+    # 资源仓库、标签目录和文件名/内容索引都放在临时目录，不碰正式的 cache
+    extractor = AutoExtractor(cache_dir=os.path.join(workdir, "cache"))
+    extractor.output_dir = os.path.join(workdir, "output")
+    extractor.origin_pool = OriginPool([cdn_url])
+    extractor.ffdec_command = [sys.executable, FAKE_FFDEC]
+
+    start = time.perf_counter()
+    ok = extractor.process_version("old", "new", old_xml, new_xml)
+    elapsed = time.perf_counter() - start
+    exported = count_exported(os.path.join(extractor.output_dir, "diff_old_new", "exported"))
+    extractor.close()
+    return {"ok": ok, "seconds": elapsed, "exported": exported}
+
+
+def run_process_files(size: int, workdir: str, skew: int = 0) -> dict:
+    from fake_cdn import build_swf, synthetic_swf
+    from ffdec_export import FFDecExporter
+
+    target_dir = os.path.join(workdir, "swf")
+    for i in range(size):
+        relative = f"bench/module{i % 50}/file{i}.swf"
+        path = os.path.join(target_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            if skew:
+                # 每 50 个文件里有一个含 skew 个 sprite 的大文件，其余只有 1 个
+                f.write(build_swf(skew if i % 50 == 49 else 1))
+            else:
+                f.write(synthetic_swf("/play/" + relative, 1024))
+
+    exporter = FFDecExporter()
+    exporter.ffdec_command = [sys.executable, FAKE_FFDEC]
+    exporter.target_dir = target_dir
+    exporter.output_dir = os.path.join(workdir, "exported")
+    os.makedirs(exporter.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    exporter.process_files()
+    elapsed = time.perf_counter() - start
+    return {"ok": True, "seconds": elapsed, "exported": count_exported(exporter.output_dir)}
+
+
+def child(args):
+    """子进程入口：运行一个场景，最后一行输出JSON结果喵~"""
+    sys.path.insert(0, REPO_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    with tempfile.TemporaryDirectory() as workdir, PeakMemory() as memory:
+        if args.scenario == "process_version":
+            result = run_process_version(args.size, args.cdn_url, workdir)
+        else:
+            result = run_process_files(args.size, workdir, args.skew)
+    result.update({
+        "scenario": args.scenario,
+        "files": args.size,
+        "files_per_second": args.size / result["seconds"] if result["seconds"] else 0.0,
+        "peak_rss_mb": memory.peak_rss / 1024 / 1024,
+        "peak_total_rss_mb": memory.peak_total_rss / 1024 / 1024,
+    })
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def run_child(scenario: str, size: int, cdn_url: str, env: dict, skew: int = 0) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--scenario", scenario,
+           "--size", str(size), "--cdn-url", cdn_url, "--skew", str(skew)]
+    # 子进程的日志和进度条写到 stderr，这里丢弃，只取 stdout 最后一行的结果
+    completed = subprocess.run(cmd, cwd=REPO_DIR, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace")
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"{scenario}/{size} 运行失败，退出码 {completed.returncode}")
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试(假 CDN + 假 FFDec)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="文件数，默认 100 1000 10000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--file-size", type=int, default=20 * 1024, help="每个合成SWF的字节数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="CDN每个请求的延迟")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="CDN每个连接的字节/秒，0 不限速")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="CDN随机返回503的比例")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="CDN固定返回404的路径比例")
+    parser.add_argument("--startup-ms", type=float, default=0.0, help="假FFDec每次调用的启动耗时")
+    parser.add_argument("--work-ms", type=float, default=0.0, help="假FFDec每次调用的工作耗时")
+    parser.add_argument("--skew", type=int, default=0,
+                        help="process_files 场景中每50个文件有一个含这么多 sprite 的大文件，0 表示不倾斜")
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cdn-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    from fake_cdn import FakeCdn
+
+    cdn = FakeCdn(file_size=args.file_size, latency_ms=args.latency_ms, bandwidth=args.bandwidth,
+                  error_rate=args.error_rate, missing_rate=args.missing_rate).start()
+    env = dict(os.environ, PYTHONPATH=REPO_DIR,
+               FAKE_FFDEC_STARTUP_MS=str(args.startup_ms), FAKE_FFDEC_WORK_MS=str(args.work_ms))
+    env.pop("AOLA_PROFILE", None)
+
+    results = []
+    print(f"{'场景':<18}{'文件数':>8}{'耗时(秒)':>10}{'文件/秒':>10}{'导出':>8}{'峰值RSS(MB)':>14}{'含子进程(MB)':>14}")
+    try:
+        for scenario in args.scenarios:
+            for size in args.sizes:
+                result = run_child(scenario, size, cdn.base_url, env, args.skew)
+                results.append(result)
+                print(f"{scenario:<18}{size:>8}{result['seconds']:>10.2f}{result['files_per_second']:>10.1f}"
+                      f"{result['exported']:>8}{result['peak_rss_mb']:>14.1f}{result['peak_total_rss_mb']:>14.1f}")
+    finally:
+        cdn.stop()
+
+    if args.json_path:
+        settings = {k: v for k, v in vars(args).items()
+                    if k not in ("json_path", "child", "scenario", "size", "cdn_url")}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+sprite 导出格式(profile)对比喵~
+用同一批SWF依次按每个 profile 导出 sprite，输出每个 sprite 平均的 FFDec 耗时、后处理耗时和体积，
+用来给不同的下游挑最省的格式。默认用假 FFDec 和合成的多帧 sprite，给出 --ffdec 和 --swf-dir
+时用真实的 FFDec 导出真实的SWF：
+
+    python benchmarks/bench_sprite_profiles.py [--profiles gif png png8 sheet avi]
+        [--files 20] [--frames 24] [--ffdec ffdec.jar --swf-dir <目录>] [--json result.json]
+
+需要 Pillow 的 profile(png8、sheet)在没有安装 Pillow 时跳过。
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKE_FFDEC = os.path.join(BENCH_DIR, "fake_ffdec.py")
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import process_pool  # noqa: E402
+import sprite_profiles  # noqa: E402
+
+
+def write_synthetic(target_dir: str, files: int, frames: int):
+    from fake_cdn import build_swf
+
+    for i in range(files):
+        path = os.path.join(target_dir, f"bench/file{i}.swf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(build_swf(2, frames=frames))
+
+
+def run_profile(profile: sprite_profiles.SpriteProfile, target_dir: str, workdir: str, ffdec_path: str = None) -> dict:
+    from ffdec_export import FFDecExporter
+
+    exporter = FFDecExporter()
+    if ffdec_path:
+        exporter.ffdec_path = ffdec_path
+    else:
+        exporter.ffdec_command = [sys.executable, FAKE_FFDEC]
+    exporter.sprite_profile = profile
+    exporter.target_dir = target_dir
+    exporter.output_dir = os.path.join(workdir, profile.name)
+    os.makedirs(exporter.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    exporter.process_files()
+    elapsed = time.perf_counter() - start
+    stats = exporter.profile_stats.get(profile.name, {"sprites": 0, "ffdec_seconds": 0.0,
+                                                      "post_seconds": 0.0, "bytes": 0})
+    count = max(1, stats["sprites"])
+    return {
+        "profile": profile.name,
+        "seconds": elapsed,
+        "sprites": stats["sprites"],
+        "ffdec_seconds_per_sprite": stats["ffdec_seconds"] / count,
+        "post_seconds_per_sprite": stats["post_seconds"] / count,
+        "bytes_per_sprite": stats["bytes"] / count,
+        "bytes": stats["bytes"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sprite 导出格式对比")
+    parser.add_argument("--profiles", nargs="+", choices=list(sprite_profiles.PROFILES),
+                        default=list(sprite_profiles.PROFILES))
+    parser.add_argument("--files", type=int, default=20, help="合成SWF的个数(每个含2个 sprite)")
+    parser.add_argument("--frames", type=int, default=24, help="合成 sprite 的帧数")
+    parser.add_argument("--ffdec", help="真实 ffdec.jar 的路径，不给时用假 FFDec")
+    parser.add_argument("--swf-dir", help="要导出的SWF目录，不给时使用合成的SWF")
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'格式':<8}{'sprite数':>10}{'总耗时(秒)':>12}{'FFDec(秒/个)':>14}{'后处理(秒/个)':>14}{'体积(KB/个)':>14}")
+    with tempfile.TemporaryDirectory() as workdir:
+        target_dir = args.swf_dir
+        if not target_dir:
+            target_dir = os.path.join(workdir, "swf")
+            write_synthetic(target_dir, args.files, args.frames)
+        for name in args.profiles:
+            try:
+                profile = sprite_profiles.get_profile(name)
+            except ValueError as e:
+                print(f"{name:<8}跳过: {e}")
+                continue
+            result = run_profile(profile, target_dir, workdir, args.ffdec)
+            results.append(result)
+            print(f"{name:<8}{result['sprites']:>10}{result['seconds']:>12.2f}"
+                  f"{result['ffdec_seconds_per_sprite']:>14.3f}{result['post_seconds_per_sprite']:>14.3f}"
+                  f"{result['bytes_per_sprite'] / 1024:>14.1f}")
+    process_pool.shutdown_pool()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "json_path"},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试喵~
+在全新的解释器里分别测量导入各个脚本、以及构造 AutoExtractor 的耗时，每项跑多次取中位数。
+
+    python benchmarks/bench_startup.py [--runs 10] [--json result.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("python 空启动", "pass"),
+    ("import 对比xml", "import 对比xml"),
+    ("import 根据版本xml下载对应swf", "import 根据版本xml下载对应swf"),
+    ("import 自动提取版本xml", "import 自动提取版本xml"),
+    ("import ffdec_export", "import ffdec_export"),
+    ("import auto_extract_all", "import auto_extract_all"),
+    ("AutoExtractor()", "import auto_extract_all as m; m.AutoExtractor()"),
+    ("import auto_extract_all_without_diff_xml", "import auto_extract_all_without_diff_xml"),
+    ("FFDecExporter().get_system_info()", "import ffdec_export as m; m.FFDecExporter().get_system_info()"),
+]
+
+
+def measure(code: str, runs: int, workdir: str) -> list:
+    """在新进程中执行 code，返回每次的耗时(秒)喵~"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="每项运行次数")
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # 预热一次，避免把 .pyc 编译时间算进去
+        measure("import auto_extract_all, ffdec_export", 1, workdir)
+        print(f"{'场景':<40}{'中位数(ms)':>12}{'最小(ms)':>12}")
+        for name, code in CASES:
+            timings = measure(code, args.runs, workdir)
+            results[name] = {
+                "median_ms": statistics.median(timings) * 1000,
+                "min_ms": min(timings) * 1000,
+                "runs": args.runs,
+            }
+            print(f"{name:<40}{results[name]['median_ms']:>12.1f}{results[name]['min_ms']:>12.1f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
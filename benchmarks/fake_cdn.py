@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+本地假 CDN，供基准测试使用喵~
+对 /play/<路径>.swf 返回内容确定的合成 SWF(同一路径每次内容相同)，可以配置：
+  latency_ms     每个请求响应前的延迟
+  bandwidth      每个连接的带宽(字节/秒)，0 表示不限速
+  error_rate     随机返回 503 的比例(每次请求独立，可重试成功)
+  missing_rate   固定返回 404 的路径比例(按路径哈希决定，重试也是 404)
+
+也可以单独运行：python benchmarks/fake_cdn.py --port 8765 --latency-ms 20
+"""
+
+import argparse
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _u30(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, value = value & 0x7F, value >> 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _tag(code: int, body: bytes) -> bytes:
+    return struct.pack("<HI", (code << 6) | 0x3F, len(body)) + body
+
+
+def abc_block(classes) -> bytes:
+    """只定义了若干个空类的最小 ABC，足够让标签扫描和假 FFDec 读出类名喵~"""
+    strings, namespaces, multinames = [], [], []
+    for full_name in classes:
+        package, _, name = full_name.rpartition(".")
+        for value in (package, name):
+            if value not in strings:
+                strings.append(value)
+        namespaces.append(strings.index(package) + 1)
+        multinames.append((len(namespaces), strings.index(name) + 1))
+    out = struct.pack("<HH", 16, 46) + _u30(0) + _u30(0) + _u30(0)
+    out += _u30(len(strings) + 1) + b"".join(_u30(len(v.encode())) + v.encode() for v in strings)
+    out += _u30(len(namespaces) + 1) + b"".join(b"\x16" + _u30(ns) for ns in namespaces)
+    out += _u30(0)
+    out += _u30(len(multinames) + 1) + b"".join(b"\x07" + _u30(ns) + _u30(n) for ns, n in multinames)
+    out += _u30(0) + _u30(0) + _u30(len(classes))
+    out += b"".join(_u30(i + 1) + _u30(0) + b"\x00" + _u30(0) + _u30(0) + _u30(0) for i in range(len(classes)))
+    out += b"".join(_u30(0) + _u30(0) for _ in classes)  # class_info
+    return out + _u30(0) + _u30(0)  # script_info, method_body_info
+
+
+def build_swf(sprites: int, classes=(), size: int = 0, sprite_len: int = 300, frames: int = 1) -> bytes:
+    """生成含 sprites 个 DefineSprite(各 frames 帧)和定义了 classes 的 DoABC 的 FWS 文件，用填充标签补到 size 字节喵~"""
+    body = bytes([0]) + struct.pack("<HH", 24 << 8, 1)  # 空 RECT、帧率、帧数
+    body += b"".join(_tag(39, struct.pack("<HH", i + 1, frames) + bytes(sprite_len - 4)) for i in range(sprites))
+    if classes:
+        body += _tag(82, struct.pack("<I", 1) + b"\x00" + abc_block(classes))
+    padding = size - (8 + len(body) + 6 + 2)
+    if padding > 0:
+        body += _tag(255, bytes(padding))
+    body += struct.pack("<H", 0)
+    return b"FWS" + bytes([10]) + struct.pack("<I", 8 + len(body)) + body
+
+
+def synthetic_swf(path: str, size: int) -> bytes:
+    """内容由路径决定的SWF：一个要导出的 sprite、一个 config 类，大小约为 size 字节喵~"""
+    name = f"Config{zlib.crc32(path.encode('utf-8')) % 100000}"
+    return build_swf(1, [f"com.aola.config.{name}", "com.aola.view.MainView"], size)
+
+
+def path_fraction(path: str) -> float:
+    """把路径稳定地映射到 [0, 1) 喵~"""
+    return (zlib.crc32(path.encode("utf-8")) & 0xFFFFFFFF) / 2 ** 32
+
+
+class FakeCdn:
+    def __init__(self, port: int = 0, file_size: int = 20 * 1024, latency_ms: float = 0.0,
+                 bandwidth: float = 0.0, error_rate: float = 0.0, missing_rate: float = 0.0,
+                 host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.file_size = file_size
+        self.latency = latency_ms / 1000
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/play/"
+
+    def _handler(self):
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with cdn._lock:
+                    cdn.requests += 1
+                if cdn.latency:
+                    time.sleep(cdn.latency)
+                path = self.path.split("?", 1)[0]
+                if not path.startswith("/play/") or not path.endswith(".swf"):
+                    self.send_error(404)
+                    return
+                if path_fraction(path) < cdn.missing_rate:
+                    self.send_error(404)
+                    return
+                if random.random() < cdn.error_rate:
+                    self.send_error(503)
+                    return
+                body = synthetic_swf(path, cdn.file_size)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-shockwave-flash")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                chunk = 16 * 1024
+                for offset in range(0, len(body), chunk):
+                    piece = body[offset:offset + chunk]
+                    self.wfile.write(piece)
+                    if cdn.bandwidth:
+                        time.sleep(len(piece) / cdn.bandwidth)
+                with cdn._lock:
+                    cdn.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeCdn":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fake-cdn", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地假 CDN")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--file-size", type=int, default=20 * 1024)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="每个连接的字节/秒，0 不限速")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--missing-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    cdn = FakeCdn(args.port, args.file_size, args.latency_ms, args.bandwidth,
+                  args.error_rate, args.missing_rate).start()
+    print(f"假 CDN 已启动: {cdn.base_url} (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        cdn.stop()
+
+
+if __name__ == "__main__":
+    main()
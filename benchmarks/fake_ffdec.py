@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+假的 FFDec 命令行，供基准测试替代 `java -jar ffdec.jar` 喵~
+支持 FFDecExporter 用到的几个命令，输出格式与真实 FFDec 一致：
+  -help / -dumpSWF <swf> / -dumpAS3 <swf> / -format ... -export <sprite|script> <输出目录> <swf>
+
+耗时通过环境变量配置(毫秒)：
+  FAKE_FFDEC_STARTUP_MS  每次调用的启动耗时(模拟 JVM + FFDec 加载)，默认 0
+  FAKE_FFDEC_WORK_MS     每次 dump/export 的工作耗时，默认 0
+  FAKE_FFDEC_SPRITES     无法解析标签的 SWF 中长度超过阈值的 sprite 数，默认 1
+  FAKE_FFDEC_SCRIPTS     无法解析标签的 SWF 中 config 类的数量，默认 1
+  FAKE_FFDEC_FRAME_SIZE  sprite:png 导出的每帧边长(像素)，默认 64
+能解析的 SWF 按文件里真实的 DefineSprite 标签和 DoABC 类名输出。
+导出 sprite 时按 -format 输出 1.gif、逐帧的 PNG(每两帧画面相同，帧数取 sprite 的帧数)或 1.avi。
+"""
+
+import os
+import struct
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import swf_tags  # noqa: E402
+
+
+def env_ms(name: str) -> float:
+    return float(os.environ.get(name, "0")) / 1000
+
+
+def option(args, flag):
+    return args[args.index(flag) + 1] if flag in args else None
+
+
+def png(size: int, seed: int) -> bytes:
+    """不依赖 Pillow 生成一张 RGBA PNG，seed 决定画面喵~"""
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+    rows = b"".join(b"\0" + bytes((x * 7 + y * 3 + seed * 40) % 256 for x in range(size) for _ in range(4))
+                    for y in range(size))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+def sprite_frames(data, chid: str) -> int:
+    if data is None:
+        return 4
+    for tag in swf_tags.iter_tags(data):
+        if tag.code == swf_tags.TAG_DEFINE_SPRITE and str(swf_tags.sprite_header(data, tag)[0]) == chid:
+            return max(1, swf_tags.sprite_header(data, tag)[1])
+    return 4
+
+
+def main(argv):
+    time.sleep(env_ms("FAKE_FFDEC_STARTUP_MS"))
+    if not argv or argv[0] == "-help":
+        print("Usage: ffdec [options] (fake)")
+        return 0
+
+    time.sleep(env_ms("FAKE_FFDEC_WORK_MS"))
+    sprites = int(os.environ.get("FAKE_FFDEC_SPRITES", "1"))
+    scripts = int(os.environ.get("FAKE_FFDEC_SCRIPTS", "1"))
+
+    try:
+        data = swf_tags.read_swf(argv[-1])
+        tags = list(swf_tags.iter_tags(data)) if data else None
+        classes = swf_tags.class_names(data) if data else None
+    except (OSError, ValueError, IndexError):
+        data = tags = classes = None
+
+    if argv[0] == "-dumpSWF":
+        if tags is not None:
+            for tag in tags:
+                if tag.code == swf_tags.TAG_DEFINE_SPRITE:
+                    chid, _ = swf_tags.sprite_header(data, tag)
+                    print(f"  DefineSprite (chid: {chid}) len= {tag.length}")
+        else:
+            for i in range(sprites):
+                print(f"  DefineSprite (chid: {i + 1}) len= {300 + i}")
+            print("  DefineSprite (chid: 900) len= 20")
+        return 0
+    if argv[0] == "-dumpAS3":
+        if classes is not None:
+            for name in classes:
+                print(f"{name} (script)")
+        else:
+            for i in range(scripts):
+                print(f"com.aola.config.Config{i} (script)")
+            print("com.aola.view.MainView (script)")
+        return 0
+    if "-export" in argv:
+        kind = option(argv, "-export")
+        output_dir = argv[argv.index("-export") + 2]
+        if kind == "sprite":
+            chid = option(argv, "-selectid")
+            target = os.path.join(output_dir, f"DefineSprite_{chid}")
+            os.makedirs(target, exist_ok=True)
+            fmt = option(argv, "-format") or "sprite:gif"
+            if fmt == "sprite:png":
+                size = int(os.environ.get("FAKE_FFDEC_FRAME_SIZE", "64"))
+                for frame in range(sprite_frames(data, chid)):
+                    with open(os.path.join(target, f"{frame + 1}.png"), "wb") as f:
+                        f.write(png(size, frame // 2))
+            else:
+                with open(os.path.join(target, "1.avi" if fmt == "sprite:avi" else "1.gif"), "wb") as f:
+                    f.write(b"RIFF" if fmt == "sprite:avi" else b"GIF89a")
+        else:
+            *package, name = option(argv, "-selectclass").split(".")
+            target = os.path.join(output_dir, *package)
+            os.makedirs(target, exist_ok=True)
+            with open(os.path.join(target, f"{name}.as"), "w", encoding="utf-8") as f:
+                f.write(f"package {'.'.join(package)} {{ public class {name} {{}} }}\n")
+        return 0
+
+    print(f"unknown command: {' '.join(argv)}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,212 @@
+"""
+下载阶段的并发与限速控制喵~
+  - ResizableSemaphore: 可以在运行中调整上限的信号量
+  - TokenBucket / HostRateLimiter: 按主机的令牌桶限速
+  - AimdController: 根据延迟、吞吐(goodput)和 429/5xx 错误率做加性增/乘性减的并发控制
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+class ResizableSemaphore:
+    def __init__(self, limit: int):
+        """可调整上限的信号量喵~"""
+        self._cond = threading.Condition()
+        self._limit = max(1, int(limit))
+        self._in_use = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def set_limit(self, limit: int):
+        """调整上限，调大时唤醒等待的线程喵~"""
+        with self._cond:
+            self._limit = max(1, int(limit))
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_use >= self._limit:
+                self._cond.wait()
+            self._in_use += 1
+
+    def release(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        """令牌桶: 每秒补充 rate 个令牌，最多积攒 burst 个喵~"""
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """取令牌，不够时阻塞等待喵~"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float = 50.0, burst: float = 20.0):
+        """每个主机一个令牌桶喵~"""
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url: str):
+        self.bucket(url).acquire()
+
+
+# 延迟基线每个窗口上浮的比例
+LATENCY_BASELINE_DRIFT = 1.05
+
+
+class AimdController:
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64,
+                 increase: int = 1, decrease: float = 0.5, window: float = 2.0,
+                 error_threshold: float = 0.05, gain_threshold: float = 0.05,
+                 latency_tolerance: float = 2.0):
+        """自适应并发控制器喵~
+
+        每个统计窗口结束时:
+          - 429/5xx/网络错误比例超过 error_threshold: 并发数乘以 decrease
+          - 成功请求的平均延迟超过基线的 latency_tolerance 倍(k，默认2): 视为请求开始排队，并发数乘以 decrease
+          - goodput 比历史最好值提升超过 gain_threshold 且并发已跑满: 并发数加 increase
+          - 否则视为平台期，保持不变(历史最好值缓慢衰减，以便之后重新试探)
+
+        延迟基线是历史上各窗口平均延迟的最小值，而不是单个请求的最小值，文件大小不一时也能比较；
+        基线每个窗口上浮 LATENCY_BASELINE_DRIFT，网络状况长期变慢后会逐渐接受新的延迟，不会一直压在最低并发喵~
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.error_threshold = error_threshold
+        self.gain_threshold = gain_threshold
+        self.latency_tolerance = latency_tolerance
+        self.gate = ResizableSemaphore(min(max(initial, self.min_limit), self.max_limit))
+        self._lock = threading.Lock()
+        self._best_goodput = 0.0
+        self._min_latency: Optional[float] = None
+        self._reset_window(time.monotonic())
+
+    @property
+    def limit(self) -> int:
+        return self.gate.limit
+
+    @property
+    def in_flight(self) -> int:
+        return self.gate.in_use
+
+    def set_ceiling(self, max_limit: int):
+        """调整并发上限(例如系统资源紧张时)，当前并发数超过新上限会立即降下来喵~"""
+        with self._lock:
+            self.max_limit = max(self.min_limit, int(max_limit))
+            if self.gate.limit > self.max_limit:
+                self.gate.set_limit(self.max_limit)
+
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._samples = 0
+        self._errors = 0
+        self._throttled = 0
+        self._ok_bytes = 0
+        self._ok_samples = 0
+        self._ok_latency_sum = 0.0
+        self._peak_in_use = self.gate.in_use
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发名额喵~"""
+        self.gate.acquire()
+        with self._lock:
+            self._peak_in_use = max(self._peak_in_use, self.gate.in_use)
+        try:
+            yield
+        finally:
+            self.gate.release()
+
+    def record(self, latency: float, nbytes: int, status: Optional[int]):
+        """记录一次请求结果，status 为 None 表示网络错误喵~"""
+        with self._lock:
+            self._samples += 1
+            if status is None or status >= 500:
+                self._errors += 1
+            elif status == 429:
+                self._throttled += 1
+            elif status < 400:
+                self._ok_bytes += nbytes
+                self._ok_samples += 1
+                self._ok_latency_sum += latency
+
+            now = time.monotonic()
+            if now - self._window_start >= self.window and self._samples >= self.gate.limit:
+                self._adjust(now)
+
+    def _adjust(self, now: float):
+        """窗口结束时调整并发数(调用方已持有锁)喵~"""
+        elapsed = max(now - self._window_start, 1e-6)
+        error_rate = (self._errors + self._throttled) / self._samples
+        goodput = self._ok_bytes / elapsed
+        mean_latency = self._ok_latency_sum / self._ok_samples if self._ok_samples else None
+        inflated = (mean_latency is not None and self._min_latency is not None
+                    and mean_latency > self.latency_tolerance * self._min_latency)
+        limit = self.gate.limit
+
+        if self._throttled or error_rate > self.error_threshold or inflated:
+            new_limit = max(self.min_limit, int(limit * self.decrease))
+            # 降级后重新测量基线
+            self._best_goodput = 0.0
+        elif goodput > self._best_goodput * (1 + self.gain_threshold):
+            self._best_goodput = goodput
+            saturated = self._peak_in_use >= limit
+            new_limit = min(self.max_limit, limit + self.increase) if saturated else limit
+        else:
+            self._best_goodput *= 0.9
+            new_limit = limit
+
+        if mean_latency is not None:
+            self._min_latency = (mean_latency if self._min_latency is None
+                                 else min(self._min_latency * LATENCY_BASELINE_DRIFT, mean_latency))
+        if new_limit != limit:
+            self.gate.set_limit(new_limit)
+        self._reset_window(now)
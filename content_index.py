@@ -0,0 +1,438 @@
+"""
+导出脚本的内容索引喵~
+把每个导出的 .as 文件拆成词(标识符、数字、中文串等 [\\w$]+)，建立 词 → 文件 的倒排表，
+词表本身再按三元组建索引，这样查找某个ID或字段名时只需要读少数候选文件；
+多个关键词一起查时用 Aho-Corasick 自动机在每个候选文件上扫描一遍就能全部找出来喵~
+
+收录在与 sprite 后处理共用的进程池(process_pool)中并行读取和分词；每个文件记录大小和修改时间，没有变化的不再重新分词。
+导出器在每次运行结束时把新写出的脚本加进来，其他目录用 index 子命令收录或刷新：
+
+    python content_index.py index <目录>                       收录/刷新目录下的 .as(含带索引的导出归档)
+    python content_index.py search <关键词>... [--under 目录] [-i]  查找包含任一关键词的脚本
+"""
+
+import argparse
+import bisect
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import output_archive
+import process_pool
+from file_index import normalize_path, path_range, trigrams
+
+DEFAULT_CONTENT_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "content_index.db")
+SCRIPT_SUFFIX = ".as"
+TOKEN_RE = re.compile(r"[\w$]+")
+INDEX_VERSION = 1
+# 每个子进程任务处理的文件数；总数不到一个任务时直接在当前进程处理，省掉启动进程池
+CHUNK_SIZE = 64
+# 每个匹配最多保留的行内容长度
+MAX_LINE_LENGTH = 200
+# 在词表中找包含某个子串的词时最多求几个三元组的交集
+MAX_QUERY_GRAMS = 3
+
+_SCHEMA = (
+    # stamp 为文件(归档成员则为所在归档)的 大小:修改时间，变化时重新分词
+    "CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, stamp TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS tokens (id INTEGER PRIMARY KEY, token TEXT NOT NULL UNIQUE, df INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS postings (token_id INTEGER NOT NULL, doc_id INTEGER NOT NULL,"
+    " PRIMARY KEY (token_id, doc_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)",
+    # 词表的三元组索引(小写)，关键词只是某个词的一部分时用它找出包含它的词
+    "CREATE TABLE IF NOT EXISTS token_grams (gram INTEGER NOT NULL, token_id INTEGER NOT NULL,"
+    " PRIMARY KEY (gram, token_id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS token_gram_counts (gram INTEGER PRIMARY KEY, n INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, indexed_at REAL NOT NULL)",
+)
+
+
+class ContentMatch(NamedTuple):
+    path: str
+    line: int
+    pattern: str
+    text: str
+
+
+class AhoCorasick:
+    """多模式匹配自动机：扫描一遍文本就能找出所有关键词的所有出现位置喵~"""
+
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self.patterns = list(dict.fromkeys(pattern for pattern in patterns if pattern))
+        goto: List[Dict[str, int]] = [{}]
+        fail = [0]
+        out: List[List[int]] = [[]]
+        for i, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern.lower() if ignore_case else pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                state = nxt
+            out[state].append(i)
+        # 按层次计算失配指针，每个状态的输出合并上失配状态的输出
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """依次产出 (起始位置, 关键词)喵~"""
+        if self.ignore_case:
+            text = text.lower()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for p in out[state]:
+                yield i - len(patterns[p]) + 1, patterns[p]
+
+
+def _stamp(path: str) -> Optional[str]:
+    archived = output_archive.split_member_path(path)
+    try:
+        st = os.stat(archived[0] if archived else path)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _read_text(path: str) -> str:
+    return output_archive.read_output(path).decode("utf-8", errors="replace")
+
+
+def _scan_chunk(paths: Sequence[str]) -> List[Tuple[str, Optional[List[str]]]]:
+    """在子进程中读取并分词，读不到的文件词表为 None 喵~"""
+    result = []
+    for path in paths:
+        try:
+            result.append((path, sorted(set(TOKEN_RE.findall(_read_text(path))))))
+        except (OSError, KeyError, ValueError):
+            result.append((path, None))
+    return result
+
+
+_automata: Dict[Tuple[Tuple[str, ...], bool], AhoCorasick] = {}
+
+
+def _match_chunk(paths: Sequence[str], patterns: Tuple[str, ...], ignore_case: bool) -> List[ContentMatch]:
+    """在子进程中用自动机扫描候选文件，每行每个关键词记一次喵~"""
+    automaton = _automata.get((patterns, ignore_case))
+    if automaton is None:
+        automaton = _automata[(patterns, ignore_case)] = AhoCorasick(patterns, ignore_case)
+    matches = []
+    for path in paths:
+        try:
+            text = _read_text(path)
+        except (OSError, KeyError, ValueError):
+            continue
+        newlines = None
+        seen = set()
+        for start, pattern in automaton.finditer(text):
+            if newlines is None:
+                newlines = [m.start() for m in re.finditer("\n", text)]
+            line = bisect.bisect_left(newlines, start)
+            if (line, pattern) in seen:
+                continue
+            seen.add((line, pattern))
+            begin = newlines[line - 1] + 1 if line else 0
+            end = newlines[line] if line < len(newlines) else len(text)
+            matches.append(ContentMatch(path, line + 1, pattern, text[begin:end].strip()[:MAX_LINE_LENGTH]))
+    return matches
+
+
+def _run_chunks(func, paths: List[str], *args) -> Iterator[list]:
+    """把 paths 分块交给 func，按块产出结果；只有一块时直接在当前进程执行喵~"""
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            yield func(chunk, *args)
+        return
+    yield from process_pool.shared_pool().map(func, chunks, *([arg] * len(chunks) for arg in args))
+
+
+def _token_matches(token: str, query: str, left_open: bool, right_open: bool) -> bool:
+    """关键词中的一个词与词表中的词是否对得上：左右两端可能接着别的字符时分别按后缀、前缀匹配喵~"""
+    if left_open and right_open:
+        return query in token
+    if left_open:
+        return token.endswith(query)
+    if right_open:
+        return token.startswith(query)
+    return token == query
+
+
+class ContentIndex:
+    def __init__(self, path: str = DEFAULT_CONTENT_INDEX):
+        """打开(或创建)内容索引喵~"""
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # 倒排表的插入是随机位置的，页缓存大一些能少很多磁盘读写
+        self._db.execute("PRAGMA cache_size = -65536")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            for (table,) in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                self._db.execute(f"DROP TABLE IF EXISTS {table}")
+            self._db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def add(self, paths: Iterable[str]) -> int:
+        """收录一批脚本，大小和修改时间没变的跳过，返回重新分词的文件数喵~"""
+        stamps = {}
+        for path in paths:
+            path = normalize_path(path)
+            stamp = _stamp(path)
+            if stamp is not None:
+                stamps[path] = stamp
+        with self._lock:
+            changed = [path for path in stamps if self._stamp_of(path) != stamps[path]]
+        if not changed:
+            return 0
+        scanned = 0
+        vocabulary: Dict[str, int] = {}
+        for chunk in _run_chunks(_scan_chunk, changed):
+            docs = []
+            for path, tokens in chunk:
+                if tokens is None:
+                    logging.warning(f"读取脚本 {path} 失败，跳过收录喵~")
+                else:
+                    docs.append((path, stamps[path], tokens))
+            with self._lock:
+                self._insert(docs, vocabulary)
+            scanned += len(docs)
+        with self._lock:
+            self._db.commit()
+        return scanned
+
+    def _stamp_of(self, path: str) -> Optional[str]:
+        row = self._db.execute("SELECT stamp FROM docs WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def _insert(self, docs: List[Tuple[str, str, List[str]]], vocabulary: Dict[str, int]):
+        """写入一批分好词的文件(替换已有的同路径记录)；vocabulary 缓存 词 → id，在同一次 add 中复用喵~"""
+        unknown = list({token for _, _, tokens in docs for token in tokens if token not in vocabulary})
+        for i in range(0, len(unknown), 500):
+            batch = unknown[i:i + 500]
+            vocabulary.update(self._db.execute(
+                f"SELECT token, id FROM tokens WHERE token IN ({','.join('?' * len(batch))})", batch))
+        new = [token for token in unknown if token not in vocabulary]
+        if new:
+            first = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tokens").fetchone()[0]
+            vocabulary.update(zip(new, range(first, first + len(new))))
+            self._db.executemany("INSERT INTO tokens (id, token, df) VALUES (?, ?, 0)",
+                                 [(vocabulary[token], token) for token in new])
+            grams = sorted((gram, vocabulary[token]) for token in new for gram in trigrams(token))
+            self._db.executemany("INSERT INTO token_grams (gram, token_id) VALUES (?, ?)", grams)
+            self._db.executemany(
+                "INSERT INTO token_gram_counts (gram, n) VALUES (?, ?) ON CONFLICT (gram) DO UPDATE SET n = n + ?",
+                [(gram, n, n) for gram, n in Counter(gram for gram, _ in grams).items()])
+        df = Counter()
+        for path, stamp, tokens in docs:
+            self._remove(path)
+            doc_id = self._db.execute("INSERT INTO docs (path, stamp) VALUES (?, ?)", (path, stamp)).lastrowid
+            token_ids = [vocabulary[token] for token in tokens]
+            self._db.executemany("INSERT INTO postings (token_id, doc_id) VALUES (?, ?)",
+                                 [(token_id, doc_id) for token_id in token_ids])
+            df.update(token_ids)
+        self._db.executemany("UPDATE tokens SET df = df + ? WHERE id = ?", [(n, token_id) for token_id, n in df.items()])
+
+    def _remove(self, path: str):
+        row = self._db.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if not row:
+            return
+        self._db.execute("UPDATE tokens SET df = df - 1 WHERE id IN (SELECT token_id FROM postings WHERE doc_id = ?)",
+                         row)
+        self._db.execute("DELETE FROM postings WHERE doc_id = ?", row)
+        self._db.execute("DELETE FROM docs WHERE id = ?", row)
+
+    def remove(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                self._remove(normalize_path(path))
+            self._db.commit()
+
+    def index_tree(self, directory: str) -> Tuple[int, int]:
+        """收录目录下的所有 .as(带偏移索引的导出归档收录其中的 .as 成员)，移除已经不存在的，
+        并登记该目录，返回 (重新分词数, 移除数)喵~"""
+        paths = []
+        for root, _, files in os.walk(directory):
+            names = set(files)
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".zip") and name + output_archive.INDEX_SUFFIX in names:
+                    try:
+                        with output_archive.ExportArchive(path) as archive:
+                            paths.extend(output_archive.member_path(archive.path, member)
+                                         for member in archive.names() if member.endswith(SCRIPT_SUFFIX))
+                    except (OSError, ValueError) as e:
+                        logging.warning(f"读取导出归档 {path} 失败: {e} 喵~")
+                elif name.endswith(SCRIPT_SUFFIX):
+                    paths.append(path)
+        current = {normalize_path(path) for path in paths}
+        with self._lock:
+            stale = [path for path, in self._db.execute(
+                "SELECT path FROM docs WHERE path >= ? AND path < ?", path_range(directory)).fetchall()
+                if path not in current]
+        self.remove(stale)
+        scanned = self.add(current)
+        self.add_root(directory)
+        return scanned, len(stale)
+
+    def add_root(self, directory: str):
+        """登记一个已经完整收录(或由导出器持续维护)的目录喵~"""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO roots (path, indexed_at) VALUES (?, ?)",
+                             (os.path.abspath(directory), time.time()))
+            self._db.commit()
+
+    def remove_root(self, directory: str):
+        """取消 directory 及包含它的目录的登记；之后查询这些目录时会重新收录一次喵~"""
+        directory = os.path.normcase(os.path.abspath(directory))
+        with self._lock:
+            for (root,) in self._db.execute("SELECT path FROM roots").fetchall():
+                normalized = os.path.normcase(root)
+                if directory == normalized or directory.startswith(normalized.rstrip(os.sep) + os.sep):
+                    self._db.execute("DELETE FROM roots WHERE path = ?", (root,))
+            self._db.commit()
+
+    def covers(self, directory: str) -> bool:
+        """directory 是否在某个登记过的目录之内喵~"""
+        directory = os.path.normcase(os.path.abspath(directory))
+        with self._lock:
+            roots = [os.path.normcase(path) for path, in self._db.execute("SELECT path FROM roots").fetchall()]
+        return any(directory == root or directory.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+    def _vocabulary(self, query: str, left_open: bool, right_open: bool, ignore_case: bool) -> List[Tuple[int, int]]:
+        """词表中能与关键词里的一个词对上的词，返回 [(词id, 文件数)]喵~"""
+        if not (left_open or right_open or ignore_case):
+            return self._db.execute("SELECT id, df FROM tokens WHERE token = ? AND df > 0", (query,)).fetchall()
+        grams = list(trigrams(query))
+        if grams:
+            counts = dict(self._db.execute(
+                f"SELECT gram, n FROM token_gram_counts WHERE gram IN ({','.join('?' * len(grams))})", grams))
+            if any(gram not in counts for gram in grams):
+                return []
+            rarest = sorted(grams, key=lambda gram: counts[gram])[:MAX_QUERY_GRAMS]
+            rows = self._db.execute(
+                "SELECT id, token, df FROM tokens WHERE df > 0 AND id IN ("
+                + " INTERSECT ".join("SELECT token_id FROM token_grams WHERE gram = ?" for _ in rarest) + ")", rarest)
+        else:
+            # 不足3个字符时没有三元组可用，直接扫描词表
+            rows = self._db.execute("SELECT id, token, df FROM tokens WHERE df > 0 AND instr(lower(token), ?) > 0",
+                                    (query.lower(),))
+        if ignore_case:
+            query = query.lower()
+        return [(token_id, df) for token_id, token, df in rows
+                if _token_matches(token.lower() if ignore_case else token, query, left_open, right_open)]
+
+    def _candidates(self, pattern: str, ignore_case: bool) -> Optional[Set[int]]:
+        """可能包含 pattern 的文件id；pattern 中没有词(只有符号)时返回 None 表示所有文件喵~"""
+        best = None
+        for m in TOKEN_RE.finditer(pattern):
+            vocabulary = self._vocabulary(m.group(), m.start() == 0, m.end() == len(pattern), ignore_case)
+            cost = sum(df for _, df in vocabulary)
+            if best is None or cost < best[0]:
+                best = (cost, vocabulary)
+            if not cost:
+                break
+        if best is None:
+            return None
+        docs = set()
+        token_ids = [token_id for token_id, _ in best[1]]
+        for i in range(0, len(token_ids), 500):
+            chunk = token_ids[i:i + 500]
+            docs.update(doc_id for doc_id, in self._db.execute(
+                f"SELECT doc_id FROM postings WHERE token_id IN ({','.join('?' * len(chunk))})", chunk))
+        return docs
+
+    def search(self, patterns: Sequence[str], under: Optional[str] = None,
+               ignore_case: bool = False) -> List[ContentMatch]:
+        """查找包含任一关键词的脚本，返回每个匹配所在的文件、行号和行内容，可以限定在 under 目录下喵~"""
+        patterns = tuple(dict.fromkeys(pattern for pattern in patterns if pattern))
+        if not patterns:
+            return []
+        where, params = [], []
+        if under:
+            where.append("path >= ? AND path < ?")
+            params += list(path_range(under))
+        with self._lock:
+            candidates: Optional[Set[int]] = set()
+            for pattern in patterns:
+                docs = self._candidates(pattern, ignore_case)
+                if docs is None:
+                    candidates = None
+                    break
+                candidates |= docs
+            if candidates is not None:
+                where.append("id IN (SELECT value FROM json_each(?))")
+                params.append("[" + ",".join(map(str, candidates)) + "]")
+            rows = self._db.execute(
+                f"SELECT path FROM docs{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY path",
+                params).fetchall()
+        paths = [path for path, in rows]
+        return [match for chunk in _run_chunks(_match_chunk, paths, patterns, ignore_case) for match in chunk]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出脚本的内容索引")
+    parser.add_argument("--db", default=DEFAULT_CONTENT_INDEX, help="索引数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index = sub.add_parser("index", help="收录或刷新目录下的 .as")
+    index.add_argument("directory")
+    search = sub.add_parser("search", help="查找包含任一关键词的脚本")
+    search.add_argument("patterns", nargs="+")
+    search.add_argument("--under", help="只在该目录下查找")
+    search.add_argument("-i", "--ignore-case", action="store_true", help="不区分大小写")
+    search.add_argument("--files", action="store_true", help="只列出文件")
+    args = parser.parse_args()
+
+    content_index = ContentIndex(args.db)
+    start = time.perf_counter()
+    try:
+        if args.command == "index":
+            scanned, removed = content_index.index_tree(args.directory)
+            print(f"重新分词 {scanned} 个脚本，移除 {removed} 个，耗时 {time.perf_counter() - start:.2f}秒 喵~")
+        else:
+            matches = content_index.search(args.patterns, args.under, args.ignore_case)
+            files = list(dict.fromkeys(match.path for match in matches))
+            for match in matches if not args.files else []:
+                print(f"{match.path}:{match.line}: [{match.pattern}] {match.text}")
+            for path in files if args.files else []:
+                print(path)
+            print(f"{len(files)} 个文件中共 {len(matches)} 处匹配，"
+                  f"查询耗时 {(time.perf_counter() - start) * 1000:.1f}ms 喵~")
+    finally:
+        content_index.close()
+        process_pool.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
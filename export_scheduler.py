@@ -0,0 +1,140 @@
+"""
+导出任务的成本估计与最长优先调度喵~
+FFDec 每导出一个 sprite 都要单独启动一次 JVM，所以一个 SWF 的导出耗时主要取决于其中
+需要导出的 sprite 数，其次是文件大小。ExportCostModel 用标签扫描(swf_tags)得到这些信息，
+再结合历史耗时估计每个 SWF 的成本；LongestFirstQueue 按成本从大到小派发任务，
+避免最大的文件排在最后、其他线程空等的长尾喵~
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+from typing import Dict, Optional, Tuple
+
+import swf_tags
+
+DEFAULT_COST_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "export_costs.json")
+# 每个SWF固定的 JVM 调用：dumpSWF 和 dumpAS3
+BASE_CALLS = 2
+# 解析多少字节大约相当于一次 JVM 调用的开销
+BYTES_PER_CALL = 1024 * 1024
+DEFAULT_SECONDS_PER_UNIT = 1.0
+
+
+class ExportCostModel:
+    def __init__(self, path: Optional[str] = DEFAULT_COST_HISTORY):
+        """path 为历史耗时文件，None 表示只在内存中估计、不读写历史喵~"""
+        self.path = path
+        self._history: Dict[str, dict] = {}
+        # 本次运行中 estimate 扫描过的文件: 键 → (大小, 工作量)，record 时直接复用，不再扫描第二遍
+        self._units: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._history = json.load(f)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logging.warning(f"读取导出耗时历史失败，将重新建立: {e} 喵~")
+        self.seconds_per_unit = self._fit_rate()
+
+    def _fit_rate(self) -> float:
+        """历史上每个工作量单位的耗时(中位数)，没有历史时用默认值喵~"""
+        rates = [h["seconds"] / h["units"] for h in self._history.values() if h.get("units")]
+        return statistics.median(rates) if rates else DEFAULT_SECONDS_PER_UNIT
+
+    @staticmethod
+    def work_units(path: str, size: Optional[int] = None) -> float:
+        """估计的工作量：JVM 调用次数加上按字节折算的解析量喵~
+
+        只流式扫描标签头(swf_tags.summarize)，解压后的长度取自文件头喵~
+        """
+        if size is None:
+            size = os.path.getsize(path)
+        summary = swf_tags.summarize(path)
+        if summary is None:
+            return BASE_CALLS + size / BYTES_PER_CALL
+        return BASE_CALLS + summary.sprite_count + (summary.file_length + summary.sprite_bytes) / BYTES_PER_CALL
+
+    def estimate(self, key: str, path: str) -> float:
+        """估计导出耗时(秒)；同一路径、同样大小的文件有历史记录时直接用历史耗时喵~"""
+        size = os.path.getsize(path)
+        history = self._history.get(key)
+        if history and history.get("size") == size:
+            return history["seconds"]
+        return self.units(key, path, size) * self.seconds_per_unit
+
+    def units(self, key: str, path: str, size: int) -> float:
+        """文件的工作量，每个文件每次运行最多扫描一次：优先用 estimate 时的扫描结果，其次是历史记录喵~"""
+        with self._lock:
+            cached = self._units.get(key)
+            history = self._history.get(key)
+        if cached and cached[0] == size:
+            return cached[1]
+        if history and history.get("size") == size and history.get("units"):
+            return history["units"]
+        units = self.work_units(path, size)
+        with self._lock:
+            self._units[key] = (size, units)
+        return units
+
+    def record(self, key: str, path: str, seconds: float):
+        try:
+            size = os.path.getsize(path)
+            units = self.units(key, path, size)
+        except OSError:
+            return
+        with self._lock:
+            self._units.pop(key, None)
+            self._history[key] = {"size": size, "units": round(units, 4), "seconds": round(seconds, 4)}
+            self._dirty = True
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._history, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logging.error(f"保存导出耗时历史失败: {e} 喵~")
+
+
+def useful_workers(total_cost: float, max_cost: float, ceiling: int) -> int:
+    """并发数超过 总成本/最大单个成本 后，总耗时受最大的文件限制，不会再缩短喵~"""
+    if max_cost <= 0:
+        return ceiling
+    return max(1, min(ceiling, math.ceil(total_cost / max_cost)))
+
+
+class LongestFirstQueue:
+    def __init__(self):
+        """按估计成本从大到小弹出的任务队列，成本相同时先进先出喵~"""
+        self._heap = []
+        self._counter = itertools.count()
+        self.total_cost = 0.0
+        self.max_cost = 0.0
+
+    def push(self, item, cost: float):
+        heapq.heappush(self._heap, (-cost, next(self._counter), item))
+        self.total_cost += cost
+        self.max_cost = max(self.max_cost, cost)
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        return len(self._heap)
@@ -9,29 +9,88 @@
 """
 
 import os
+import posixpath
+import shutil
 import subprocess
 import argparse
+import json
 import logging
 import re
 import traceback
 from datetime import datetime
 import threading
 from queue import Queue
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
 import time
+import zipfile
+import zlib
 import psutil
 from tqdm import tqdm
-import shutil
+from contextlib import contextmanager, nullcontext
+
+from asset_store import link_or_copy
+from concurrency import ResizableSemaphore
+import content_index
+from export_scheduler import ExportCostModel, LongestFirstQueue, useful_workers
+from file_index import FileIndex
+from log_setup import setup_logging
+from metrics import LIVE, RunMetrics
+import output_archive
+import process_pool
+from profiling import StageProfiler, profiling_enabled, record_subprocess
+from resource_sampler import ExportAutoscaler, ResourceSampler, probe_cpu_percent
+import sprite_profiles
+from swf_catalog import SCRIPT_PATTERN, SwfCatalog
+from swf_tags import SPRITE_MIN_LEN
 
 class FFDecExporter:
     def __init__(self):
         """初始化导出器喵~"""
         self.ffdec_path = ""
+        # 启动 FFDec 的命令前缀，None 表示 ["java", "-jar", ffdec_path]；基准测试用它换成假的 FFDec
+        self.ffdec_command = None
         self.target_dir = ""
         self.output_dir = ""
         # 获取CPU核心数，设置为物理核心数 * 2
         self.max_workers = psutil.cpu_count(logical=True)
+        # 自动伸缩时并发数的上限，None 表示 max_workers 的两倍
+        self.max_workers_limit = None
+        self.export_gate = None
+        self.export_autoscaler = None
+        # ExportCostModel，process_files 按它估计的成本最长优先派发；None 时只在内存中估计
+        self.cost_model = None
+        # 待派发任务最多积压 backlog_windows 个窗口，超过时暂停遍历，内存占用与文件总数无关
+        self.backlog_windows = 8
+        # 导出的筛选规则：长度超过 sprite_min_len 且帧数不少于 sprite_min_frames 的 sprite，
+        # 类名(小写)包含 script_pattern 的脚本
+        self.sprite_min_len = SPRITE_MIN_LEN
+        self.sprite_min_frames = 0
+        self.script_pattern = SCRIPT_PATTERN
+        # SwfCatalog，设置后筛选改为查询标签目录，不再用 FFDec dump；
+        # 导出过内容摘要相同的 sprite/类(上个版本的同一资源，或别的SWF中的同一份内容)时直接链接已有的结果
+        self.catalog = None
+        # output_archive.ArchiveWriter，设置后每个SWF的导出结果处理完就打包进归档，不留小文件
+        self.archive = None
+        # file_index.FileIndex，设置后每个SWF的最终输出路径都加入文件名索引
+        self.file_index = None
+        # content_index.ContentIndex，设置后在运行结束时由 update_content_index 收录本次的脚本
+        self.content_index = None
+        self.written_scripts: List[str] = []
+        self._written_lock = threading.Lock()
+        # sprite 的导出格式(sprite_profiles.SpriteProfile)，决定 FFDec 的 -format 和导出后的后处理
+        self.sprite_profile = sprite_profiles.PROFILES[sprite_profiles.DEFAULT_PROFILE]
+        # 按 kind(sprite/class) 累计的导出数、复用数，以及复用省下的字节数和 FFDec 耗时
+        self.reuse_stats = {}
+        # 按 sprite profile 累计的导出数、FFDec 耗时、后处理耗时和输出字节数
+        self.profile_stats = {}
+        self._content_locks = {}
+        self._content_lock = threading.Lock()
+        self.resource_sampler = None  # 设置后导出期间按CPU/内存自动伸缩并发数
+        self.metrics = None  # RunMetrics，设置后记录每次 JVM 调用的耗时
+        self.profiler = None  # StageProfiler，设置后 process_file 在 cProfile 下运行
+        self._jvm_startup = None
+        self._jvm_lock = threading.Lock()
         self.task_queue = Queue()
         self.results = []
         self.total_files = 0
@@ -41,24 +100,12 @@ class FFDecExporter:
 
     def setup_logging(self):
         """设置日志喵~"""
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"test_ffdec_{timestamp}.log")
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
-        )
+        log_file = setup_logging("ffdec_export")
         logging.info(f"日志文件位置: {log_file} 喵~")
 
     def get_system_info(self):
         """获取系统信息喵~"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = probe_cpu_percent()
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         
@@ -97,6 +144,16 @@ class FFDecExporter:
         except ValueError:
             logging.warning(f"输入的线程数无效，使用建议值 {self.max_workers} 喵~")
 
+        if input("是否把导出结果打包进 zip 归档，而不是保留为文件？(y/N): ").strip().lower() == "y":
+            self.archive = output_archive.ArchiveWriter(self.output_dir.rstrip("/\\") + ".zip")
+
+        profile = input(f"请输入sprite导出格式 ({'/'.join(sprite_profiles.PROFILES)}, "
+                        f"默认: {sprite_profiles.DEFAULT_PROFILE}): ").strip() or sprite_profiles.DEFAULT_PROFILE
+        try:
+            self.sprite_profile = sprite_profiles.get_profile(profile)
+        except ValueError as e:
+            logging.warning(f"{e}，使用默认格式 {sprite_profiles.DEFAULT_PROFILE} 喵~")
+
     def validate_paths(self) -> bool:
         """验证路径是否有效喵~"""
         if not os.path.isfile(self.ffdec_path):
@@ -108,71 +165,329 @@ class FFDecExporter:
         os.makedirs(self.output_dir, exist_ok=True)
         return True
 
+    def iter_swf_files(self, directory: str = None):
+        """用 os.scandir 流式遍历目录，边发现边产出SWF路径，同时累计 total_files 喵~"""
+        self.total_files = 0
+        pending = [directory or self.target_dir]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as entries:
+                    subdirs = []
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.name.lower().endswith('.swf') and entry.is_file():
+                                self.total_files += 1
+                                yield entry.path
+                        except OSError as e:
+                            logging.warning(f"读取 {entry.path} 失败: {e} 喵~")
+            except OSError as e:
+                logging.warning(f"无法遍历目录 {current}: {e} 喵~")
+                continue
+            # 倒序入栈，保持与目录列举相同的处理顺序
+            pending.extend(reversed(subdirs))
+
     def count_total_files(self):
         """计算需要处理的总文件数喵~"""
-        self.total_files = sum(1 for root, _, files in os.walk(self.target_dir)
-                             for file in files if file.lower().endswith('.swf'))
-        return self.total_files
+        return sum(1 for _ in self.iter_swf_files())
 
     def update_progress(self):
         """更新进度条喵~"""
-        if self.pbar:
+        if self.pbar is not None:
             self.pbar.update(1)
 
+    @contextmanager
+    def autoscaling(self):
+        """创建可伸缩的导出并发闸门，产出线程池大小(并发上限)喵~
+
+        设置了 resource_sampler 时，本阶段内会根据CPU/内存实时调整并发数喵~
+        """
+        ceiling = max(self.max_workers, self.max_workers_limit or self.max_workers * 2)
+        self.export_gate = ResizableSemaphore(self.max_workers)
+        scaler = self.export_autoscaler = ExportAutoscaler(self.export_gate, max_limit=ceiling)
+        if self.resource_sampler:
+            self.resource_sampler.add_listener(scaler)
+        try:
+            yield ceiling
+        finally:
+            if self.resource_sampler:
+                self.resource_sampler.remove_listener(scaler)
+            self.export_autoscaler = None
+
     def process_file(self, swf_file: str) -> Tuple[bool, str]:
         """处理单个SWF文件喵~"""
+        with self.export_gate.slot() if self.export_gate else nullcontext(), \
+                self.profiler.profile("process_file") if self.profiler else nullcontext():
+            start = time.perf_counter()
+            if not self.metrics:
+                result = self._process_file(swf_file)
+            else:
+                with self.metrics.timer("export", "file", file=swf_file):
+                    result = self._process_file(swf_file)
+            if self.cost_model:
+                self.cost_model.record(self.cost_key(swf_file), swf_file, time.perf_counter() - start)
+            return result
+
+    def export_file(self, swf_file: str) -> str:
+        """流水线的导出阶段：导出sprites和scripts，脚本目录留给后处理阶段整理喵~"""
+        waited_at = time.perf_counter()
+        with self.export_gate.slot() if self.export_gate else nullcontext():
+            if self.metrics:
+                # 等待导出闸门(并发名额)的时间
+                self.metrics.record("export", "gate_wait", time.perf_counter() - waited_at)
+            digest = self.catalog_entry(swf_file)
+            sprites_success = self.export_sprite(swf_file, digest)
+            scripts_success = self.export_script(swf_file, flatten=False, digest=digest)
+        if not (sprites_success and scripts_success):
+            logging.warning(f"处理文件 {swf_file} 时部分导出失败 喵~")
+        self.update_progress()
+        return swf_file
+
+    def postprocess_file(self, swf_file: str) -> str:
+        """流水线的后处理阶段：整理导出的脚本目录，归档模式下把结果打包进归档喵~"""
+        self.flatten_scripts(os.path.join(self.get_output_subdir(swf_file), "scripts"))
+        self.finish_output(swf_file)
+        logging.info(f"处理文件 {swf_file} 完成 喵~")
+        return swf_file
+
+    def finish_output(self, swf_file: str):
+        """一个SWF的导出结果定稿：归档模式下打包进归档，然后把最终的路径加入文件名索引喵~"""
+        subdir = self.get_output_subdir(swf_file)
+        if not os.path.isdir(subdir):
+            return
+        if self.archive:
+            paths = self.archive_output(subdir)
+        else:
+            paths = [os.path.join(root, name) for root, _, files in os.walk(subdir) for name in files]
+        if self.file_index:
+            self.file_index.add(paths)
+        if self.content_index and self.archive:
+            with self._written_lock:
+                self.written_scripts.extend(path for path in paths if path.endswith(content_index.SCRIPT_SUFFIX))
+
+    def begin_file_index(self):
+        """运行开始时取消输出目录在文件名索引中的登记，中途被杀掉时提取工具会重新收录喵~"""
+        if self.file_index and not self.archive:
+            self.file_index.remove_root(self.output_dir)
+
+    def update_file_index(self):
+        """运行结束时把整个输出目录(包括不是本次导出写出的文件)收录进文件名索引，然后才登记为已收录喵~
+
+        归档模式下成员已经在 finish_output 中逐个加入，输出目录不登记喵~
+        """
+        if not self.file_index or self.archive:
+            return
+        start = time.perf_counter()
+        added = self.file_index.index_tree(self.output_dir)
+        logging.info(f"文件名索引补充收录 {added} 个文件，耗时 {time.perf_counter() - start:.2f}秒 喵~")
+
+    def begin_content_index(self):
+        """运行开始时取消输出目录的已收录登记：中途被杀掉时提取工具会发现它没收录完，查询前重新收录喵~"""
+        if self.content_index and not self.archive:
+            self.content_index.remove_root(self.output_dir)
+
+    def update_content_index(self):
+        """把本次运行的脚本加入内容索引(在进程池中并行分词)；归档模式下要在归档关闭之后调用喵~
+
+        文件模式下刷新整个输出目录(没变化的脚本只比较大小和修改时间)，连同以前中断的运行留下的脚本一起收录，
+        完成后才把输出目录登记为已收录；归档模式下收录本次写进归档的脚本喵~
+        """
+        with self._written_lock:
+            paths, self.written_scripts = self.written_scripts, []
+        if not self.content_index:
+            return
+        start = time.perf_counter()
+        if not self.archive:
+            scanned, _ = self.content_index.index_tree(self.output_dir)
+        elif paths:
+            scanned = self.content_index.add(paths)
+        else:
+            return
+        logging.info(f"内容索引收录 {scanned} 个脚本，耗时 {time.perf_counter() - start:.2f}秒 喵~")
+
+    def archive_output(self, subdir: str) -> List[str]:
+        """把一个SWF的导出目录写进 self.archive 并删掉临时文件，导出记录随之指向归档，返回成员路径喵~"""
+        member = os.path.relpath(subdir, self.output_dir).replace(os.sep, "/")
+        members, size = self.archive.add_tree(subdir, member)
+        if self.catalog:
+            self.catalog.relocate_exports(subdir, output_archive.member_path(self.archive.path, member))
+        shutil.rmtree(subdir, ignore_errors=True)
+        # 顺带删掉变空的上级目录，直到输出目录为止
+        parent = os.path.dirname(subdir)
+        while os.path.abspath(parent) != os.path.abspath(self.output_dir):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+        LIVE.incr("archived_files_total", len(members))
+        LIVE.incr("archived_bytes_total", size)
+        return [output_archive.member_path(self.archive.path, name) for name in members]
+
+    def _process_file(self, swf_file: str) -> Tuple[bool, str]:
         try:
-            sprites_success = self.export_sprite(swf_file)
-            scripts_success = self.export_script(swf_file)
+            digest = self.catalog_entry(swf_file)
+            sprites_success = self.export_sprite(swf_file, digest)
+            scripts_success = self.export_script(swf_file, digest=digest)
+            self.finish_output(swf_file)
             self.update_progress()
             return True, f"处理文件 {swf_file} 完成 喵~"
         except Exception as e:
             self.update_progress()
             return False, f"处理文件 {swf_file} 失败: {str(e)} 喵~"
 
+    def cost_key(self, swf_file: str) -> str:
+        """导出耗时历史的键：相对目标目录的路径，跨版本保持不变喵~"""
+        return os.path.relpath(swf_file, self.target_dir).replace(os.sep, "/")
+
     def process_files(self):
-        """使用线程池处理所有文件喵~"""
-        total_files = self.count_total_files()
+        """边遍历边提交，按估计成本最长优先派发，同时在途的任务不超过窗口大小喵~
+
+        遍历比导出快得多，所以除了最先的一批，其余任务都能按成本从大到小执行；
+        遍历结束后按 总成本/最大成本 收紧并发上限，多出的线程对总耗时没有帮助喵~
+
+        待派发的任务积压到 backlog_windows 个窗口时暂停遍历，等有任务完成再继续，
+        堆的大小不随文件总数增长。代价是最长优先只在积压的这一段里成立：
+        很晚才遍历到的大文件仍可能排在最后，积压上限越大越接近全局最长优先喵~
+        """
         success_count = 0
         error_count = 0
-        
-        print(f"\n开始处理 {total_files} 个文件 喵~")
-        
-        with tqdm(total=total_files, desc="处理进度", unit="文件") as self.pbar:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = []
-                for root, _, files in os.walk(self.target_dir):
-                    for file in files:
-                        if file.lower().endswith('.swf'):
-                            swf_path = os.path.join(root, file)
-                            futures.append(executor.submit(self.process_file, swf_path))
-
-                for future in as_completed(futures):
-                    try:
-                        success, message = future.result()
-                        if success:
-                            success_count += 1
-                            logging.info(message)
-                        else:
-                            error_count += 1
-                            logging.error(message)
-                    except Exception as e:
+        if self.cost_model is None:
+            self.cost_model = ExportCostModel(path=None)
+        queue = LongestFirstQueue()
+
+        print(f"\n开始处理 {self.target_dir} 中的SWF文件 喵~")
+
+        with self.autoscaling() as pool_size, tqdm(total=0, desc="处理进度", unit="文件") as self.pbar:
+            # 窗口为线程池的两倍：线程不会因等待提交而空闲，队列里的 future 数也有上限
+            window = pool_size * 2
+            backlog = window * self.backlog_windows
+            in_flight = set()
+
+            def collect(done):
+                nonlocal success_count, error_count
+                for future in done:
+                    if self.handle_result(future):
+                        success_count += 1
+                    else:
                         error_count += 1
-                        logging.error(f"处理任务时发生错误: {str(e)} 喵~")
 
-        print(f"\n处理完成！成功: {success_count}, 失败: {error_count} 喵~")
+            def dispatch():
+                while queue and len(in_flight) < window:
+                    in_flight.add(executor.submit(self.process_file, queue.pop()))
+
+            with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                for swf_path in self.iter_swf_files():
+                    # 进度条总数随遍历补全，下次刷新时显示
+                    self.pbar.total = self.total_files
+                    try:
+                        cost = self.cost_model.estimate(self.cost_key(swf_path), swf_path)
+                    except OSError:
+                        cost = 0.0
+                    queue.push(swf_path, cost)
+                    # 遍历期间不阻塞，只收集已经完成的任务
+                    done = {future for future in in_flight if future.done()}
+                    if done:
+                        in_flight -= done
+                        collect(done)
+                    dispatch()
+                    # 积压太多时暂停遍历，等窗口里的任务完成后再继续
+                    while len(queue) >= backlog:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                        dispatch()
+
+                limit = useful_workers(queue.total_cost, queue.max_cost, pool_size)
+                if limit < pool_size and self.export_autoscaler:
+                    self.export_autoscaler.max_limit = limit
+                    self.export_gate.set_limit(min(self.export_gate.limit, limit))
+                    logging.info(f"估计总成本 {queue.total_cost:.1f}秒，最大单个 {queue.max_cost:.1f}秒，"
+                                 f"导出并发上限收紧为 {limit} 喵~")
+
+                while queue or in_flight:
+                    dispatch()
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+        self.cost_model.save()
+        print(f"\n处理完成！共 {self.total_files} 个文件，成功: {success_count}, 失败: {error_count} 喵~")
+
+    def handle_result(self, future) -> bool:
+        """记录单个任务的结果喵~"""
+        try:
+            success, message = future.result()
+            if success:
+                logging.info(message)
+            else:
+                logging.error(message)
+            return success
+        except Exception as e:
+            logging.error(f"处理任务时发生错误: {str(e)} 喵~")
+            return False
+
+    def java_command(self) -> List[str]:
+        return list(self.ffdec_command) if self.ffdec_command else ["java", "-jar", self.ffdec_path]
+
+    def jvm_startup_seconds(self) -> float:
+        """估计一次 JVM 启动并加载 FFDec 的耗时(用 -help 测一次后缓存)喵~"""
+        with self._jvm_lock:
+            if self._jvm_startup is None:
+                start = time.perf_counter()
+                try:
+                    subprocess.run([*self.java_command(), "-help"], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=120)
+                    self._jvm_startup = time.perf_counter() - start
+                    record_subprocess(self._jvm_startup)
+                except (OSError, subprocess.SubprocessError):
+                    self._jvm_startup = 0.0
+            return self._jvm_startup
+
+    def _run_java(self, args: List[str], kind: str) -> subprocess.CompletedProcess:
+        """运行一次 FFDec 命令，失败时抛出 CalledProcessError喵~
+
+        设置了 metrics 时记录 jvm_<kind> 事件：spawn 为创建进程的耗时，
+        startup 为估计的 JVM+FFDec 启动耗时，work 为扣除启动后真正干活的耗时喵~
+        """
+        cmd = [*self.java_command(), *args]
+        startup = self.jvm_startup_seconds() if self.metrics else 0.0
+        start = time.perf_counter()
+        with LIVE.tracking("jvm_in_flight"), \
+                subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+            spawn = time.perf_counter() - start
+            stdout, stderr = proc.communicate()
+        wall = time.perf_counter() - start
+        record_subprocess(wall)
+        LIVE.incr("jvm_calls_total", kind=kind, result="ok" if proc.returncode == 0 else "error")
+        if self.metrics:
+            self.metrics.record("export", f"jvm_{kind}", wall, spawn=spawn, startup=min(startup, wall),
+                                work=max(0.0, wall - startup), returncode=proc.returncode, file=args[-1])
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
 
-    def has_valid_sprite(self, swf_file_path: str) -> List[str]:
-        """检查SWF文件中的sprite喵~"""
-        cmd_dump = ["java", "-jar", self.ffdec_path, "-dumpSWF", swf_file_path]
+    def catalog_entry(self, swf_file_path: str):
+        """在标签目录中收录SWF并返回其哈希；没有目录或解析失败时返回 None 喵~
+
+        每个SWF只在 _process_file/export_file 中调用一次，结果传给 export_sprite 和 export_script 喵~
+        """
+        if not self.catalog:
+            return None
+        digest = self.catalog.index(swf_file_path)
+        return digest if digest and self.catalog.is_parsed(digest) else None
+
+    def has_valid_sprite(self, swf_file_path: str, digest: Optional[str] = None) -> List[str]:
+        """检查SWF文件中的sprite；digest 为 catalog_entry 的结果，为 None 时用 FFDec dump 喵~"""
+        if digest:
+            return self.catalog.sprite_ids(digest, self.sprite_min_len, self.sprite_min_frames)
         try:
-            result = subprocess.run(cmd_dump, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                                 text=True, check=True)
+            result = self._run_java(["-dumpSWF", swf_file_path], "dumpSWF")
             valid_sprites = []
             for line in result.stdout.splitlines():
                 if "DefineSprite" in line:
                     m = re.search(r"DefineSprite \(chid: (\d+)\).*?len=\s*(\d+)", line)
-                    if m and int(m.group(2)) > 200:
+                    if m and int(m.group(2)) > self.sprite_min_len:
                         valid_sprites.append(m.group(1))
             return valid_sprites
         except subprocess.CalledProcessError as e:
@@ -188,98 +503,387 @@ class FFDecExporter:
         # 组合完整输出路径
         return os.path.join(self.output_dir, base_name)
 
-    def export_sprite(self, swf_file_path: str) -> bool:
-        """导出sprites喵~"""
-        valid_sprites = self.has_valid_sprite(swf_file_path)
+    def export_sprite(self, swf_file_path: str, digest: Optional[str] = None) -> bool:
+        """导出sprites；digest 为 catalog_entry 的结果喵~"""
+        valid_sprites = self.has_valid_sprite(swf_file_path, digest)
         if not valid_sprites:
             return True
 
         output_dir = os.path.join(self.get_output_subdir(swf_file_path), "sprites")
         os.makedirs(output_dir, exist_ok=True)
+        n = self.cost_key(swf_file_path)
 
         success = True
         for sprite_id in valid_sprites:
-            try:
-                cmd_export = [
-                    "java", "-jar", self.ffdec_path,
-                    "-format", "sprite:gif",
-                    "-selectid", sprite_id,
-                    "-export", "sprite",
-                    output_dir,  # 修改输出路径
-                    swf_file_path
-                ]
-                subprocess.run(cmd_export, check=True, capture_output=True, text=True)
-            except subprocess.CalledProcessError as e:
-                logging.error(f"导出sprite {sprite_id}失败: {e} 喵~")
-                success = False
+            content = self.catalog.sprite_digest(digest, sprite_id) if digest else None
+            # 多个SWF里的同一个 sprite 同时到达时只让一个线程导出，其余的等它完成后直接链接
+            with self.content_lock(self.sprite_kind, content) if content else nullcontext():
+                if content and self.link_previous_sprite(n, sprite_id, content, output_dir):
+                    continue
+                try:
+                    cmd_export = [
+                        "-format", self.sprite_profile.ffdec_format,
+                        "-selectid", sprite_id,
+                        "-export", "sprite",
+                        output_dir,  # 修改输出路径
+                        swf_file_path
+                    ]
+                    start = time.perf_counter()
+                    self._run_java(cmd_export, "export_sprite")
+                    seconds = time.perf_counter() - start
+                except subprocess.CalledProcessError as e:
+                    logging.error(f"导出sprite {sprite_id}失败: {e} 喵~")
+                    success = False
+                    continue
+                self.count_export("sprite")
+                exported = self.sprite_output(output_dir, sprite_id)
+                if not exported:
+                    continue
+                try:
+                    post_seconds = self.postprocess_sprite(exported)
+                except Exception as e:
+                    # 后处理失败时保留 FFDec 的原始输出，但不记入导出记录，下次重新导出
+                    logging.error(f"sprite {sprite_id} 后处理({self.sprite_profile.name})失败: {e} 喵~")
+                    success = False
+                    continue
+                size = self.tree_size(exported)
+                self.count_profile(seconds, post_seconds, size, file=n)
+                if content:
+                    self.catalog.record_export(n, self.sprite_kind, sprite_id, content, exported,
+                                               size, seconds + post_seconds)
         return success
 
-    def export_script(self, swf_file_path: str) -> bool:
-        """导出scripts喵~"""
+    @property
+    def sprite_kind(self) -> str:
+        """导出记录中 sprite 的类别：不同 profile 的导出结果不能互相复用喵~"""
+        return f"sprite:{self.sprite_profile.name}"
+
+    def postprocess_sprite(self, exported: str) -> float:
+        """在进程池中对导出的 sprite 目录执行 profile 的后处理，返回耗时喵~"""
+        if not self.sprite_profile.steps:
+            return 0.0
+        start = time.perf_counter()
+        stats = sprite_profiles.run_postprocess(self.sprite_profile, exported)
+        seconds = time.perf_counter() - start
+        logging.debug(f"{exported} 后处理完成 {stats} 喵~")
+        return seconds
+
+    def count_profile(self, ffdec_seconds: float, post_seconds: float, size: int, **fields):
+        name = self.sprite_profile.name
+        with self._content_lock:
+            stats = self.profile_stats.setdefault(
+                name, {"sprites": 0, "ffdec_seconds": 0.0, "post_seconds": 0.0, "bytes": 0})
+            stats["sprites"] += 1
+            stats["ffdec_seconds"] += ffdec_seconds
+            stats["post_seconds"] += post_seconds
+            stats["bytes"] += size
+        LIVE.incr("sprite_output_bytes_total", size, profile=name)
+        if self.metrics:
+            self.metrics.record("export", f"sprite_{name}", ffdec_seconds + post_seconds,
+                                ffdec_seconds=ffdec_seconds, post_seconds=post_seconds, bytes=size, **fields)
+
+    @contextmanager
+    def content_lock(self, kind: str, content: str):
+        """按内容摘要加锁：同一份内容同一时间只有一个线程在导出或链接喵~"""
+        key = (kind, content)
+        with self._content_lock:
+            lock, users = self._content_locks.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._content_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._content_lock:
+                lock, users = self._content_locks[key]
+                if users == 1:
+                    del self._content_locks[key]
+                else:
+                    self._content_locks[key] = (lock, users - 1)
+
+    @staticmethod
+    def tree_size(path: str) -> int:
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+    def _reuse_stats(self, kind: str) -> dict:
+        return self.reuse_stats.setdefault(kind, {"exported": 0, "reused": 0, "saved_bytes": 0, "saved_seconds": 0.0})
+
+    def count_export(self, kind: str):
+        with self._content_lock:
+            self._reuse_stats(kind)["exported"] += 1
+
+    def count_reuse(self, kind: str, duration: float, saved_bytes: int, saved_seconds: float, **fields):
+        """记录一次复用：saved_bytes 为硬链接省下的磁盘空间，saved_seconds 为当初导出这份结果的 FFDec 耗时喵~"""
+        with self._content_lock:
+            stats = self._reuse_stats(kind)
+            stats["reused"] += 1
+            stats["saved_bytes"] += saved_bytes
+            stats["saved_seconds"] += saved_seconds
+        LIVE.incr("exports_reused_total", kind=kind)
+        LIVE.incr("export_saved_bytes_total", saved_bytes, kind=kind)
+        LIVE.incr("export_saved_seconds_total", saved_seconds, kind=kind)
+        if self.metrics:
+            self.metrics.record("export", f"reuse_{kind}", duration, saved_bytes=saved_bytes,
+                                saved_seconds=saved_seconds, **fields)
+
+    def log_export_summary(self):
+        """把各 sprite profile 的平均耗时和体积，以及复用省下的磁盘空间和 FFDec 耗时写进日志喵~"""
+        for name, stats in sorted(self.profile_stats.items()):
+            count = max(1, stats["sprites"])
+            logging.info(f"sprite 格式 {name}: 导出 {stats['sprites']} 个，平均 FFDec {stats['ffdec_seconds'] / count:.2f}秒、"
+                         f"后处理 {stats['post_seconds'] / count:.2f}秒、{stats['bytes'] / count / 1024:.1f}KB 喵~")
+        for kind, stats in sorted(self.reuse_stats.items()):
+            logging.info(f"{kind}: 导出 {stats['exported']} 个，复用 {stats['reused']} 个，"
+                         f"省下 {stats['saved_bytes'] / 1024 / 1024:.1f}MB 磁盘和 "
+                         f"{stats['saved_seconds']:.1f}秒 FFDec 耗时喵~")
+
+    @staticmethod
+    def sprite_output(output_dir: str, sprite_id: str) -> Optional[str]:
+        """FFDec 把 sprite 导出到 DefineSprite_<id> 或 DefineSprite_<id>_<链接名> 目录喵~"""
+        exact = os.path.join(output_dir, f"DefineSprite_{sprite_id}")
+        if os.path.isdir(exact):
+            return exact
+        prefix = f"DefineSprite_{sprite_id}_"
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix) and entry.is_dir():
+                    return entry.path
+        return None
+
+    def link_previous_sprite(self, n: str, sprite_id: str, content: str, output_dir: str) -> bool:
+        """导出过内容相同的 sprite 时把结果链接过来，返回是否复用成功喵~"""
+        previous = self.catalog.previous_export(n, self.sprite_kind, content)
+        if not previous:
+            return False
+        start = time.perf_counter()
+        old_n, old_id, old_dir, size, seconds = previous
+        archived = output_archive.split_member_path(old_dir)
+        if not archived and not os.path.isdir(old_dir):
+            return False
+        # 链接名后缀(DefineSprite_<id>_<链接名>)只在同一资源中沿用，别的SWF里的链接名对这里没有意义
+        suffix = os.path.basename(old_dir)[len(f"DefineSprite_{old_id}"):] if old_n == n else ""
+        target = os.path.join(output_dir, f"DefineSprite_{sprite_id}{suffix}")
+        linked = False
+        if archived:
+            # 已经打包进归档的结果只能解出来，不能硬链接
+            try:
+                if not output_archive.open_archive(archived[0]).extract(archived[1], target):
+                    return False
+            except (OSError, zipfile.BadZipFile, zlib.error) as e:
+                logging.warning(f"从归档中取出已导出的sprite {old_dir} 失败，重新导出: {e} 喵~")
+                return False
+        elif os.path.abspath(target) != os.path.abspath(old_dir):
+            try:
+                linked = True
+                for root, _, files in os.walk(old_dir):
+                    for name in files:
+                        linked &= link_or_copy(os.path.join(root, name),
+                                               os.path.join(target, os.path.relpath(root, old_dir), name))
+            except OSError as e:
+                logging.warning(f"链接已导出的sprite {old_dir} 失败，重新导出: {e} 喵~")
+                return False
+        self.catalog.record_export(n, self.sprite_kind, sprite_id, content, target, size, seconds)
+        self.count_reuse("sprite", time.perf_counter() - start, size if linked else 0, seconds, file=n)
+        if old_n == n:
+            logging.info(f"sprite {sprite_id} 内容未变，复用 {old_dir} 喵~")
+        else:
+            logging.info(f"sprite {sprite_id} 与 {old_n} 中的 sprite {old_id} 内容相同，复用 {old_dir} 喵~")
+        return True
+
+    def export_script(self, swf_file_path: str, flatten: bool = True, digest: Optional[str] = None) -> bool:
+        """导出scripts喵~
+
+        flatten=False 时保留 FFDec 的包目录结构，由 postprocess_file 稍后整理；
+        digest 为 catalog_entry 的结果，为 None 时用 FFDec dump 喵~
+        """
         output_dir = os.path.join(self.get_output_subdir(swf_file_path), "scripts")
         os.makedirs(output_dir, exist_ok=True)
 
+        n = self.cost_key(swf_file_path)
         try:
-            cmd_dump = ["java", "-jar", self.ffdec_path, "-dumpAS3", swf_file_path]
-            result = subprocess.run(cmd_dump, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                                    text=True, check=True)
-            config_scripts = [line.split()[0] for line in result.stdout.splitlines() 
-                              if ".config." in line.lower()]
+            if digest:
+                config_scripts = self.catalog.class_names(digest, self.script_pattern)
+            else:
+                result = self._run_java(["-dumpAS3", swf_file_path], "dumpAS3")
+                config_scripts = [line.split()[0] for line in result.stdout.splitlines()
+                                  if self.script_pattern in line.lower()]
             
             success = True
             for class_name in config_scripts:
-                cmd_export = [
-                    "java", "-jar", self.ffdec_path,
-                    "-format", "script:as",
-                    "-selectclass", class_name,
-                    "-export", "script",
-                    output_dir,  # 保持原有导出方式喵~
-                    swf_file_path
-                ]
-                try:
-                    subprocess.run(cmd_export, check=True, capture_output=True, text=True)
-                except subprocess.CalledProcessError as e:
-                    success = False
-                    logging.error(f"导出 {class_name} 失败: {e} 喵~")
-
-            # 新增：提取导出的as文件到output_dir目录下，并删除空文件夹喵~
-            for root, dirs, files in os.walk(output_dir, topdown=False):
-                # 如果不是顶层scripts目录则处理喵~
-                if os.path.abspath(root) != os.path.abspath(output_dir):
-                    for file in files:
-                        if file.lower().endswith('.as'):
-                            src_path = os.path.join(root, file)
-                            dst_path = os.path.join(output_dir, file)
-                            if os.path.exists(dst_path):
-                                # 如果目标文件已存在，则重命名以避免冲突喵~
-                                base, ext = os.path.splitext(file)
-                                counter = 1
-                                new_name = f"{base}_{counter}{ext}"
-                                dst_path = os.path.join(output_dir, new_name)
-                                while os.path.exists(dst_path):
-                                    counter += 1
-                                    new_name = f"{base}_{counter}{ext}"
-                                    dst_path = os.path.join(output_dir, new_name)
-                            shutil.move(src_path, dst_path)
-                            logging.info(f"移动 {src_path} 到 {dst_path} 喵~")
-                    # 删除空目录喵~
+                content = self.catalog.class_digest(digest, class_name) if digest else None
+                with self.content_lock("class", content) if content else nullcontext():
+                    if content and self.link_previous_script(n, class_name, content, output_dir):
+                        continue
+                    cmd_export = [
+                        "-format", "script:as",
+                        "-selectclass", class_name,
+                        "-export", "script",
+                        output_dir,  # 保持原有导出方式喵~
+                        swf_file_path
+                    ]
                     try:
-                        if not os.listdir(root):
-                            os.rmdir(root)
-                            logging.info(f"删除空目录 {root} 喵~")
-                    except Exception as e:
-                        logging.error(f"删除目录 {root} 失败: {e} 喵~")
-            
-            # 若顶层scripts目录为空，则也删除之喵~
-            if not os.listdir(output_dir):
-                os.rmdir(output_dir)
-                logging.info(f"删除空目录 {output_dir} 喵~")
+                        start = time.perf_counter()
+                        self._run_java(cmd_export, "export_script")
+                        seconds = time.perf_counter() - start
+                    except subprocess.CalledProcessError as e:
+                        success = False
+                        logging.error(f"导出 {class_name} 失败: {e} 喵~")
+                        continue
+                    self.count_export("class")
+                    if content:
+                        exported = os.path.join(output_dir, *class_name.split(".")) + ".as"
+                        size = os.path.getsize(exported) if os.path.isfile(exported) else 0
+                        self.catalog.record_export(n, "class", class_name, content, output_dir, size, seconds)
+
+            if flatten:
+                self.flatten_scripts(output_dir)
             
             return success
         except subprocess.CalledProcessError as e:
             logging.error(f"导出scripts失败: {e} 喵~")
             return False
 
+    def link_previous_script(self, n: str, class_name: str, content: str, output_dir: str) -> bool:
+        """导出过内容相同的类时把 .as 文件链接到 FFDec 会导出的位置，返回是否复用成功喵~"""
+        previous = self.catalog.previous_export(n, "class", content)
+        if not previous:
+            return False
+        start = time.perf_counter()
+        old_n, old_class, old_dir, size, seconds = previous
+        linked = False
+        archived = output_archive.split_member_path(old_dir)
+        if archived:
+            data = self.read_archived_script(*archived, old_class)
+            if data is None:
+                return False
+            try:
+                target = os.path.join(output_dir, *class_name.split(".")) + ".as"
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as f:
+                    f.write(data)
+            except OSError as e:
+                logging.warning(f"写出归档中的 {old_class} 失败，重新导出: {e} 喵~")
+                return False
+        elif os.path.abspath(old_dir) != os.path.abspath(output_dir):
+            src = self.find_exported_script(old_dir, old_class)
+            if not src:
+                return False
+            try:
+                linked = link_or_copy(src, os.path.join(output_dir, *class_name.split(".")) + ".as")
+            except OSError as e:
+                logging.warning(f"链接已导出的 {old_class} 失败，重新导出: {e} 喵~")
+                return False
+        self.catalog.record_export(n, "class", class_name, content, output_dir, size, seconds)
+        self.count_reuse("class", time.perf_counter() - start, size if linked else 0, seconds, file=n)
+        if old_n == n:
+            logging.info(f"{class_name} 内容未变，复用 {old_dir} 中的导出结果喵~")
+        else:
+            logging.info(f"{class_name} 与 {old_n} 中的同名类内容相同，复用 {old_dir} 中的导出结果喵~")
+        return True
+
+    @staticmethod
+    def read_archived_script(archive_path: str, scripts_member: str, class_name: str) -> Optional[bytes]:
+        """从归档中读出类对应的 .as，查找方式同 find_exported_script 喵~"""
+        try:
+            archive = output_archive.open_archive(archive_path)
+            nested = f"{scripts_member}/{class_name.replace('.', '/')}.as"
+            if nested in archive:
+                return archive.read(nested)
+            map_member = posixpath.join(posixpath.dirname(scripts_member), "scripts_map.json")
+            if map_member not in archive:
+                return None
+            flat_name = json.loads(archive.read(map_member)).get(class_name)
+            flat = f"{scripts_member}/{flat_name}" if flat_name else None
+            return archive.read(flat) if flat and flat in archive else None
+        except (OSError, ValueError, zipfile.BadZipFile, zlib.error) as e:
+            logging.warning(f"从归档 {archive_path} 中读取 {class_name} 失败: {e} 喵~")
+            return None
+
+    @staticmethod
+    def find_exported_script(scripts_dir: str, class_name: str) -> Optional[str]:
+        """在导出过的 scripts 目录中找到类对应的 .as：还没整理时在包目录下，整理后查 scripts_map.json 喵~"""
+        nested = os.path.join(scripts_dir, *class_name.split(".")) + ".as"
+        if os.path.isfile(nested):
+            return nested
+        try:
+            with open(os.path.join(os.path.dirname(scripts_dir), "scripts_map.json"), "r", encoding="utf-8") as f:
+                flat_name = json.load(f).get(class_name)
+        except (OSError, ValueError):
+            return None
+        flat = os.path.join(scripts_dir, flat_name) if flat_name else None
+        return flat if flat and os.path.isfile(flat) else None
+
+    def flatten_scripts(self, output_dir: str):
+        """把导出的as文件提取到scripts目录顶层，并删除空文件夹喵~
+
+        遍历一次目录树建立内存中的文件名索引，据此一次性分配不冲突的文件名，
+        不再逐个 os.path.exists 试探；重命名结果(类名 → 顶层文件名)写入同级的
+        scripts_map.json，最后由深到浅尝试 rmdir 一遍清理空目录喵~
+        """
+        if not os.path.isdir(output_dir):
+            return
+        top_names = set()
+        nested = []
+        subdirs = []
+        for root, dirs, files in os.walk(output_dir):
+            dirs.sort()
+            if root == output_dir:
+                top_names.update(name.lower() for name in files)
+                continue
+            subdirs.append(root)
+            nested.extend((root, name) for name in sorted(files) if name.lower().endswith('.as'))
+
+        # 按小写比较，Windows 上大小写不同的文件名也算冲突
+        next_suffix = {}
+        mapping = {}
+        for root, name in nested:
+            base, ext = os.path.splitext(name)
+            new_name = name
+            if new_name.lower() in top_names:
+                counter = next_suffix.get(name.lower(), 1)
+                while f"{base}_{counter}{ext}".lower() in top_names:
+                    counter += 1
+                next_suffix[name.lower()] = counter + 1
+                new_name = f"{base}_{counter}{ext}"
+            top_names.add(new_name.lower())
+            src_path = os.path.join(root, name)
+            try:
+                os.replace(src_path, os.path.join(output_dir, new_name))
+            except OSError as e:
+                logging.error(f"移动 {src_path} 失败: {e} 喵~")
+                continue
+            package = os.path.relpath(root, output_dir).replace(os.sep, ".")
+            mapping[f"{package}.{base}"] = new_name
+        if mapping:
+            logging.info(f"整理 {output_dir}: 移动 {len(mapping)} 个脚本到顶层喵~")
+            self.write_script_map(output_dir, mapping)
+
+        # 一遍清理：由深到浅 rmdir，非空目录由 rmdir 自己拒绝
+        for path in sorted(subdirs, key=lambda d: d.count(os.sep), reverse=True) + [output_dir]:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def write_script_map(output_dir: str, mapping: dict):
+        """合并写入 scripts_map.json(类名 → scripts 目录下的文件名)喵~"""
+        map_path = os.path.join(os.path.dirname(output_dir), "scripts_map.json")
+        try:
+            with open(map_path, "r", encoding="utf-8") as f:
+                mapping = {**json.load(f), **mapping}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取 {map_path} 失败，将重新生成: {e} 喵~")
+        try:
+            with open(map_path, "w", encoding="utf-8") as f:
+                json.dump(mapping, f, ensure_ascii=False, indent=2, sort_keys=True)
+        except OSError as e:
+            logging.error(f"写入 {map_path} 失败: {e} 喵~")
+
 def main():
     """主函数喵~"""
     exporter = FFDecExporter()
@@ -288,13 +892,37 @@ def main():
     if not exporter.validate_paths():
         return
     
+    exporter.resource_sampler = ResourceSampler().start()
+    exporter.metrics = RunMetrics("ffdec_export")
+    exporter.cost_model = ExportCostModel()
+    exporter.catalog = SwfCatalog()
+    exporter.file_index = FileIndex()
+    exporter.content_index = content_index.ContentIndex()
+    exporter.begin_file_index()
+    exporter.begin_content_index()
+    if profiling_enabled():
+        exporter.profiler = StageProfiler(os.path.join(exporter.output_dir, "profile"))
     start_time = time.time()
     exporter.process_files()
     end_time = time.time()
+    exporter.resource_sampler.stop()
+    if exporter.profiler:
+        exporter.profiler.write()
+    exporter.metrics.log_summary()
+    exporter.metrics.write(exporter.output_dir)
+    exporter.log_export_summary()
+    if exporter.archive:
+        exporter.archive.close()
+    # 内容索引也在共用进程池中分词，收录完之后再关闭进程池
+    exporter.update_content_index()
+    exporter.update_file_index()
+    process_pool.shutdown_pool()
+    exporter.file_index.close()
+    exporter.content_index.close()
     
     print("\n=== 处理统计 ===")
     print(f"总耗时: {end_time - start_time:.2f}秒")
-    print(f"平均每个文件耗时: {(end_time - start_time) / exporter.total_files:.2f}秒")
+    print(f"平均每个文件耗时: {(end_time - start_time) / max(1, exporter.total_files):.2f}秒")
     print(f"使用线程数: {exporter.max_workers}")
     
     # 显示系统资源使用情况
@@ -0,0 +1,235 @@
+"""
+导出文件的文件名索引喵~
+记录所有导出文件的路径(普通文件为绝对路径，归档中的成员为 <zip路径>!/<成员路径>)，
+并把文件名(小写)拆成三元组建立倒排表，按文件名子串查找时只需要求几个三元组的交集，
+不用每次 os.walk 整个输出目录。导出器每处理完一个SWF就把它的输出加进来，运行结束时
+再把整个输出目录收录一遍并登记为已收录；其他目录第一次查询时整体收录一次，之后用 index 子命令刷新喵~
+
+    python file_index.py index <目录>                  收录目录下的所有文件(含带索引的导出归档)
+    python file_index.py search <子串> [--under 目录]   按文件名子串查找
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+import output_archive
+
+DEFAULT_FILE_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "file_index.db")
+# 查询时最多求几个三元组的交集：取最少见的几个，剩下的靠子串比较过滤
+MAX_QUERY_GRAMS = 3
+INDEX_VERSION = 2
+
+_SCHEMA = (
+    # key 是按 path_key 规范化(Windows 下不区分大小写)的路径，按目录的范围查询用它
+    "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, key TEXT NOT NULL,"
+    " name TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS files_key ON files (key)",
+    # 三元组按 Unicode 码位压成一个整数(每个字符21位)，中文文件名也适用
+    "CREATE TABLE IF NOT EXISTS grams (gram INTEGER NOT NULL, file_id INTEGER NOT NULL,"
+    " PRIMARY KEY (gram, file_id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS gram_counts (gram INTEGER PRIMARY KEY, n INTEGER NOT NULL)",
+    # 已经完整收录过的目录；导出器在运行结束、整个输出目录收录完后登记
+    "CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, indexed_at REAL NOT NULL)",
+)
+
+
+def trigrams(text: str) -> Set[int]:
+    """text(小写后)中所有三元组的整数编码喵~"""
+    text = text.lower()
+    return {(ord(text[i]) << 42) | (ord(text[i + 1]) << 21) | ord(text[i + 2]) for i in range(len(text) - 2)}
+
+
+def _name(path: str) -> str:
+    archived = output_archive.split_member_path(path)
+    return archived[1].rsplit("/", 1)[-1] if archived else os.path.basename(path)
+
+
+def normalize_path(path: str) -> str:
+    """统一成绝对路径；归档成员只规范化 zip 的路径部分喵~"""
+    archived = output_archive.split_member_path(path)
+    if archived:
+        return output_archive.member_path(os.path.abspath(archived[0]), archived[1])
+    return os.path.abspath(path)
+
+
+def path_key(path: str) -> str:
+    """normalize_path 之后再按 os.path.normcase 规范化，与 covers 的比较方式一致；归档成员名保持原样喵~"""
+    path = normalize_path(path)
+    archived = output_archive.split_member_path(path)
+    if archived:
+        return output_archive.member_path(os.path.normcase(archived[0]), archived[1])
+    return os.path.normcase(path)
+
+
+def path_range(directory: str) -> Tuple[str, str]:
+    """directory 下所有路径的 path_key 所在的字符串区间 [下界, 上界)，用于按目录做范围查询喵~"""
+    prefix = os.path.normcase(os.path.abspath(directory)).rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class FileIndex:
+    def __init__(self, path: str = DEFAULT_FILE_INDEX):
+        """打开(或创建)文件名索引喵~"""
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            for (table,) in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                self._db.execute(f"DROP TABLE IF EXISTS {table}")
+            self._db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def add(self, paths: Iterable[str]) -> int:
+        """加入一批文件路径，已经收录的跳过，返回新增数喵~"""
+        added = 0
+        with self._lock:
+            for path in paths:
+                path = normalize_path(path)
+                name = _name(path)
+                cursor = self._db.execute("INSERT OR IGNORE INTO files (path, key, name) VALUES (?, ?, ?)",
+                                          (path, path_key(path), name))
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                grams = trigrams(name)
+                self._db.executemany("INSERT INTO grams (gram, file_id) VALUES (?, ?)",
+                                     [(gram, cursor.lastrowid) for gram in grams])
+                self._db.executemany(
+                    "INSERT INTO gram_counts (gram, n) VALUES (?, 1) ON CONFLICT (gram) DO UPDATE SET n = n + 1",
+                    [(gram,) for gram in grams])
+            self._db.commit()
+        return added
+
+    def remove(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                row = self._db.execute("SELECT id, name FROM files WHERE path = ?", (normalize_path(path),)).fetchone()
+                if not row:
+                    continue
+                grams = trigrams(row[1])
+                self._db.execute("DELETE FROM grams WHERE file_id = ?", (row[0],))
+                self._db.executemany("UPDATE gram_counts SET n = n - 1 WHERE gram = ?", [(gram,) for gram in grams])
+                self._db.execute("DELETE FROM files WHERE id = ?", (row[0],))
+            self._db.commit()
+
+    def add_root(self, directory: str):
+        """登记一个已经完整收录的目录喵~"""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO roots (path, indexed_at) VALUES (?, ?)",
+                             (os.path.abspath(directory), time.time()))
+            self._db.commit()
+
+    def remove_root(self, directory: str):
+        """取消 directory 及包含它的目录的登记；之后查询这些目录时会重新收录一次喵~"""
+        directory = os.path.normcase(os.path.abspath(directory))
+        with self._lock:
+            for (root,) in self._db.execute("SELECT path FROM roots").fetchall():
+                normalized = os.path.normcase(root)
+                if directory == normalized or directory.startswith(normalized.rstrip(os.sep) + os.sep):
+                    self._db.execute("DELETE FROM roots WHERE path = ?", (root,))
+            self._db.commit()
+
+    def covers(self, directory: str) -> bool:
+        """directory 是否在某个登记过的目录之内喵~"""
+        directory = os.path.normcase(os.path.abspath(directory))
+        with self._lock:
+            roots = [os.path.normcase(path) for path, in self._db.execute("SELECT path FROM roots").fetchall()]
+        return any(directory == root or directory.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+    def index_tree(self, directory: str) -> int:
+        """收录目录下的所有文件并登记该目录；带偏移索引的导出归档收录其中的成员喵~"""
+        paths = []
+        for root, _, files in os.walk(directory):
+            names = set(files)
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".zip") and name + output_archive.INDEX_SUFFIX in names:
+                    try:
+                        with output_archive.ExportArchive(path) as archive:
+                            paths.extend(output_archive.member_path(archive.path, member)
+                                         for member in archive.names())
+                    except (OSError, ValueError) as e:
+                        logging.warning(f"读取导出归档 {path} 失败: {e} 喵~")
+                    continue
+                if name.endswith(output_archive.INDEX_SUFFIX):
+                    continue
+                paths.append(path)
+        added = self.add(paths)
+        self.add_root(directory)
+        return added
+
+    def search(self, substring: str, under: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """文件名包含 substring(区分大小写，与原来的 in 判断一致)的路径，可以限定在 under 目录下喵~"""
+        if not substring:
+            return []
+        where, params = [], []
+        if under:
+            where.append("f.key >= ? AND f.key < ?")
+            params += list(path_range(under))
+        with self._lock:
+            grams = list(trigrams(substring))
+            if grams:
+                counts = dict(self._db.execute(
+                    f"SELECT gram, n FROM gram_counts WHERE gram IN ({','.join('?' * len(grams))})", grams).fetchall())
+                if any(counts.get(gram, 0) <= 0 for gram in grams):
+                    return []
+                rarest = sorted(grams, key=lambda gram: counts[gram])[:MAX_QUERY_GRAMS]
+                where.insert(0, "f.id IN (" + " INTERSECT ".join(
+                    "SELECT file_id FROM grams WHERE gram = ?" for _ in rarest) + ")")
+                params = rarest + params
+            else:
+                # 不足3个字符时没有三元组可用，直接扫描文件名
+                where.append("instr(f.name, ?) > 0")
+                params.append(substring)
+            rows = self._db.execute(
+                f"SELECT f.path, f.name FROM files f WHERE {' AND '.join(where)} ORDER BY f.path", params)
+            result = []
+            for path, name in rows:
+                if substring in name:
+                    result.append(path)
+                    if limit and len(result) >= limit:
+                        break
+        return result
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出文件的文件名索引")
+    parser.add_argument("--db", default=DEFAULT_FILE_INDEX, help="索引数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index = sub.add_parser("index", help="收录目录下的文件")
+    index.add_argument("directory")
+    search = sub.add_parser("search", help="按文件名子串查找")
+    search.add_argument("substring")
+    search.add_argument("--under", help="只在该目录下查找")
+    search.add_argument("--limit", type=int, default=50, help="最多列出多少条，0 表示全部")
+    args = parser.parse_args()
+
+    file_index = FileIndex(args.db)
+    start = time.perf_counter()
+    if args.command == "index":
+        added = file_index.index_tree(args.directory)
+        print(f"新收录 {added} 个文件，耗时 {time.perf_counter() - start:.2f}秒 喵~")
+    else:
+        paths = file_index.search(args.substring, args.under)
+        for path in paths[:args.limit or None]:
+            print(path)
+        print(f"共 {len(paths)} 个文件，查询耗时 {(time.perf_counter() - start) * 1000:.1f}ms 喵~")
+    file_index.close()
+
+
+if __name__ == "__main__":
+    main()
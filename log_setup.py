@@ -0,0 +1,34 @@
+"""
+统一的日志设置喵~
+整个进程只配置一次：第一个调用者决定日志文件名，之后的调用直接返回同一个文件路径。
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_lock = threading.Lock()
+_log_file: Optional[str] = None
+
+
+def setup_logging(name: str = "auto_extract", level: int = logging.INFO) -> str:
+    """配置根日志(文件 + 控制台)，返回日志文件路径喵~"""
+    global _log_file
+    with _lock:
+        if _log_file is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            _log_file = os.path.join(LOG_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.log")
+            logging.basicConfig(
+                level=level,
+                format=LOG_FORMAT,
+                handlers=[
+                    logging.FileHandler(_log_file, encoding='utf-8'),
+                    logging.StreamHandler()
+                ]
+            )
+        return _log_file
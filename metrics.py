@@ -0,0 +1,209 @@
+"""
+运行指标与运行报告喵~
+  - RunMetrics: 线程安全地记录每个阶段、每个文件的耗时事件(HTTP延迟和字节数、JVM启动/工作耗时、排队等待等)
+  - percentiles: 按最近秩法计算分位数
+  - LiveStats / LIVE: 进程级的实时计数器和仪表，供 metrics_server 以 Prometheus/JSON 格式对外暴露
+运行结束后写出两份文件：
+  <name>.jsonl  每行一个原始事件
+  <name>.json   按 (阶段, 事件) 汇总的次数、总量和 p50/p90/p95/p99/max
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+PERCENTILES = (50, 90, 95, 99)
+# 这些字段按取值计数(如 {"200": 40, "404": 2})，而不是求分位数
+CATEGORICAL_FIELDS = ("status", "returncode", "ok")
+
+
+def percentiles(values: Sequence[float], points: Sequence[int] = PERCENTILES) -> Dict[str, float]:
+    """最近秩法分位数，values 为空时返回空字典喵~"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        result[f"p{p}"] = ordered[rank - 1]
+    result["max"] = ordered[-1]
+    return result
+
+
+class RunMetrics:
+    def __init__(self, name: str):
+        """一次运行(例如处理一个版本)的指标记录器喵~"""
+        self.name = name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._events: List[dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, event: str, duration: float, **fields):
+        """记录一个事件，duration 单位为秒，其余字段(如 bytes、status、file)原样写入报告喵~"""
+        entry = {"t": round(time.perf_counter() - self._start, 6), "stage": stage, "event": event,
+                 "duration": duration}
+        entry.update(fields)
+        with self._lock:
+            self._events.append(entry)
+
+    @contextmanager
+    def timer(self, stage: str, event: str, **fields):
+        """用 with 包住一段代码并记录耗时喵~"""
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(stage, event, time.perf_counter() - start, **fields)
+
+    @property
+    def events(self) -> List[dict]:
+        with self._lock:
+            return list(self._events)
+
+    def summary(self) -> dict:
+        """按 (阶段, 事件) 汇总：次数、吞吐，以及每个数值字段的总量和分位数喵~"""
+        elapsed = time.perf_counter() - self._start
+        groups: Dict[Tuple[str, str], List[dict]] = {}
+        for entry in self.events:
+            groups.setdefault((entry["stage"], entry["event"]), []).append(entry)
+
+        stages: Dict[str, dict] = {}
+        for (stage, event), entries in sorted(groups.items()):
+            numeric: Dict[str, List[float]] = {}
+            categorical: Dict[str, Dict[str, int]] = {}
+            for entry in entries:
+                for key, value in entry.items():
+                    if key in CATEGORICAL_FIELDS:
+                        counts = categorical.setdefault(key, {})
+                        counts[str(value)] = counts.get(str(value), 0) + 1
+                    elif key != "t" and isinstance(value, (int, float)) and not isinstance(value, bool):
+                        numeric.setdefault(key, []).append(value)
+            stats = {"count": len(entries), "per_second": round(len(entries) / elapsed, 3) if elapsed else 0.0}
+            stats.update(categorical)
+            for key, values in numeric.items():
+                stats[key] = {"sum": round(sum(values), 6),
+                              **{k: round(v, 6) for k, v in percentiles(values).items()}}
+            stages.setdefault(stage, {})[event] = stats
+
+        return {
+            "name": self.name,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "wall_seconds": round(elapsed, 3),
+            "stages": stages,
+        }
+
+    def write(self, directory: str, basename: str = "run_report") -> Optional[str]:
+        """写出 JSONL 原始事件和 JSON 汇总，返回汇总文件路径喵~"""
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{basename}.jsonl"), "w", encoding="utf-8") as f:
+                for entry in self.events:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            report_path = os.path.join(directory, f"{basename}.json")
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+            logging.info(f"运行报告已写入: {report_path} 喵~")
+            return report_path
+        except OSError as e:
+            logging.error(f"写入运行报告失败: {e} 喵~")
+            return None
+
+    def log_summary(self):
+        """把关键耗时写进日志，便于一眼看出时间花在哪里喵~"""
+        summary = self.summary()
+        logging.info(f"[{self.name}] 总耗时 {summary['wall_seconds']:.2f}秒 喵~")
+        for stage, events in summary["stages"].items():
+            for event, stats in events.items():
+                duration = stats.get("duration", {})
+                logging.info(f"[{self.name}] {stage}/{event}: {stats['count']} 次, "
+                             f"合计 {duration.get('sum', 0):.2f}秒, p50 {duration.get('p50', 0) * 1000:.0f}ms, "
+                             f"p95 {duration.get('p95', 0) * 1000:.0f}ms, max {duration.get('max', 0) * 1000:.0f}ms 喵~")
+
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: dict) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class LiveStats:
+    def __init__(self, rate_window: float = 10.0):
+        """实时指标喵~
+          - 计数器(incr): 单调递增，附带最近 rate_window 秒的速率
+          - 水位(adjust): 可增可减的当前值，例如在途请求数
+          - 仪表(gauge): 读取时调用回调取值，例如缓存命中率
+        """
+        self.rate_window = rate_window
+        self._levels: Dict[LabelKey, float] = {}
+        self._counters: Dict[LabelKey, float] = {}
+        self._recent: Dict[LabelKey, deque] = {}
+        self._gauges: Dict[LabelKey, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        now = int(time.monotonic())
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            buckets = self._recent.setdefault(key, deque())
+            if buckets and buckets[-1][0] == now:
+                buckets[-1][1] += value
+            else:
+                buckets.append([now, value])
+            while buckets and buckets[0][0] <= now - self.rate_window:
+                buckets.popleft()
+
+    def adjust(self, name: str, delta: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._levels[key] = self._levels.get(key, 0) + delta
+
+    @contextmanager
+    def tracking(self, name: str, **labels):
+        """with 块执行期间水位加一喵~"""
+        self.adjust(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.adjust(name, -1, **labels)
+
+    def gauge(self, name: str, func: Callable[[], float], **labels):
+        """注册一个仪表，取值时调用 func；同名同标签的仪表会被替换喵~"""
+        with self._lock:
+            self._gauges[_key(name, labels)] = func
+
+    def remove_gauge(self, name: str, **labels):
+        with self._lock:
+            self._gauges.pop(_key(name, labels), None)
+
+    def _rate(self, key: LabelKey, now: int) -> float:
+        buckets = self._recent.get(key, ())
+        return sum(v for t, v in buckets if t > now - self.rate_window) / self.rate_window
+
+    def snapshot(self) -> dict:
+        """返回 {"counters": [...], "rates": [...], "gauges": [...]}，每项为 (名称, 标签, 值) 喵~"""
+        now = int(time.monotonic())
+        with self._lock:
+            counters = list(self._counters.items())
+            rates = [(key, self._rate(key, now)) for key, _ in counters]
+            gauges = list(self._gauges.items())
+            levels = list(self._levels.items())
+        gauge_values = levels
+        for key, func in gauges:
+            try:
+                gauge_values.append((key, float(func())))
+            except Exception as e:
+                logging.debug(f"读取仪表 {key[0]} 失败: {e}")
+        return {"counters": counters, "rates": rates, "gauges": gauge_values}
+
+
+# 整个进程共用的实时指标
+LIVE = LiveStats()
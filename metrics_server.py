@@ -0,0 +1,109 @@
+"""
+本地实时指标接口喵~
+  GET /metrics       Prometheus 文本格式
+  GET /metrics.json  同样的数据，JSON 格式
+数据来自 metrics.LIVE：队列深度、在途下载和 JVM 数、字节/文件速率、错误数、缓存命中率等。
+默认只监听 127.0.0.1，长时间运行的服务模式下用来观察吞吐、发现卡住的阶段喵~
+"""
+
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from metrics import LIVE, LiveStats
+
+PREFIX = "aola_"
+
+
+def _labels_text(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        escaped = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus(stats: LiveStats) -> str:
+    """计数器输出为 counter，同时附带最近窗口的 *_per_second 速率，仪表输出为 gauge喵~"""
+    snapshot = stats.snapshot()
+    families = {}
+    for (name, labels), value in snapshot["counters"]:
+        families.setdefault((PREFIX + name, "counter"), []).append((labels, value))
+    for (name, labels), value in snapshot["rates"]:
+        base = name[:-len("_total")] if name.endswith("_total") else name
+        families.setdefault((f"{PREFIX}{base}_per_second", "gauge"), []).append((labels, value))
+    for (name, labels), value in snapshot["gauges"]:
+        families.setdefault((PREFIX + name, "gauge"), []).append((labels, value))
+
+    lines = []
+    for (name, kind), samples in sorted(families.items()):
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels_text(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def render_json(stats: LiveStats) -> dict:
+    snapshot = stats.snapshot()
+    result = {}
+    for section, items in snapshot.items():
+        grouped = result.setdefault(section, {})
+        for (name, labels), value in items:
+            grouped.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    return result
+
+
+class MetricsServer:
+    def __init__(self, port: int, host: str = "127.0.0.1", stats: LiveStats = LIVE):
+        """在后台线程中提供指标接口，port 为 0 时由系统分配端口喵~"""
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _handler(self):
+        stats = self.stats
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body = render_prometheus(stats).encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/metrics.json":
+                    body = json.dumps(render_json(stats), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MetricsServer":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logging.info(f"指标接口已启动: http://{self.host}:{self.port}/metrics (JSON: /metrics.json) 喵~")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
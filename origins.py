@@ -0,0 +1,214 @@
+"""
+多源站下载喵~
+  - 源站列表可以通过环境变量 AOLA_ORIGINS(逗号分隔)配置
+  - 记录每个源站的延迟和连续失败次数，失败过多的源站暂时下线，请求自动切换到下一个源站
+  - 对冲请求: 第一个请求超过近期 p95 延迟还没返回时，向另一个源站补发一个请求，谁先成功用谁
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+DEFAULT_ORIGINS = [
+    "http://aola.100bt.com/play/",
+    "https://aola.100bt.com/play/",
+]
+
+
+def load_origins(origins: Optional[List[str]] = None) -> List[str]:
+    """读取源站列表，优先级: 参数 > 环境变量 AOLA_ORIGINS > 默认值喵~"""
+    if not origins:
+        env = os.environ.get("AOLA_ORIGINS", "")
+        origins = [o.strip() for o in env.split(",") if o.strip()] or DEFAULT_ORIGINS
+    return [o if o.endswith("/") else o + "/" for o in origins]
+
+
+def is_origin_error(response) -> bool:
+    """429/5xx 视为源站故障，其它状态码(包括404)都是源站给出的确定答复喵~"""
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class OriginHealth:
+    def __init__(self, base: str):
+        """单个源站的健康状态喵~"""
+        self.base = base
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_up(self, now: float) -> bool:
+        return now >= self.down_until
+
+
+class OriginPool:
+    def __init__(self, origins: Optional[List[str]] = None, hedge_quantile: float = 0.95,
+                 min_samples: int = 20, max_failures: int = 3, cooldown: float = 30.0,
+                 max_threads: int = 128):
+        """源站池喵~"""
+        self.origins = load_origins(origins)
+        self.health: Dict[str, OriginHealth] = {o: OriginHealth(o) for o in self.origins}
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._max_threads = max_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def primary(self) -> str:
+        return self.origins[0]
+
+    def url(self, path: str, origin: Optional[str] = None) -> str:
+        return urljoin(origin or self.primary, path)
+
+    def ordered(self) -> List[str]:
+        """可用源站按延迟排序，下线的源站排在最后喵~"""
+        now = time.monotonic()
+        with self._lock:
+            def key(origin):
+                h = self.health[origin]
+                latency = h.ewma_latency if h.ewma_latency is not None else 0.0
+                return (not h.is_up(now), latency, self.origins.index(origin))
+            return sorted(self.origins, key=key)
+
+    def hedge_delay(self) -> Optional[float]:
+        """近期成功请求延迟的 p95，样本不足时不做对冲喵~"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            samples = sorted(self._latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+
+    def record(self, origin: str, latency: float, ok: bool):
+        """记录一次请求结果喵~"""
+        with self._lock:
+            h = self.health[origin]
+            h.requests += 1
+            if ok:
+                h.consecutive_failures = 0
+                h.ewma_latency = latency if h.ewma_latency is None else 0.8 * h.ewma_latency + 0.2 * latency
+                self._latencies.append(latency)
+                return
+            h.failures += 1
+            h.consecutive_failures += 1
+            if h.consecutive_failures >= self.max_failures and h.is_up(time.monotonic()):
+                h.down_until = time.monotonic() + self.cooldown
+                logging.warning(f"源站 {origin} 连续失败 {h.consecutive_failures} 次，暂停使用 {self.cooldown:.0f} 秒喵~")
+
+    def _attempt(self, origin: str, path: str, request: Callable):
+        start = time.monotonic()
+        try:
+            response = request(self.url(path, origin))
+        except Exception:
+            self.record(origin, time.monotonic() - start, False)
+            raise
+        self.record(origin, time.monotonic() - start, not is_origin_error(response))
+        return response
+
+    def _submit(self, origin: str, path: str, request: Callable):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_threads,
+                                                    thread_name_prefix="origin")
+        return self._executor.submit(self._attempt, origin, path, request)
+
+    @staticmethod
+    def _close(response):
+        """关掉用不上的 response，把流式下载占着的连接还回连接池喵~"""
+        close = getattr(response, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            logging.debug(f"关闭对冲请求的 response 失败: {e} 喵~")
+
+    def _discard(self, future):
+        """放弃一个在途请求：还没开始的直接取消，已经在跑的等它返回后关掉 response 喵~"""
+        if future.cancel():
+            return
+
+        def close_result(f):
+            if not f.cancelled() and f.exception() is None:
+                self._close(f.result())
+
+        future.add_done_callback(close_result)
+
+    def fetch(self, path: str, request: Callable) -> Tuple[str, object]:
+        """按健康度依次尝试各源站下载 path，返回 (源站, response) 喵~
+
+        request 接收完整URL并返回 response。首个请求超过 p95 延迟仍未返回时
+        会向下一个源站发出对冲请求(同一时刻最多两个请求，只有一个源站时不对冲)。
+        输掉竞速的和出错后被替换掉的 response 都会被关闭。
+        所有源站都失败时抛出最后一个异常，或返回最后一个出错的 response 喵~
+        """
+        origins = self.ordered()
+        delay = self.hedge_delay() if len(origins) > 1 else None
+        futures = {}
+        launched = 0
+        hedged = False
+        last_error: Optional[BaseException] = None
+        last_failure = None
+
+        def launch():
+            nonlocal launched
+            origin = origins[launched]
+            futures[self._submit(origin, path, request)] = (origin, launched)
+            launched += 1
+
+        launch()
+        while futures:
+            # 源站都已经用过(比如首个源站很快失败、已切换到最后一个)时没有可对冲的对象
+            can_hedge = delay is not None and not hedged and len(futures) == 1 and launched < len(origins)
+            done, _ = wait(list(futures), timeout=delay if can_hedge else None,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                # 首个请求比 p95 还慢，补发一个对冲请求
+                hedged = True
+                with self._lock:
+                    self.hedged += 1
+                launch()
+                continue
+            winner = None
+            for future in done:
+                origin, attempt = futures.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if winner is not None:
+                    self._close(response)
+                elif not is_origin_error(response):
+                    winner = origin, response
+                    if hedged and attempt > 0:
+                        with self._lock:
+                            self.hedge_wins += 1
+                else:
+                    if last_failure is not None:
+                        self._close(last_failure[1])
+                    last_failure = (origin, response)
+            if winner is not None:
+                for future in futures:
+                    self._discard(future)
+                if last_failure is not None:
+                    self._close(last_failure[1])
+                return winner
+            # 在途请求都失败了，故障切换到下一个源站
+            if not futures and launched < len(origins):
+                launch()
+
+        if last_failure is not None:
+            return last_failure
+        raise last_error
@@ -0,0 +1,336 @@
+"""
+归档形式的导出结果喵~
+每个版本的导出结果可以不留在 exported/ 下成千上万个小文件里，而是在每个SWF后处理完成后
+写进同一个 zip(diff_<旧>_<新>/exported.zip)，再删掉临时文件。zip 旁边的 exported.zip.index.json
+记录每个成员的本地文件头偏移和大小，读取时直接 seek 过去解压，不用解析整个中央目录；
+备份、rsync、遍历都只面对两个文件喵~
+
+    python output_archive.py ls <zip> [前缀]          列出成员
+    python output_archive.py cat <zip> <成员>         输出成员内容
+    python output_archive.py extract <zip> <前缀> <目录>  解出前缀下的成员
+"""
+
+import argparse
+import json
+import logging
+import os
+import posixpath
+import shutil
+import struct
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# files: 导出结果保留为文件(默认)；archive: 打包进归档
+OUTPUT_MODES = ("files", "archive")
+INDEX_SUFFIX = ".index.json"
+# 导出记录中归档里的位置写成 <zip路径>!/<成员路径>
+ARCHIVE_SEPARATOR = "!/"
+# 本身已经压缩过的格式直接存储，压缩只会白费CPU
+STORED_EXTENSIONS = {".gif", ".png", ".jpg", ".jpeg", ".avi", ".mp4", ".webp", ".swf"}
+
+# 成员 → [本地文件头偏移, 压缩后大小, 原始大小, 压缩方式]
+Entry = List[int]
+
+
+def _entry(info: zipfile.ZipInfo) -> Entry:
+    return [info.header_offset, info.compress_size, info.file_size, info.compress_type]
+
+
+def _read_entry(fp, entry: Entry) -> bytes:
+    offset, compress_size, _, method = entry
+    fp.seek(offset)
+    header = fp.read(30)
+    if header[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"偏移 {offset} 处不是本地文件头")
+    name_length, extra_length = struct.unpack_from("<HH", header, 26)
+    fp.seek(offset + 30 + name_length + extra_length)
+    data = fp.read(compress_size)
+    if method == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(data, -15)
+    if method != zipfile.ZIP_STORED:
+        raise zipfile.BadZipFile(f"不支持的压缩方式 {method}")
+    return data
+
+
+def member_path(archive_path: str, member: str) -> str:
+    return f"{archive_path}{ARCHIVE_SEPARATOR}{member}"
+
+
+def split_member_path(output: str) -> Optional[Tuple[str, str]]:
+    """导出记录里的位置在归档中时返回 (zip路径, 成员路径)，普通路径返回 None 喵~"""
+    if ARCHIVE_SEPARATOR not in output:
+        return None
+    archive_path, member = output.split(ARCHIVE_SEPARATOR, 1)
+    return archive_path, member
+
+
+class _Members:
+    """按成员路径随机读取的公共部分，ArchiveWriter 和 ExportArchive 共用喵~"""
+
+    path: str
+    entries: Dict[str, Entry]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def names(self, prefix: str = "") -> List[str]:
+        """prefix 本身或其下的所有成员，prefix 为空时返回全部喵~"""
+        if not prefix:
+            return list(self.entries)
+        prefix = prefix.rstrip("/")
+        return [name for name in self.entries if name == prefix or name.startswith(prefix + "/")]
+
+    def size(self, name: str) -> int:
+        return self.entries[name][2]
+
+    def read(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def extract(self, prefix: str, target_dir: str) -> int:
+        """把 prefix 下的成员解到 target_dir(保持 prefix 之后的相对路径)，返回文件数喵~"""
+        prefix = prefix.rstrip("/")
+        count = 0
+        for name in self.names(prefix):
+            relative = name[len(prefix) + 1:] if name != prefix else posixpath.basename(name)
+            path = os.path.join(target_dir, *relative.split("/"))
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(self.read(name))
+            count += 1
+        return count
+
+
+class ArchiveWriter(_Members):
+    def __init__(self, path: str):
+        """打开(或续写)一个导出归档；上次没有正常关闭、缺少中央目录的归档会被移到一边重新开始喵~"""
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        try:
+            self._zip = zipfile.ZipFile(self.path, "a", allowZip64=True)
+        except zipfile.BadZipFile:
+            broken = f"{self.path}.broken-{int(time.time())}"
+            os.replace(self.path, broken)
+            logging.warning(f"导出归档 {self.path} 已损坏，移到 {broken} 后重新写入喵~")
+            self._zip = zipfile.ZipFile(self.path, "w", allowZip64=True)
+        self.entries = {info.filename: _entry(info) for info in self._zip.infolist()}
+        # 内容有变化、等 close 时统一重写的成员: 成员 → (暂存文件, 压缩方式)
+        self._pending: Dict[str, Tuple[str, int]] = {}
+        self._staging = self.path + ".pending"
+        # 上次没有正常关闭留下的暂存文件已经没用了
+        shutil.rmtree(self._staging, ignore_errors=True)
+        with _registry_lock:
+            _writers[self.path] = self
+
+    def add_tree(self, directory: str, prefix: str) -> Tuple[List[str], int]:
+        """把 directory 下的所有文件写入归档的 prefix 下，返回 (写入的成员, 字节数)喵~
+
+        重新处理同一个版本时成员可能已经在归档里：大小和 CRC 都相同的直接跳过，
+        内容变了的不追加第二份，而是复制到暂存目录，close 时整体重写一次归档；
+        每个SWF都重写的话，重新处理 N 个SWF要把整个归档复制 N 遍喵~
+        """
+        prefix = prefix.strip("/")
+        members, size = [], 0
+        for root, dirs, names in os.walk(directory):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, directory).replace(os.sep, "/")
+                arcname = f"{prefix}/{relative}" if prefix else relative
+                compress = (zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS
+                            else zipfile.ZIP_DEFLATED)
+                members.append(arcname)
+                size += os.path.getsize(path)
+                with self._lock:
+                    if arcname in self.entries:
+                        if arcname in self._pending or not self._same_content(arcname, path):
+                            self._stage(arcname, path, compress)
+                        continue
+                    self._zip.write(path, arcname, compress_type=compress)
+                    self.entries[arcname] = _entry(self._zip.getinfo(arcname))
+        return members, size
+
+    def _stage(self, arcname: str, path: str, compress: int):
+        """把成员的新内容复制到暂存目录(调用方持有锁)，同一个成员再次变化时覆盖喵~"""
+        staged = self._pending.get(arcname, (None,))[0]
+        if staged is None:
+            os.makedirs(self._staging, exist_ok=True)
+            staged = os.path.join(self._staging, str(len(self._pending)))
+        shutil.copyfile(path, staged)
+        self._pending[arcname] = (staged, compress)
+
+    def _same_content(self, arcname: str, path: str) -> bool:
+        info = self._zip.getinfo(arcname)
+        if info.file_size != os.path.getsize(path):
+            return False
+        crc = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                crc = zlib.crc32(chunk, crc)
+        return crc == info.CRC
+
+    def _rewrite(self, replacements: Dict[str, Tuple[str, int]]):
+        """把归档重写到临时文件(replacements 中的成员换成新文件)，然后替换旧归档喵~"""
+        tmp_path = self.path + ".rewrite"
+        with self._lock:
+            self._zip.fp.flush()
+            with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as new:
+                # 以前追加出来的重复成员只保留最后一份
+                latest = {info.filename: info for info in self._zip.infolist()}
+                for info in latest.values():
+                    if info.filename not in replacements:
+                        new.writestr(info, self._zip.read(info))
+                for arcname, (path, compress) in replacements.items():
+                    new.write(path, arcname, compress_type=compress)
+            self._zip.close()
+            os.replace(tmp_path, self.path)
+            self._zip = zipfile.ZipFile(self.path, "a", allowZip64=True)
+            self.entries = {info.filename: _entry(info) for info in self._zip.infolist()}
+        logging.info(f"导出归档 {self.path} 中 {len(replacements)} 个成员内容有变化，已重写归档喵~")
+
+    def size(self, name: str) -> int:
+        with self._lock:
+            staged = self._pending.get(name)
+        return os.path.getsize(staged[0]) if staged else self.entries[name][2]
+
+    def read(self, name: str) -> bytes:
+        """读取已经写入的成员(等待重写的读暂存的新内容)；归档还开着，先把缓冲写到磁盘再从另一个句柄读喵~"""
+        with self._lock:
+            staged = self._pending.get(name)
+            entry = self.entries[name]
+            self._zip.fp.flush()
+        if staged:
+            with open(staged[0], "rb") as f:
+                return f.read()
+        with open(self.path, "rb") as fp:
+            return _read_entry(fp, entry)
+
+    def close(self):
+        """把暂存的成员一次性重写进归档，然后写出中央目录和偏移索引喵~"""
+        with self._lock:
+            if self._zip.fp is None:
+                return
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._rewrite(pending)
+            shutil.rmtree(self._staging, ignore_errors=True)
+        with self._lock:
+            self._zip.close()
+            write_index(self.path, self.entries)
+        with _registry_lock:
+            _writers.pop(self.path, None)
+            stale = _readers.pop(self.path, None)
+        if stale:
+            stale[1].close()
+
+
+def write_index(archive_path: str, entries: Dict[str, Entry]):
+    index_path = archive_path + INDEX_SUFFIX
+    tmp_path = index_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"archive_size": os.path.getsize(archive_path), "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        logging.error(f"写入归档索引 {index_path} 失败: {e} 喵~")
+
+
+class ExportArchive(_Members):
+    def __init__(self, path: str):
+        """只读打开导出归档：有匹配的偏移索引时直接用，否则从中央目录重建喵~"""
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._fp = open(self.path, "rb")
+        self.entries = self._load_index()
+
+    def _load_index(self) -> Dict[str, Entry]:
+        try:
+            with open(self.path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index["archive_size"] == os.path.getsize(self.path):
+                return index["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        with zipfile.ZipFile(self.path) as zf:
+            return {info.filename: _entry(info) for info in zf.infolist()}
+
+    def read(self, name: str) -> bytes:
+        with self._lock:
+            return _read_entry(self._fp, self.entries[name])
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_writers: Dict[str, ArchiveWriter] = {}
+_readers: Dict[str, Tuple[Tuple[int, int], ExportArchive]] = {}
+_registry_lock = threading.Lock()
+
+
+def open_archive(path: str) -> _Members:
+    """按路径取可读的归档：正在写入的返回写入器本身，其余的按文件大小和修改时间缓存只读实例喵~"""
+    path = os.path.abspath(path)
+    with _registry_lock:
+        writer = _writers.get(path)
+        if writer is not None:
+            return writer
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = _readers.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        if cached:
+            cached[1].close()
+        archive = ExportArchive(path)
+        _readers[path] = (stamp, archive)
+        return archive
+
+
+def read_output(path: str) -> bytes:
+    """读取一个导出结果：普通文件直接读，<zip路径>!/<成员路径> 从归档中读喵~"""
+    archived = split_member_path(path)
+    if archived:
+        return open_archive(archived[0]).read(archived[1])
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出归档工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ls = sub.add_parser("ls", help="列出成员")
+    ls.add_argument("archive")
+    ls.add_argument("prefix", nargs="?", default="")
+    cat = sub.add_parser("cat", help="输出成员内容")
+    cat.add_argument("archive")
+    cat.add_argument("member")
+    extract = sub.add_parser("extract", help="解出前缀下的成员")
+    extract.add_argument("archive")
+    extract.add_argument("prefix")
+    extract.add_argument("directory")
+    args = parser.parse_args()
+
+    with ExportArchive(args.archive) as archive:
+        if args.command == "ls":
+            for name in sorted(archive.names(args.prefix)):
+                print(f"{archive.size(name):>10}  {name}")
+        elif args.command == "cat":
+            sys.stdout.buffer.write(archive.read(args.member))
+        else:
+            count = archive.extract(args.prefix, args.directory)
+            print(f"已解出 {count} 个文件到 {args.directory} 喵~")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+提取流程的阶段式流水线喵~
+  - Stage: 一个处理阶段，声明输入/输出类型、工作线程数和输入队列容量
+  - Pipeline: 把阶段串成一条链，阶段之间用有界队列连接(队列满时上游阻塞，形成背压)，
+    各阶段同时运行、互相重叠，可以随时取消
+  - build_extract_pipeline: 差异 → 下载 → 导出 → 后处理 这条提取流水线的标准组装方式
+"""
+
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from queue import Full, Queue
+from typing import Callable, Iterable, List, Optional
+
+from metrics import LIVE
+
+_END = object()  # 阶段输入结束的标记
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable, workers: int = 1, queue_size: Optional[int] = None,
+                 input_type: type = object, output_type: type = object, fan_out: bool = False):
+        """流水线中的一个阶段喵~
+
+        func(item) 返回交给下一阶段的结果，返回 None 表示丢弃该项；
+        fan_out=True 时 func 返回可迭代对象(可以是生成器)，其中每一项分别交给下一阶段。
+        func 抛出的异常只记入 failed 并写日志，不会中断整条流水线喵~
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size if queue_size is not None else self.workers * 2
+        self.input_type = input_type
+        self.output_type = output_type
+        self.fan_out = fan_out
+        self.queue: Optional[Queue] = None
+        self._lock = threading.Lock()
+        self._alive = 0
+        self.received = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def reset(self):
+        self.queue = Queue(maxsize=self.queue_size)
+        self._alive = self.workers
+        self.received = self.emitted = self.dropped = self.failed = 0
+        self.busy_seconds = 0.0
+
+    def outputs(self, item) -> Iterable:
+        result = self.func(item)
+        if self.fan_out:
+            return result if result is not None else ()
+        return () if result is None else (result,)
+
+    def summary(self) -> dict:
+        return {
+            "workers": self.workers,
+            "received": self.received,
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class Pipeline:
+    def __init__(self, name: str = "pipeline", metrics=None, profiler=None):
+        """由若干阶段组成的流水线喵~
+
+        传入 metrics(RunMetrics) 时，每一项在各阶段的排队等待(queue_wait)和处理耗时(process)都会被记录；
+        传入 profiler(StageProfiler) 时，每个阶段的处理都在 cProfile 下运行喵~
+        """
+        self.name = name
+        self.metrics = metrics
+        self.profiler = profiler
+        self.stages: List[Stage] = []
+        self._cancel_event = threading.Event()
+        self._results: List = []
+        self._on_result: Optional[Callable] = None
+        self._result_lock = threading.Lock()
+
+    def add_stage(self, stage: Stage) -> "Pipeline":
+        """追加一个阶段，上一阶段的输出类型必须能被这一阶段接受喵~"""
+        if self.stages and not issubclass(self.stages[-1].output_type, stage.input_type):
+            raise TypeError(f"阶段 {self.stages[-1].name} 输出 {self.stages[-1].output_type.__name__}，"
+                            f"但阶段 {stage.name} 需要 {stage.input_type.__name__}")
+        self.stages.append(stage)
+        return self
+
+    def stage(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def cancel(self):
+        """取消流水线：正在处理的项会做完，排队中和尚未送入的项直接丢弃喵~"""
+        if not self._cancel_event.is_set():
+            logging.info(f"流水线 {self.name} 已取消喵~")
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _put(self, queue: Queue, item, force: bool = False) -> bool:
+        """放入下游队列，队列满时等待(背压)；取消后除结束标记外直接放弃喵~"""
+        if item is not _END:
+            # 附带入队时间，用于统计排队等待
+            item = (time.perf_counter(), item)
+        while True:
+            if self.cancelled and not force:
+                return False
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+    def _deliver(self, index: int, item) -> bool:
+        if index + 1 < len(self.stages):
+            return self._put(self.stages[index + 1].queue, item)
+        with self._result_lock:
+            if self._on_result:
+                self._on_result(item)
+            else:
+                self._results.append(item)
+        return True
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        while True:
+            entry = stage.queue.get()
+            if entry is _END:
+                # 留给同阶段的其他线程
+                stage.queue.put(_END)
+                break
+            enqueued_at, item = entry
+            with stage._lock:
+                stage.received += 1
+            if self.cancelled:
+                with stage._lock:
+                    stage.dropped += 1
+                continue
+
+            start = time.perf_counter()
+            queue_wait = start - enqueued_at
+            emitted = 0
+            failed = False
+            with self.profiler.profile(stage.name) if self.profiler else nullcontext():
+                try:
+                    for output in stage.outputs(item):
+                        if not isinstance(output, stage.output_type):
+                            raise TypeError(f"输出类型应为 {stage.output_type.__name__}，实际为 {type(output).__name__}")
+                        if not self._deliver(index, output):
+                            break
+                        emitted += 1
+                except Exception as e:
+                    failed = True
+                    logging.error(f"阶段 {stage.name} 处理 {item!r} 失败: {e} 喵~")
+            duration = time.perf_counter() - start
+            with stage._lock:
+                stage.emitted += emitted
+                if failed:
+                    stage.failed += 1
+                elif emitted == 0 and not stage.fan_out:
+                    stage.dropped += 1
+                stage.busy_seconds += duration
+            LIVE.incr("stage_items_total", stage=stage.name,
+                      result="failed" if failed else ("ok" if emitted or stage.fan_out else "dropped"))
+            if self.metrics is not None:
+                self.metrics.record(stage.name, "queue_wait", queue_wait)
+                self.metrics.record(stage.name, "process", duration, ok=not failed, outputs=emitted)
+
+        with stage._lock:
+            stage._alive -= 1
+            last = stage._alive == 0
+        if last and index + 1 < len(self.stages):
+            self._put(self.stages[index + 1].queue, _END, force=True)
+
+    def run(self, items: Iterable, on_result: Optional[Callable] = None) -> List:
+        """把 items 依次送入第一个阶段，等待所有阶段处理完毕喵~
+
+        最后一个阶段的输出会传给 on_result，未指定时收集起来作为返回值喵~
+        """
+        if not self.stages:
+            raise ValueError("流水线没有任何阶段")
+        self._cancel_event.clear()
+        self._results = []
+        self._on_result = on_result
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage.reset()
+            LIVE.gauge("stage_queue_depth", stage.queue.qsize, stage=stage.name)
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,),
+                                          name=f"{self.name}-{stage.name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        try:
+            for item in items:
+                if not self._put(first.queue, item):
+                    break
+        except BaseException:
+            # Ctrl+C 等情况下也要让工作线程退出
+            self.cancel()
+            raise
+        finally:
+            self._put(first.queue, _END, force=True)
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+            for stage in self.stages:
+                LIVE.remove_gauge("stage_queue_depth", stage=stage.name)
+        return self._results
+
+    def summary(self) -> dict:
+        return {stage.name: stage.summary() for stage in self.stages}
+
+    def log_summary(self):
+        for stage in self.stages:
+            s = stage.summary()
+            logging.info(f"[{self.name}] 阶段 {stage.name}: 输入 {s['received']}, 输出 {s['emitted']}, "
+                         f"丢弃 {s['dropped']}, 失败 {s['failed']}, 线程 {s['workers']}, "
+                         f"累计耗时 {s['busy_seconds']:.2f}秒 喵~")
+
+
+def build_extract_pipeline(name: str, downloader, exporter, export_workers: int,
+                           select: Optional[Callable] = None, metrics=None, profiler=None) -> Pipeline:
+    """组装 差异 → 下载 → 导出 → 后处理 流水线喵~
+
+    select(job) 负责生成差异清单并返回待下载的 url_info 列表；不传时流水线直接从下载阶段开始
+    (例如重试失败的下载)。下载阶段的实际并发由 AIMD 控制器决定，导出阶段由导出闸门决定，
+    这里的线程数只是各自的上限。传入 metrics 时下载器和导出器也会记录 HTTP 和 JVM 的耗时喵~
+    """
+    pipeline = Pipeline(name, metrics=metrics, profiler=profiler)
+    if metrics is not None:
+        downloader.metrics = metrics
+        exporter.metrics = metrics
+    if select is not None:
+        pipeline.add_stage(Stage("diff", select, workers=1, input_type=tuple, output_type=tuple, fan_out=True))
+    pipeline.add_stage(Stage("download", downloader.download_one, workers=downloader.concurrency.max_limit,
+                             input_type=tuple, output_type=str))
+    pipeline.add_stage(Stage("export", exporter.export_file, workers=export_workers,
+                             input_type=str, output_type=str))
+    pipeline.add_stage(Stage("postprocess", exporter.postprocess_file, workers=1,
+                             input_type=str, output_type=str))
+    return pipeline
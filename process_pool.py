@@ -0,0 +1,35 @@
+"""
+CPU密集工作共用的进程池喵~
+sprite 后处理(量化、拼图)和脚本内容索引(分词、匹配)都交给同一个池，
+一个进程里最多只有 cpu_count 个子进程，不会每个功能各开一套喵~
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool() -> ProcessPoolExecutor:
+    """共用的进程池，第一次用到时创建喵~
+
+    导出时进程里有很多线程，fork 出的子进程可能继承被别的线程持有的锁，所以统一用 spawn 喵~
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
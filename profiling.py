@@ -0,0 +1,111 @@
+"""
+按阶段的可选性能剖析喵~
+设置环境变量 AOLA_PROFILE=1(或 auto_extract_all.py --profile)后，流水线的每个阶段和
+FFDecExporter.process_file 都会在 cProfile 下运行，结束后写出：
+  <阶段>.pstats          可用 python -m pstats 或 snakeviz 查看
+  profile_summary.json   每个阶段的墙钟时间、进程内CPU时间、子进程(JVM)墙钟时间和其余等待时间
+cProfile/pstats 只在真正开始剖析时才导入，没开剖析的运行不为它们付启动开销喵~
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+PROFILE_ENV = "AOLA_PROFILE"
+
+_local = threading.local()
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def record_subprocess(seconds: float):
+    """记录当前线程花在等待子进程上的墙钟时间，由 StageProfiler 归到当前阶段喵~"""
+    _local.subprocess = getattr(_local, "subprocess", 0.0) + seconds
+
+
+class StageProfiler:
+    def __init__(self, output_dir: str):
+        """按阶段收集 cProfile 数据和时间分解喵~"""
+        self.output_dir = output_dir
+        self._stats: Dict[str, "pstats.Stats"] = {}
+        self._times: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._warned = False
+
+    @contextmanager
+    def profile(self, stage: str):
+        """在 cProfile 下执行 with 块，并把墙钟/CPU/子进程时间计入 stage喵~"""
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ 同一时刻只允许一个 cProfile，其他线程只统计时间
+            profiler = None
+            if not self._warned:
+                self._warned = True
+                logging.warning("已有其他线程在剖析，并发的项只统计时间不收集调用栈喵~")
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        sub_start = getattr(_local, "subprocess", 0.0)
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            sub = getattr(_local, "subprocess", 0.0) - sub_start
+            with self._lock:
+                times = self._times.setdefault(stage, {"items": 0, "wall": 0.0, "cpu": 0.0, "subprocess": 0.0})
+                times["items"] += 1
+                times["wall"] += wall
+                times["cpu"] += cpu
+                times["subprocess"] += sub
+                if profiler is not None:
+                    if stage in self._stats:
+                        self._stats[stage].add(profiler)
+                    else:
+                        self._stats[stage] = pstats.Stats(profiler)
+
+    def summary(self) -> dict:
+        with self._lock:
+            result = {}
+            for stage, times in self._times.items():
+                result[stage] = {
+                    "items": times["items"],
+                    "wall_seconds": round(times["wall"], 6),
+                    "cpu_seconds": round(times["cpu"], 6),
+                    "subprocess_seconds": round(times["subprocess"], 6),
+                    # 既不在本进程算、也不在等JVM：网络、磁盘、锁和队列等待
+                    "other_seconds": round(max(0.0, times["wall"] - times["cpu"] - times["subprocess"]), 6),
+                }
+            return result
+
+    def write(self):
+        """写出每个阶段的 .pstats 和 profile_summary.json喵~"""
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with self._lock:
+                stats = dict(self._stats)
+            for stage, stage_stats in stats.items():
+                stage_stats.dump_stats(os.path.join(self.output_dir, f"{stage}.pstats"))
+            summary = self.summary()
+            with open(os.path.join(self.output_dir, "profile_summary.json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.error(f"写入剖析结果失败: {e} 喵~")
+            return
+        for stage, s in summary.items():
+            logging.info(f"[剖析] {stage}: {s['items']} 项, 墙钟 {s['wall_seconds']:.2f}秒, "
+                         f"进程内CPU {s['cpu_seconds']:.2f}秒, 子进程 {s['subprocess_seconds']:.2f}秒, "
+                         f"其他 {s['other_seconds']:.2f}秒 喵~")
+        logging.info(f"剖析结果已写入: {self.output_dir} 喵~")
@@ -0,0 +1,150 @@
+"""
+后台资源采样与线程池自动伸缩喵~
+  - probe_cpu_percent: 启动时用的非阻塞CPU负载估计
+  - ResourceSampler: 后台线程定期采样 CPU/内存，把结果推给各个监听者
+  - DownloadAutoscaler: 下载池是 I/O 密集的，并发数交给 AIMD 控制器，这里只在内存紧张或 CPU 饱和时压低它的上限
+  - ExportAutoscaler: 导出池是 CPU/内存密集的(每个任务一个 JVM)，按负载逐步增减并发数
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+import psutil
+
+from concurrency import AimdController, ResizableSemaphore
+
+
+def probe_cpu_percent() -> float:
+    """不阻塞地估计当前CPU使用率喵~
+
+    用1分钟平均负载除以逻辑核心数换算成百分比，不需要像 cpu_percent(interval=1) 那样等一秒。
+    Windows 上 psutil 模拟的平均负载在刚启动的几秒内为0，此时会偏乐观，
+    之后由 ResourceSampler 在各阶段内实时修正喵~
+    """
+    try:
+        load1 = psutil.getloadavg()[0]
+    except (AttributeError, OSError):
+        return psutil.cpu_percent(interval=None)
+    return min(100.0, load1 / (os.cpu_count() or 1) * 100)
+
+
+class ResourceSampler:
+    def __init__(self, interval: float = 1.0):
+        """后台资源采样器喵~"""
+        self.interval = interval
+        self.cpu_percent = 0.0
+        self.memory_percent = psutil.virtual_memory().percent
+        self._listeners: List[Callable[[float, float], None]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 第一次调用只是建立基准，之后每次调用返回两次之间的平均值，不会阻塞
+        psutil.cpu_percent(interval=None)
+
+    def add_listener(self, listener: Callable[[float, float], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[float, float], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.cpu_percent = psutil.cpu_percent(interval=None)
+            self.memory_percent = psutil.virtual_memory().percent
+            with self._lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                try:
+                    listener(self.cpu_percent, self.memory_percent)
+                except Exception as e:
+                    logging.error(f"资源监听回调出错: {e} 喵~")
+
+
+class DownloadAutoscaler:
+    def __init__(self, controller_getter: Callable[[], AimdController],
+                 high_memory: float = 90.0, high_cpu: float = 95.0):
+        """下载池自动伸缩喵~
+
+        controller_getter 返回当前的 AIMD 控制器(下载器每次 download_all 会重建它)喵~
+        内存超过高水位时上限减半，每次内存紧张只减一次：持续高内存期间保持减半后的上限，
+        回落到高水位以下后才算下一次，不会每个采样都再减半直到 1 喵~
+        """
+        self.controller_getter = controller_getter
+        self.high_memory = high_memory
+        self.high_cpu = high_cpu
+        # 只记当前的控制器和它原来的上限，换了控制器就重新开始，不随运行次数积累
+        self._controller: Optional[AimdController] = None
+        self._original = 0
+        self._memory_cut = False
+
+    def __call__(self, cpu_percent: float, memory_percent: float):
+        controller = self.controller_getter()
+        if controller is None:
+            return
+        if controller is not self._controller:
+            self._controller = controller
+            self._original = controller.max_limit
+            self._memory_cut = False
+        if memory_percent > self.high_memory:
+            if self._memory_cut:
+                return
+            self._memory_cut = True
+            ceiling = max(controller.min_limit, controller.limit // 2)
+        elif cpu_percent > self.high_cpu:
+            self._memory_cut = False
+            ceiling = max(controller.min_limit, controller.limit)
+        else:
+            self._memory_cut = False
+            ceiling = self._original
+        if ceiling != controller.max_limit:
+            controller.set_ceiling(ceiling)
+            logging.info(f"下载并发上限调整为 {ceiling} (CPU: {cpu_percent}%, 内存: {memory_percent}%) 喵~")
+
+
+class ExportAutoscaler:
+    def __init__(self, gate: ResizableSemaphore, min_limit: int = 1, max_limit: int = 8,
+                 high_cpu: float = 90.0, low_cpu: float = 60.0,
+                 high_memory: float = 85.0, low_memory: float = 75.0):
+        """导出池自动伸缩喵~
+
+        CPU 或内存超过高水位时减少一个并发(内存超限时直接减半)，
+        两者都低于低水位时增加一个并发，中间区域保持不变喵~
+        """
+        self.gate = gate
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.high_cpu = high_cpu
+        self.low_cpu = low_cpu
+        self.high_memory = high_memory
+        self.low_memory = low_memory
+
+    def __call__(self, cpu_percent: float, memory_percent: float):
+        limit = self.gate.limit
+        if memory_percent > self.high_memory:
+            new_limit = max(self.min_limit, limit // 2)
+        elif cpu_percent > self.high_cpu:
+            new_limit = max(self.min_limit, limit - 1)
+        elif cpu_percent < self.low_cpu and memory_percent < self.low_memory and self.gate.in_use >= limit:
+            new_limit = min(self.max_limit, limit + 1)
+        else:
+            new_limit = limit
+        if new_limit != limit:
+            self.gate.set_limit(new_limit)
+            logging.info(f"导出并发数调整为 {new_limit} (CPU: {cpu_percent}%, 内存: {memory_percent}%) 喵~")
@@ -0,0 +1,174 @@
+"""
+sprite 的导出格式(profile)喵~
+每个 profile 决定传给 FFDec 的 -format，以及导出之后在进程池中对 DefineSprite_<id> 目录做的后处理：
+  gif    FFDec 直接导出 GIF，不做后处理(默认，与以前一致)
+  png    PNG 帧序列，内容完全相同的帧只保留一张，frames.json 记录每一帧对应的文件
+  png8   同 png，再把每帧量化成256色调色板 PNG(需要 Pillow)
+  sheet  同 png，再把不重复的帧拼成一张 sheet.png，sheet.json 记录每帧的位置(需要 Pillow)
+  avi    FFDec 直接导出视频，不做后处理
+不同格式的导出耗时和体积差别很大，FFDecExporter 会按 profile 统计，
+也可以用 benchmarks/bench_sprite_profiles.py 在同一批SWF上对比喵~
+"""
+
+import hashlib
+import importlib.util
+import json
+import math
+import os
+from typing import Dict, List, NamedTuple, Tuple
+
+import process_pool
+
+DEFAULT_PROFILE = "gif"
+FRAMES_INDEX = "frames.json"
+SHEET_IMAGE = "sheet.png"
+SHEET_INDEX = "sheet.json"
+
+
+class SpriteProfile(NamedTuple):
+    name: str
+    ffdec_format: str  # FFDec -format 的值
+    steps: Tuple[str, ...]  # 依次执行的后处理步骤，见 POSTPROCESS_STEPS
+    needs_pillow: bool
+    description: str
+
+
+PROFILES: Dict[str, SpriteProfile] = {profile.name: profile for profile in (
+    SpriteProfile("gif", "sprite:gif", (), False, "GIF 动画"),
+    SpriteProfile("png", "sprite:png", ("dedup",), False, "PNG 帧序列，去掉重复帧"),
+    SpriteProfile("png8", "sprite:png", ("dedup", "quantize"), True, "256色 PNG 帧序列，去掉重复帧"),
+    SpriteProfile("sheet", "sprite:png", ("dedup", "sheet"), True, "单张 spritesheet + 帧位置"),
+    SpriteProfile("avi", "sprite:avi", (), False, "AVI 视频"),
+)}
+
+
+def pillow_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def get_profile(name: str) -> SpriteProfile:
+    """按名字取 profile，名字不对或缺少 Pillow 时抛 ValueError 喵~"""
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"未知的 sprite 导出格式 {name}，可选: {', '.join(PROFILES)}")
+    if profile.needs_pillow and not pillow_available():
+        raise ValueError(f"sprite 导出格式 {name} 需要 Pillow：pip install pillow")
+    return profile
+
+
+def frame_files(directory: str) -> List[str]:
+    """目录中的 PNG 帧，按帧号排序(FFDec 按 1.png、2.png…… 命名)喵~"""
+    names = [name for name in os.listdir(directory) if name.lower().endswith(".png") and name != SHEET_IMAGE]
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+def _read_sequence(directory: str) -> List[str]:
+    """每一帧对应的文件名；还没去重时就是帧文件本身喵~"""
+    try:
+        with open(os.path.join(directory, FRAMES_INDEX), "r", encoding="utf-8") as f:
+            return json.load(f)["frames"]
+    except FileNotFoundError:
+        return frame_files(directory)
+
+
+def _write_json(path: str, value):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+
+
+def dedup_frames(directory: str) -> dict:
+    """内容完全相同的帧只保留第一张，frames.json 按帧顺序记录每一帧对应的文件喵~
+
+    FFDec 对同样的画面输出的 PNG 字节相同，所以直接比较文件内容的哈希喵~
+    """
+    sequence, first_by_digest, removed = [], {}, 0
+    for name in frame_files(directory):
+        path = os.path.join(directory, name)
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        if digest in first_by_digest:
+            os.remove(path)
+            removed += 1
+            sequence.append(first_by_digest[digest])
+        else:
+            first_by_digest[digest] = name
+            sequence.append(name)
+    _write_json(os.path.join(directory, FRAMES_INDEX), {"frames": sequence})
+    return {"frames": len(sequence), "unique_frames": len(first_by_digest), "removed_frames": removed}
+
+
+def quantize_frames(directory: str, colors: int = 256) -> dict:
+    """把每帧量化成调色板 PNG(保留透明度)，只在变小时替换原文件喵~"""
+    from PIL import Image
+
+    replaced = 0
+    for name in frame_files(directory):
+        path = os.path.join(directory, name)
+        tmp_path = path + ".tmp"
+        with Image.open(path) as image:
+            quantized = image.convert("RGBA").quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+            quantized.save(tmp_path, format="PNG", optimize=True)
+        if os.path.getsize(tmp_path) < os.path.getsize(path):
+            os.replace(tmp_path, path)
+            replaced += 1
+        else:
+            os.remove(tmp_path)
+    return {"quantized_frames": replaced}
+
+
+def pack_sheet(directory: str) -> dict:
+    """把不重复的帧按网格拼成 sheet.png，sheet.json 记录每个格子的位置和每一帧用哪个格子喵~"""
+    from PIL import Image
+
+    sequence = _read_sequence(directory)
+    names = list(dict.fromkeys(sequence))
+    if not names:
+        return {"sheet_cells": 0}
+    images = [Image.open(os.path.join(directory, name)) for name in names]
+    try:
+        cell_w = max(image.width for image in images)
+        cell_h = max(image.height for image in images)
+        columns = math.ceil(math.sqrt(len(images)))
+        rows = math.ceil(len(images) / columns)
+        sheet = Image.new("RGBA", (cell_w * columns, cell_h * rows), (0, 0, 0, 0))
+        cells = []
+        for i, image in enumerate(images):
+            x, y = (i % columns) * cell_w, (i // columns) * cell_h
+            sheet.paste(image.convert("RGBA"), (x, y))
+            cells.append({"x": x, "y": y, "w": image.width, "h": image.height})
+        sheet.save(os.path.join(directory, SHEET_IMAGE), format="PNG", optimize=True)
+    finally:
+        for image in images:
+            image.close()
+    index = {name: i for i, name in enumerate(names)}
+    _write_json(os.path.join(directory, SHEET_INDEX),
+                {"cells": cells, "frames": [index[name] for name in sequence]})
+    for name in names:
+        os.remove(os.path.join(directory, name))
+    if os.path.exists(os.path.join(directory, FRAMES_INDEX)):
+        os.remove(os.path.join(directory, FRAMES_INDEX))
+    return {"sheet_cells": len(cells)}
+
+
+POSTPROCESS_STEPS = {
+    "dedup": dedup_frames,
+    "quantize": quantize_frames,
+    "sheet": pack_sheet,
+}
+
+
+def postprocess(profile_name: str, directory: str) -> dict:
+    """在子进程中依次执行 profile 的后处理步骤，返回各步骤的统计喵~"""
+    stats = {}
+    for step in PROFILES[profile_name].steps:
+        stats.update(POSTPROCESS_STEPS[step](directory))
+    return stats
+
+
+def run_postprocess(profile: SpriteProfile, directory: str) -> dict:
+    """把后处理交给共用的进程池并等待结果；量化和拼图是纯CPU工作，放在子进程里不占导出线程的 GIL，
+    没有后处理步骤的 profile 直接返回喵~"""
+    if not profile.steps:
+        return {}
+    return process_pool.shared_pool().submit(postprocess, profile.name, directory).result()
+
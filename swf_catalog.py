@@ -0,0 +1,277 @@
+"""
+SWF 标签目录喵~
+按 SWF 内容的 sha1 记录每个文件的标签摘要(SQLite)：
+  sprites  每个 DefineSprite 的 id、长度、帧数和内容摘要
+  classes  DoABC 中定义的类名和内容摘要
+  exports  每个资源(n)的 sprite/类最近一次导出的位置、大小和耗时，按内容摘要查找
+导出时的筛选规则(sprite 长度阈值、脚本类名匹配)变成对目录的查询，
+调整规则不需要再用 FFDec 把所有 SWF 重新 dump 一遍；
+内容摘要与任何一次导出(新版本的同一资源，或者别的SWF中重复打包的同一个 sprite)相同时
+直接链接已有的导出结果。
+
+    python swf_catalog.py index <目录>                     建立/更新目录
+    python swf_catalog.py sprites --min-len 500 --min-frames 2
+    python swf_catalog.py classes --match .config.
+"""
+
+import argparse
+import hashlib
+import logging
+import lzma
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import swf_tags
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "swf_catalog.db")
+# 与 FFDecExporter.export_script 一致：类名(小写)包含它的脚本才导出
+SCRIPT_PATTERN = ".config."
+# 表结构变化时加一，旧目录会被清空重建(目录只是缓存，可以随时重建)
+CATALOG_VERSION = 4
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS swfs ("
+    " hash TEXT PRIMARY KEY, size INTEGER NOT NULL, version INTEGER, tag_count INTEGER,"
+    " parsed INTEGER NOT NULL, indexed_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS sprites ("
+    " hash TEXT NOT NULL, chid INTEGER NOT NULL, length INTEGER NOT NULL, frames INTEGER NOT NULL,"
+    " digest TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS sprites_hash ON sprites (hash)",
+    "CREATE INDEX IF NOT EXISTS sprites_length ON sprites (length)",
+    "CREATE TABLE IF NOT EXISTS classes (hash TEXT NOT NULL, name TEXT NOT NULL, digest TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS classes_hash ON classes (hash)",
+    # 路径 → 内容哈希，大小和修改时间没变时不再重新计算哈希
+    "CREATE TABLE IF NOT EXISTS files ("
+    " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS files_hash ON files (hash)",
+    # kind 为 sprite 或 class，item 为 sprite id 或类名，output 为导出结果所在路径，
+    # bytes/seconds 为这份结果的大小和当初 FFDec 导出它的耗时(用于统计复用省下了多少)
+    "CREATE TABLE IF NOT EXISTS exports ("
+    " n TEXT NOT NULL, kind TEXT NOT NULL, item TEXT NOT NULL, digest TEXT NOT NULL,"
+    " output TEXT NOT NULL, bytes INTEGER NOT NULL, seconds REAL NOT NULL, exported_at REAL NOT NULL,"
+    " PRIMARY KEY (n, kind, item))",
+    "CREATE INDEX IF NOT EXISTS exports_digest ON exports (kind, digest)",
+    "CREATE INDEX IF NOT EXISTS exports_output ON exports (output)",
+)
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SwfCatalog:
+    def __init__(self, path: str = DEFAULT_CATALOG):
+        """打开(或创建)标签目录喵~"""
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+            for (table,) in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                self._db.execute(f"DROP TABLE IF EXISTS {table}")
+            self._db.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def file_hash(self, path: str) -> str:
+        """文件内容的 sha1，大小和修改时间没变时直接用记录的值喵~"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns, hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        digest = file_sha1(path)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                             (path, st.st_size, st.st_mtime_ns, digest))
+            self._db.commit()
+        return digest
+
+    def index(self, path: str) -> Optional[str]:
+        """把SWF加入目录并返回它的哈希，已经收录过的内容不会重复解析喵~"""
+        try:
+            digest = self.file_hash(path)
+        except OSError as e:
+            logging.warning(f"无法读取 {path}: {e} 喵~")
+            return None
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM swfs WHERE hash = ?", (digest,)).fetchone():
+                return digest
+
+        sprites: List[Tuple[int, int, int, str]] = []
+        classes: List[Tuple[str, str]] = []
+        version = tag_count = None
+        parsed = 0
+        try:
+            data = swf_tags.read_swf(path)
+            if data is not None:
+                version, tag_count = data[3], 0
+                digests = swf_tags.sprite_digests(data)
+                for tag in swf_tags.iter_tags(data):
+                    tag_count += 1
+                    if tag.code == swf_tags.TAG_DEFINE_SPRITE:
+                        chid, frames = swf_tags.sprite_header(data, tag)
+                        sprites.append((chid, tag.length, frames, digests.get(chid, "")))
+                class_digests = swf_tags.class_digests(data)
+                classes = [(name, class_digests.get(name, "")) for name in swf_tags.class_names(data)]
+                parsed = 1
+        except (OSError, ValueError, zlib.error, lzma.LZMAError, struct.error, IndexError) as e:
+            # 解析失败的文件也记下来，筛选时退回 FFDec dump
+            logging.warning(f"解析SWF标签失败 {path}: {e} 喵~")
+            sprites, classes = [], []
+
+        with self._lock:
+            self._db.execute("DELETE FROM sprites WHERE hash = ?", (digest,))
+            self._db.execute("DELETE FROM classes WHERE hash = ?", (digest,))
+            self._db.executemany("INSERT INTO sprites (hash, chid, length, frames, digest) VALUES (?, ?, ?, ?, ?)",
+                                 [(digest, *sprite) for sprite in sprites])
+            self._db.executemany("INSERT INTO classes (hash, name, digest) VALUES (?, ?, ?)",
+                                 [(digest, *cls) for cls in classes])
+            self._db.execute(
+                "INSERT OR REPLACE INTO swfs (hash, size, version, tag_count, parsed, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, os.path.getsize(path), version, tag_count, parsed, time.time()))
+            self._db.commit()
+        return digest
+
+    def index_tree(self, directory: str) -> int:
+        """收录目录下所有SWF，返回文件数喵~"""
+        count = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.lower().endswith(".swf"):
+                    self.index(os.path.join(root, name))
+                    count += 1
+        return count
+
+    def is_parsed(self, digest: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT parsed FROM swfs WHERE hash = ?", (digest,)).fetchone()
+        return bool(row and row[0])
+
+    def sprite_ids(self, digest: str, min_len: int = swf_tags.SPRITE_MIN_LEN, min_frames: int = 0) -> List[str]:
+        """按规则选出要导出的 sprite id(字符串，与 FFDec -selectid 一致)喵~"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chid FROM sprites WHERE hash = ? AND length > ? AND frames >= ? ORDER BY rowid",
+                (digest, min_len, min_frames)).fetchall()
+        return [str(chid) for chid, in rows]
+
+    def class_names(self, digest: str, pattern: str = SCRIPT_PATTERN) -> List[str]:
+        """按规则选出要导出的类名(小写后包含 pattern)喵~"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name FROM classes WHERE hash = ? AND instr(lower(name), ?) > 0 ORDER BY rowid",
+                (digest, pattern.lower())).fetchall()
+        return [name for name, in rows]
+
+    def sprite_digest(self, digest: str, chid: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT digest FROM sprites WHERE hash = ? AND chid = ?",
+                                   (digest, int(chid))).fetchone()
+        return row[0] if row and row[0] else None
+
+    def class_digest(self, digest: str, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT digest FROM classes WHERE hash = ? AND name = ?", (digest, name)).fetchone()
+        return row[0] if row and row[0] else None
+
+    def previous_export(self, n: str, kind: str, content_digest: str) -> Optional[Tuple[str, str, str, int, float]]:
+        """内容摘要相同的 sprite/类最近一次导出的 (n, item, output, bytes, seconds)，
+        优先同一资源(n)的记录，其次是别的资源中重复的同一份内容；没有时返回 None 喵~"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT n, item, output, bytes, seconds FROM exports WHERE kind = ? AND digest = ?"
+                " ORDER BY n = ? DESC, exported_at DESC LIMIT 1", (kind, content_digest, n)).fetchone()
+        return tuple(row) if row else None
+
+    def record_export(self, n: str, kind: str, item: str, content_digest: str, output: str,
+                      size: int = 0, seconds: float = 0.0):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO exports (n, kind, item, digest, output, bytes, seconds, exported_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (n, kind, item, content_digest, os.path.abspath(output), size, seconds, time.time()))
+            self._db.commit()
+
+    def relocate_exports(self, directory: str, archived: str) -> int:
+        """directory 下的导出结果被打包进归档后，把指向它们的记录改为 archived(其后拼上原来的相对路径)喵~"""
+        directory = os.path.abspath(directory)
+        lower, upper = directory + os.sep, directory + chr(ord(os.sep) + 1)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, output FROM exports WHERE output = ? OR (output >= ? AND output < ?)",
+                (directory, lower, upper)).fetchall()
+            self._db.executemany("UPDATE exports SET output = ? WHERE rowid = ?", [
+                (archived + output[len(directory):].replace(os.sep, "/"), rowid) for rowid, output in rows])
+            self._db.commit()
+        return len(rows)
+
+    def select_sprites(self, min_len: int = swf_tags.SPRITE_MIN_LEN, min_frames: int = 0) -> List[tuple]:
+        """整个目录中满足规则的 (路径, sprite id, 长度, 帧数) 喵~"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT f.path, s.chid, s.length, s.frames FROM sprites s JOIN files f ON f.hash = s.hash"
+                " WHERE s.length > ? AND s.frames >= ? ORDER BY f.path, s.rowid",
+                (min_len, min_frames)).fetchall()
+
+    def select_classes(self, pattern: str = SCRIPT_PATTERN) -> List[tuple]:
+        """整个目录中满足规则的 (路径, 类名) 喵~"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT f.path, c.name FROM classes c JOIN files f ON f.hash = c.hash"
+                " WHERE instr(lower(c.name), ?) > 0 ORDER BY f.path, c.rowid",
+                (pattern.lower(),)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SWF 标签目录")
+    parser.add_argument("--db", default=DEFAULT_CATALOG, help="目录数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index = sub.add_parser("index", help="收录目录下的SWF")
+    index.add_argument("directory")
+    sprites = sub.add_parser("sprites", help="按长度和帧数筛选 sprite")
+    sprites.add_argument("--min-len", type=int, default=swf_tags.SPRITE_MIN_LEN)
+    sprites.add_argument("--min-frames", type=int, default=0)
+    classes = sub.add_parser("classes", help="按类名筛选脚本")
+    classes.add_argument("--match", default=SCRIPT_PATTERN)
+    for p in (sprites, classes):
+        p.add_argument("--limit", type=int, default=20, help="最多列出多少条，0 表示全部")
+    args = parser.parse_args()
+
+    catalog = SwfCatalog(args.db)
+    start = time.perf_counter()
+    if args.command == "index":
+        count = catalog.index_tree(args.directory)
+        print(f"已收录 {count} 个SWF，耗时 {time.perf_counter() - start:.2f}秒 喵~")
+    else:
+        if args.command == "sprites":
+            rows = catalog.select_sprites(args.min_len, args.min_frames)
+        else:
+            rows = catalog.select_classes(args.match)
+        for row in rows[:args.limit or None]:
+            print("\t".join(str(v) for v in row))
+        files = len({row[0] for row in rows})
+        print(f"共 {len(rows)} 条，涉及 {files} 个SWF，查询耗时 {(time.perf_counter() - start) * 1000:.0f}ms 喵~")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
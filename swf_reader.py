@@ -0,0 +1,252 @@
+"""
+纯 Python 的 SWF 读取工具喵~
+支持 FWS/CWS(zlib)/ZWS(LZMA) 三种格式，边解压边解析标签，不需要启动 JVM。
+extract_binary_data 用来直接把 versiondata SWF 里的 DefineBinaryData 写成 XML 清单喵~
+"""
+
+import logging
+import lzma
+import os
+import re
+import struct
+import sys
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+TAG_END = 0
+TAG_SHOW_FRAME = 1
+TAG_DEFINE_SPRITE = 39
+TAG_DEFINE_BINARY_DATA = 87
+
+CHUNK_SIZE = 64 * 1024
+RELEASE_DATE_RE = re.compile(rb'releaseDate="([^"]+)"')
+
+
+class SwfFormatError(Exception):
+    """SWF 文件格式错误喵~"""
+
+
+class _BodyStream:
+    def __init__(self, fileobj: BinaryIO, signature: bytes):
+        """SWF 头部之后的(解压后)数据流喵~"""
+        self._file = fileobj
+        self._buffer = bytearray()
+        self._eof = False
+        self.position = 8  # 与未压缩 SWF 中的偏移一致
+        try:
+            self._seekable = fileobj.seekable()
+        except (AttributeError, OSError):
+            self._seekable = False
+        if signature == b"FWS":
+            self._decompressor = None
+        elif signature == b"CWS":
+            self._decompressor = zlib.decompressobj()
+        elif signature == b"ZWS":
+            # ZWS: UI32 压缩长度 + 5 字节 LZMA 属性 + 不带结束标记的 LZMA 数据
+            extra = fileobj.read(9)
+            if len(extra) != 9:
+                raise SwfFormatError("LZMA 头部不完整")
+            props = extra[4]
+            dict_size = struct.unpack("<I", extra[5:9])[0]
+            lc = props % 9
+            lp = (props // 9) % 5
+            pb = props // 45
+            self._decompressor = lzma.LZMADecompressor(
+                format=lzma.FORMAT_RAW,
+                filters=[{"id": lzma.FILTER_LZMA1, "dict_size": dict_size, "lc": lc, "lp": lp, "pb": pb}],
+            )
+        else:
+            raise SwfFormatError(f"未知的 SWF 签名: {signature!r}")
+
+    def _fill(self, size: int):
+        while len(self._buffer) < size and not self._eof:
+            raw = self._file.read(CHUNK_SIZE)
+            if not raw:
+                self._eof = True
+                if self._decompressor is not None and hasattr(self._decompressor, "flush"):
+                    self._buffer += self._decompressor.flush()
+                break
+            self._buffer += self._decompressor.decompress(raw) if self._decompressor else raw
+
+    def read(self, size: int) -> bytes:
+        """读取 size 字节，数据不足时返回实际读到的部分喵~"""
+        self._fill(size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.position += len(data)
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise SwfFormatError("SWF 数据提前结束")
+        return data
+
+    def read_all(self) -> bytes:
+        """读取剩下的全部数据喵~"""
+        self._fill(sys.maxsize)
+        return self.read(len(self._buffer))
+
+    def skip(self, size: int):
+        if self._decompressor is None and self._seekable:
+            # 未压缩的文件直接 seek 过去，不读标签内容；截断会在读下一个标签头时发现
+            buffered = min(size, len(self._buffer))
+            del self._buffer[:buffered]
+            self._file.seek(size - buffered, os.SEEK_CUR)
+            self.position += size
+            return
+        while size > 0:
+            step = min(size, CHUNK_SIZE)
+            self.read_exact(step)
+            size -= step
+
+
+def rect_size(first: int) -> int:
+    """RECT 的字节数：前5位是每个字段的位数，共 5 + 4*nbits 位，按字节对齐喵~"""
+    return (5 + 4 * (first >> 3) + 7) // 8
+
+
+def split_tag_header(code_and_length: int) -> Tuple[int, int]:
+    """RECORDHEADER 的前两个字节拆成 (标签类型, 短长度)，短长度为 0x3F 时后面还有 UI32 长度喵~"""
+    return code_and_length >> 6, code_and_length & 0x3F
+
+
+def iter_tags_in(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """遍历内存中 [start, end) 范围内的标签，产出 (标签类型, 内容偏移, 长度)，遇到 End 或数据截断时停止喵~
+
+    DefineSprite 内的标签和已经整个读进内存的 SWF 都用它遍历喵~
+    """
+    pos = start
+    while pos + 2 <= end:
+        code, length = split_tag_header(struct.unpack_from("<H", data, pos)[0])
+        pos += 2
+        if length == 0x3F:
+            if pos + 4 > end:
+                return
+            length = struct.unpack_from("<I", data, pos)[0]
+            pos += 4
+        if code == TAG_END:
+            return
+        yield code, pos, length
+        pos += length
+
+
+class SwfReader:
+    def __init__(self, fileobj: BinaryIO):
+        """解析 SWF 头部，之后可以用 iter_tags 逐个读取标签喵~"""
+        header = fileobj.read(8)
+        if len(header) != 8:
+            raise SwfFormatError("文件太短，不是 SWF")
+        self.signature = header[:3]
+        self.version = header[3]
+        self.file_length = struct.unpack("<I", header[4:8])[0]
+        self.stream = _BodyStream(fileobj, self.signature)
+        first = self.stream.read_exact(1)
+        rect = first + self.stream.read_exact(rect_size(first[0]) - 1)
+        frames = self.stream.read_exact(4)
+        self.frame_rate, self.frame_count = struct.unpack("<HH", frames)
+        # 按未压缩格式重新拼出的文件头，read_all 用
+        self._head = b"FWS" + header[3:8] + rect + frames
+        self._pending = 0
+
+    @staticmethod
+    def read_tag_header(stream) -> Tuple[int, int]:
+        """读取 RECORDHEADER，返回 (标签类型, 长度) 喵~"""
+        code, length = split_tag_header(struct.unpack("<H", stream.read_exact(2))[0])
+        if length == 0x3F:
+            length = struct.unpack("<I", stream.read_exact(4))[0]
+        return code, length
+
+    def read_all(self) -> bytes:
+        """解压整个文件，返回以 FWS 开头的完整数据；只能在读取标签之前调用喵~
+
+        标签之间需要随机访问的场景(sprite 摘要、ABC 类名)用它一次读进内存，
+        再用 iter_tags_in 遍历喵~
+        """
+        return self._head + self.stream.read_all()
+
+    def iter_tags(self) -> Iterator[Tuple[int, int]]:
+        """逐个产出 (标签类型, 长度)喵~
+
+        调用方可以在下一次迭代前用 read_body/stream_body 读取标签内容，
+        没读完的部分会被自动跳过喵~
+        """
+        while True:
+            if self._pending:
+                self.stream.skip(self._pending)
+                self._pending = 0
+            try:
+                code, length = self.read_tag_header(self.stream)
+            except SwfFormatError:
+                return
+            if code == TAG_END:
+                return
+            self._pending = length
+            yield code, length
+
+    def read_body(self, size: Optional[int] = None) -> bytes:
+        """读取当前标签剩余内容(或其中 size 字节)喵~"""
+        size = self._pending if size is None else min(size, self._pending)
+        data = self.stream.read_exact(size)
+        self._pending -= size
+        return data
+
+    def stream_body(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """分块读取当前标签剩余内容喵~"""
+        while self._pending:
+            yield self.read_body(min(chunk_size, self._pending))
+
+    def iter_tag_bodies(self) -> Iterator[Tuple[int, bytes]]:
+        """逐个产出 (标签类型, 完整内容)喵~"""
+        for code, _ in self.iter_tags():
+            yield code, self.read_body()
+
+
+def open_swf(path: str) -> Tuple[BinaryIO, SwfReader]:
+    f = open(path, "rb")
+    try:
+        return f, SwfReader(f)
+    except Exception:
+        f.close()
+        raise
+
+
+def unique_path(directory: str, name: str, ext: str) -> str:
+    """目录中不冲突的文件名: name.ext, name_1.ext, ...喵~"""
+    path = os.path.join(directory, f"{name}{ext}")
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{name}_{counter}{ext}")
+        counter += 1
+    return path
+
+
+def extract_binary_data(swf_path: str, output_dir: str) -> List[str]:
+    """把 SWF 中所有 DefineBinaryData 直接写成 XML 文件喵~
+
+    文件名取自数据开头的 releaseDate(只读取前 64KB 判断)，没有时用 binaryData_<id>.xml，
+    返回写出的文件路径列表喵~
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    f, reader = open_swf(swf_path)
+    with f:
+        for code, length in reader.iter_tags():
+            if code != TAG_DEFINE_BINARY_DATA or length < 6:
+                continue
+            tag_id = struct.unpack("<H", reader.read_body(2))[0]
+            reader.read_body(4)  # 保留字段
+            head = reader.read_body(CHUNK_SIZE)
+            match = RELEASE_DATE_RE.search(head)
+            if match:
+                name = match.group(1).decode("utf-8", "replace").replace("-", "")
+            else:
+                name = f"binaryData_{tag_id}"
+            out_path = unique_path(output_dir, name, ".xml")
+            with open(out_path, "wb") as out:
+                out.write(head)
+                for chunk in reader.stream_body():
+                    out.write(chunk)
+            logging.info(f"已提取 binaryData {tag_id} -> {os.path.basename(out_path)} 喵~")
+            written.append(out_path)
+    return written
@@ -0,0 +1,502 @@
+"""
+SWF 标签的快速扫描喵~
+不启动 FFDec，用 swf_reader 流式解压并读取标签头(FWS 未压缩 / CWS zlib / ZWS LZMA)，
+只读标签类型和长度，跳过标签内容，用于估计导出成本等场景。
+另外可以读出 DefineSprite 的 id 和帧数，以及 DoABC 中定义的类名(与 FFDec -dumpAS3 的写法一致)，
+并为每个 sprite 和类计算内容摘要，用于判断新版本中哪些 sprite/类真的变了，
+以及不同SWF中哪些 sprite 其实是同一份内容。
+"""
+
+import hashlib
+import logging
+import lzma
+import struct
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import swf_reader
+from swf_reader import TAG_DEFINE_SPRITE, SwfFormatError
+TAG_DO_ABC_LEGACY = 72
+TAG_DO_ABC = 82
+TAG_JPEG_TABLES = 8
+TAG_DEFINE_BITS = 6  # 与 JPEGTables 共用编码表
+TAG_PLACE_OBJECT = 4
+TAG_REMOVE_OBJECT = 5
+TAG_PLACE_OBJECT2 = 26
+TAG_PLACE_OBJECT3 = 70
+
+# 内容以 u16 字符 id 开头的定义标签
+BITMAP_TAGS = {6, 20, 21, 35, 36, 90}
+SHAPE_TAGS = {2, 22, 32, 83, 46, 84}  # 含 DefineMorphShape，填充样式里可能引用位图
+MORPH_SHAPE_TAGS = {46, 84}
+# DefineShape/2/3/4 → 形状版本，决定颜色是否带 alpha、样式数能否超过255等
+SHAPE_VERSIONS = {2: 1, 22: 2, 32: 3, 83: 4}
+TEXT_TAGS = {11, 33, 37}  # 文本里引用字体
+FONT_TAGS = {10, 48, 75, 91}
+BUTTON_TAGS = {7, 34}
+CHARACTER_TAGS = BITMAP_TAGS | SHAPE_TAGS | TEXT_TAGS | FONT_TAGS | BUTTON_TAGS | {14, 39, 60, 87}
+# 附加到某个字符上的标签(DefineFontInfo、DefineScalingGrid 等)，内容同样以字符 id 开头
+ATTACHMENT_TAGS = {13, 17, 23, 62, 73, 78, 88}
+# 与 FFDecExporter.has_valid_sprite 一致：长度不超过它的 sprite 不导出
+SPRITE_MIN_LEN = 200
+
+
+class SwfTag(NamedTuple):
+    code: int
+    offset: int  # 标签内容在解压后文件中的偏移
+    length: int  # 标签内容长度(不含标签头)
+
+
+class SwfSummary(NamedTuple):
+    version: int
+    file_length: int  # 解压后的长度
+    tag_count: int
+    sprite_count: int  # 会被导出的 sprite 数(长度超过 SPRITE_MIN_LEN)
+    sprite_bytes: int
+
+
+def read_swf(path: str) -> Optional[bytes]:
+    """读取并解压SWF(由 swf_reader 流式解压)，返回以 FWS 开头的完整数据；不是SWF时返回 None 喵~"""
+    try:
+        f, reader = swf_reader.open_swf(path)
+    except SwfFormatError:
+        return None
+    with f:
+        return reader.read_all()
+
+
+def iter_tags(data: bytes, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[SwfTag]:
+    """遍历顶层标签(或 DefineSprite 内的标签)，遇到 End 或数据截断时停止喵~"""
+    if start is None:
+        # 跳过 RECT、帧率和帧数
+        start = 8 + swf_reader.rect_size(data[8]) + 4
+    for code, offset, length in swf_reader.iter_tags_in(data, start, len(data) if end is None else end):
+        yield SwfTag(code, offset, length)
+
+
+def sprite_header(data: bytes, tag: SwfTag) -> Tuple[int, int]:
+    """DefineSprite 内容的开头是 sprite id 和帧数喵~"""
+    return struct.unpack_from("<HH", data, tag.offset)
+
+
+class _AbcReader:
+    def __init__(self, data: bytes, pos: int):
+        self.data = data
+        self.pos = pos
+
+    def u8(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def u30(self) -> int:
+        """变长整数，每字节7位，最多5字节(s32/u32 也用同样的编码)喵~"""
+        result = shift = 0
+        for _ in range(5):
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        return result
+
+    def skip_u30(self, count: int):
+        for _ in range(count):
+            self.u30()
+
+
+def abc_class_names(data: bytes, start: int, end: int) -> List[str]:
+    """解析一段 ABC 字节码，返回其中定义的类的完整类名(包名.类名)喵~
+
+    只读到 instance_info 的类名为止：常量池、方法签名和元数据按格式跳过喵~
+    """
+    r = _AbcReader(data, start + 4)  # minor_version, major_version
+    r.skip_u30(max(0, r.u30() - 1))  # int
+    r.skip_u30(max(0, r.u30() - 1))  # uint
+    double_count = max(0, r.u30() - 1)
+    r.pos += 8 * double_count  # double
+    strings = [""]
+    for _ in range(max(0, r.u30() - 1)):
+        size = r.u30()
+        strings.append(data[r.pos:r.pos + size].decode("utf-8", "replace"))
+        r.pos += size
+    namespaces = [0]
+    for _ in range(max(0, r.u30() - 1)):
+        r.u8()
+        namespaces.append(r.u30())
+    for _ in range(max(0, r.u30() - 1)):  # ns_set
+        r.skip_u30(r.u30())
+    multinames = [None]
+    for _ in range(max(0, r.u30() - 1)):
+        kind = r.u8()
+        if kind in (0x07, 0x0D):  # QName
+            multinames.append((r.u30(), r.u30()))
+            continue
+        if kind in (0x0F, 0x10, 0x09, 0x0E):  # RTQName / Multiname
+            r.skip_u30(1 if kind in (0x0F, 0x10) else 2)
+        elif kind in (0x1B, 0x1C):  # MultinameL
+            r.u30()
+        elif kind == 0x1D:  # TypeName
+            r.u30()
+            r.skip_u30(r.u30())
+        elif kind not in (0x11, 0x12):  # RTQNameL 没有内容
+            raise ValueError(f"未知的 multiname 类型 0x{kind:02x}")
+        multinames.append(None)
+    for _ in range(r.u30()):  # method_info
+        param_count = r.u30()
+        r.skip_u30(1 + param_count + 1)  # return_type, param_types, name
+        flags = r.u8()
+        if flags & 0x08:  # HAS_OPTIONAL
+            for _ in range(r.u30()):
+                r.u30()
+                r.u8()
+        if flags & 0x80:  # HAS_PARAM_NAMES
+            r.skip_u30(param_count)
+    for _ in range(r.u30()):  # metadata_info
+        r.u30()
+        r.skip_u30(2 * r.u30())
+
+    names = []
+    for _ in range(r.u30()):  # instance_info
+        name = multinames[r.u30()]
+        r.u30()  # super_name
+        if r.u8() & 0x08:  # CONSTANT_ClassProtectedNs
+            r.u30()
+        r.skip_u30(r.u30())  # interfaces
+        r.u30()  # iinit
+        for _ in range(r.u30()):  # traits
+            r.u30()
+            kind = r.u8()
+            if (kind & 0x0F) in (0, 6):  # Slot / Const
+                r.skip_u30(2)
+                if r.u30():
+                    r.u8()
+            else:
+                r.skip_u30(2)
+            if (kind >> 4) & 0x04:  # ATTR_Metadata
+                r.skip_u30(r.u30())
+        if name:
+            package, class_name = strings[namespaces[name[0]]], strings[name[1]]
+            names.append(f"{package}.{class_name}" if package else class_name)
+    if r.pos > end:
+        raise ValueError("ABC 数据越过了标签末尾")
+    return names
+
+
+def abc_blocks(data: bytes) -> Iterator[Tuple[SwfTag, int]]:
+    """所有 DoABC 标签及其中 ABC 数据的起始偏移喵~"""
+    for tag in iter_tags(data):
+        if tag.code == TAG_DO_ABC:
+            # flags(4字节) + 以 \0 结尾的名字，之后才是 ABC
+            yield tag, data.index(b"\0", tag.offset + 4) + 1
+        elif tag.code == TAG_DO_ABC_LEGACY:
+            yield tag, tag.offset
+
+
+def class_names(data: bytes) -> List[str]:
+    """SWF 中所有 DoABC 标签定义的类名喵~"""
+    names = []
+    for tag, start in abc_blocks(data):
+        names.extend(abc_class_names(data, start, tag.offset + tag.length))
+    return names
+
+
+def placement_refs(data: bytes, tag: SwfTag) -> Iterator[Tuple[int, int]]:
+    """PlaceObject/PlaceObject2/PlaceObject3/RemoveObject 引用的字符：(u16 id 的偏移, id) 喵~"""
+    pos = tag.offset
+    if tag.code in (TAG_PLACE_OBJECT, TAG_REMOVE_OBJECT):
+        yield pos, struct.unpack_from("<H", data, pos)[0]
+    elif tag.code == TAG_PLACE_OBJECT2:
+        if data[pos] & 0x02:  # HasCharacter
+            yield pos + 3, struct.unpack_from("<H", data, pos + 3)[0]
+    elif tag.code == TAG_PLACE_OBJECT3:
+        flags, flags2 = data[pos], data[pos + 1]
+        pos += 4
+        if flags2 & 0x08 or (flags2 & 0x10 and flags & 0x02):  # 带类名
+            pos = data.index(b"\0", pos) + 1
+        if flags & 0x02:
+            yield pos, struct.unpack_from("<H", data, pos)[0]
+
+
+class _BitReader:
+    def __init__(self, data: bytes, pos: int):
+        """SWF 的位字段按高位在前紧密排列，RECT、MATRIX 和形状记录都要按位读喵~"""
+        self.data = data
+        self.pos = pos
+        self.bit = 0
+
+    def ub(self, nbits: int) -> int:
+        value = 0
+        while nbits:
+            take = min(nbits, 8 - self.bit)
+            byte = self.data[self.pos]
+            value = (value << take) | ((byte >> (8 - self.bit - take)) & ((1 << take) - 1))
+            nbits -= take
+            self.bit += take
+            if self.bit == 8:
+                self.bit = 0
+                self.pos += 1
+        return value
+
+    def skip_bits(self, nbits: int):
+        total = self.bit + nbits
+        self.pos += total // 8
+        self.bit = total % 8
+
+    def align(self):
+        if self.bit:
+            self.bit = 0
+            self.pos += 1
+
+    def u8(self) -> int:
+        self.align()
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def u16(self) -> int:
+        self.align()
+        value = struct.unpack_from("<H", self.data, self.pos)[0]
+        self.pos += 2
+        return value
+
+    def skip(self, nbytes: int):
+        self.align()
+        self.pos += nbytes
+
+    def rect(self):
+        self.skip_bits(4 * self.ub(5))
+        self.align()
+
+    def matrix(self):
+        if self.ub(1):  # HasScale
+            self.skip_bits(2 * self.ub(5))
+        if self.ub(1):  # HasRotate
+            self.skip_bits(2 * self.ub(5))
+        self.skip_bits(2 * self.ub(5))
+        self.align()
+
+
+def shape_bitmap_refs(data: bytes, tag: SwfTag) -> List[Tuple[int, int]]:
+    """DefineShape/2/3/4 的填充样式(包括形状记录中途换的样式和 LINESTYLE2 的填充)引用的位图：(u16 id 的偏移, id) 喵~
+
+    格式不对时抛 ValueError/IndexError/struct.error 喵~
+    """
+    version = SHAPE_VERSIONS[tag.code]
+    r = _BitReader(data, tag.offset + 2)
+    refs = []
+    r.rect()
+    if version == 4:
+        r.rect()  # EdgeBounds
+        r.skip(1)
+    color = 4 if version >= 3 else 3
+
+    def fill_style():
+        kind = r.u8()
+        if kind == 0x00:
+            r.skip(color)
+        elif kind in (0x10, 0x12, 0x13):  # 线性/径向/焦点渐变
+            r.matrix()
+            r.skip_bits(4)
+            r.skip(r.ub(4) * (1 + color))
+            if kind == 0x13:
+                r.skip(2)
+        elif 0x40 <= kind <= 0x43:
+            pos, chid = r.pos, r.u16()
+            if chid != 0xFFFF:
+                refs.append((pos, chid))
+            r.matrix()
+        else:
+            raise ValueError(f"未知的填充样式 {kind:#x}")
+
+    def style_count() -> int:
+        count = r.u8()
+        return r.u16() if count == 0xFF and version >= 2 else count
+
+    def styles():
+        for _ in range(style_count()):
+            fill_style()
+        for _ in range(style_count()):
+            if version < 4:
+                r.skip(2 + color)
+                continue
+            r.skip(2)  # Width
+            r.skip_bits(2)  # StartCapStyle
+            join, has_fill = r.ub(2), r.ub(1)
+            r.skip_bits(11)
+            if join == 2:
+                r.skip(2)  # MiterLimitFactor
+            if has_fill:
+                fill_style()
+            else:
+                r.skip(4)
+
+    styles()
+    fill_bits, line_bits = r.ub(4), r.ub(4)
+    while True:
+        if r.ub(1):  # 边记录
+            straight, nbits = r.ub(1), r.ub(4) + 2
+            if not straight:
+                r.skip_bits(4 * nbits)
+            elif r.ub(1):  # GeneralLineFlag
+                r.skip_bits(2 * nbits)
+            else:
+                r.skip_bits(1 + nbits)
+            continue
+        flags = r.ub(5)
+        if not flags:  # EndShapeRecord
+            break
+        if flags & 0x01:  # MoveTo
+            r.skip_bits(2 * r.ub(5))
+        r.skip_bits(fill_bits * (((flags >> 1) & 1) + ((flags >> 2) & 1)) + line_bits * ((flags >> 3) & 1))
+        if flags & 0x10 and version >= 2:  # NewStyles
+            styles()
+            fill_bits, line_bits = r.ub(4), r.ub(4)
+    if r.pos > tag.offset + tag.length:
+        raise ValueError("形状数据越过了标签末尾")
+    return refs
+
+
+def character_refs(data: bytes, tag: SwfTag) -> List[Tuple[int, int]]:
+    """字符标签中引用其他字符的位置：sprite 放置的字符、形状填充用的位图喵~"""
+    if tag.code == TAG_DEFINE_SPRITE:
+        refs = []
+        for inner in iter_tags(data, tag.offset + 4, tag.offset + tag.length):
+            refs.extend(placement_refs(data, inner))
+        return refs
+    if tag.code in SHAPE_VERSIONS:
+        return shape_bitmap_refs(data, tag)
+    return []
+
+
+def sprite_digests(data: bytes) -> Dict[int, str]:
+    """每个 DefineSprite 的归一化内容摘要：sprite 本身加上它(递归)引用的所有字符喵~
+
+    字符 id 按从 sprite 出发的遍历顺序重新编号后再哈希，所以同一个 sprite 被打包进
+    不同的SWF、分到不同的 id 时摘要仍然相同，可以跨文件去重。形状的位图填充会解析出来，
+    只算真正用到的位图；变形形状、文本和按钮没有细拆，保守处理：依赖里有变形形状或解析失败的
+    形状时把文件中所有位图算进摘要，有文本时算进所有字体，有按钮时算进整个文件，
+    宁可多导出也不漏掉变化喵~
+    """
+    tags = list(iter_tags(data))
+    characters: Dict[int, SwfTag] = {}
+    attachments: Dict[int, List[SwfTag]] = {}
+    for tag in tags:
+        if tag.length < 2:
+            continue
+        if tag.code in CHARACTER_TAGS:
+            characters[struct.unpack_from("<H", data, tag.offset)[0]] = tag
+        elif tag.code in ATTACHMENT_TAGS:
+            attachments.setdefault(struct.unpack_from("<H", data, tag.offset)[0], []).append(tag)
+
+    shared: Dict[str, str] = {}
+
+    def shared_digest(kind: str, codes) -> str:
+        if kind not in shared:
+            digest = hashlib.sha1()
+            for tag in tags:
+                if tag.code in codes:
+                    digest.update(struct.pack("<HI", tag.code, tag.length))
+                    digest.update(data[tag.offset:tag.offset + tag.length])
+            shared[kind] = digest.hexdigest()
+        return shared[kind]
+
+    refs_cache: Dict[int, Optional[List[Tuple[int, int]]]] = {}
+
+    def refs_of(chid: int) -> Optional[List[Tuple[int, int]]]:
+        if chid not in refs_cache:
+            try:
+                refs_cache[chid] = character_refs(data, characters[chid])
+            except (ValueError, IndexError, struct.error):
+                refs_cache[chid] = None
+        return refs_cache[chid]
+
+    # 不引用其他字符的标签(位图、字体等)去掉开头的 id 后只哈希一次，多个 sprite 共用
+    leaf_digests: Dict[SwfTag, bytes] = {}
+
+    def tag_digest(tag: SwfTag, index: Dict[int, int], refs) -> bytes:
+        if not refs:
+            if tag not in leaf_digests:
+                leaf_digests[tag] = hashlib.sha1(data[tag.offset + 2:tag.offset + tag.length]).digest()
+            return leaf_digests[tag]
+        body = bytearray(data[tag.offset + 2:tag.offset + tag.length])
+        for pos, ref in refs:
+            struct.pack_into("<H", body, pos - tag.offset - 2, index.get(ref, 0xFFFF))
+        return hashlib.sha1(body).digest()
+
+    result = {}
+    for chid, sprite in characters.items():
+        if sprite.code != TAG_DEFINE_SPRITE:
+            continue
+        order, index, needs = [chid], {chid: 0}, set()
+        for current in order:
+            tag = characters[current]
+            refs = refs_of(current)
+            if refs is None:
+                needs.add("bitmaps" if tag.code in SHAPE_TAGS else "file")
+                continue
+            for _, ref in refs:
+                if ref not in index and ref in characters:
+                    index[ref] = len(order)
+                    order.append(ref)
+            if tag.code in MORPH_SHAPE_TAGS:
+                needs.add("bitmaps")
+            elif tag.code == TAG_DEFINE_BITS:
+                needs.add("jpeg_tables")
+            elif tag.code in TEXT_TAGS:
+                needs.add("fonts")
+            elif tag.code in BUTTON_TAGS:
+                needs.add("file")
+        digest = hashlib.sha1()
+        for position, current in enumerate(order):
+            for tag in [characters[current], *attachments.get(current, ())]:
+                refs = refs_of(current) if tag is characters[current] else None
+                digest.update(struct.pack("<HIH", tag.code, tag.length, position))
+                digest.update(tag_digest(tag, index, refs))
+        if "bitmaps" in needs:
+            digest.update(shared_digest("bitmaps", BITMAP_TAGS | {TAG_JPEG_TABLES}).encode())
+        elif "jpeg_tables" in needs:
+            digest.update(shared_digest("jpeg_tables", {TAG_JPEG_TABLES}).encode())
+        if "fonts" in needs:
+            digest.update(shared_digest("fonts", FONT_TAGS | {13, 62, 73, 88}).encode())
+        if "file" in needs:
+            digest.update(hashlib.sha1(data).hexdigest().encode())
+        result[chid] = digest.hexdigest()
+    return result
+
+
+def class_digests(data: bytes) -> Dict[str, str]:
+    """每个类的内容摘要，由其所在 DoABC 标签的内容和类名得出喵~
+
+    单个类的方法体通过下标引用共享的常量池，只哈希类自己的字节会漏掉常量的变化，
+    所以同一个 DoABC 里任何改动都视为其中所有类都变了；类名也算进摘要，
+    同一个 DoABC 中的不同类不会被当成同一份内容喵~
+    """
+    result = {}
+    for tag, start in abc_blocks(data):
+        block = hashlib.sha1(data[tag.offset:tag.offset + tag.length]).digest()
+        for name in abc_class_names(data, start, tag.offset + tag.length):
+            result[name] = hashlib.sha1(block + name.encode("utf-8")).hexdigest()
+    return result
+
+
+def summarize(path: str) -> Optional[SwfSummary]:
+    """流式扫描SWF的标签头，统计标签数和需要导出的 sprite；无法解析时返回 None 喵~
+
+    标签内容直接跳过(未压缩的文件 seek 过去，压缩的边解压边丢弃)，不把整个文件读进内存，
+    读到 End 标签就停止喵~
+    """
+    try:
+        f, reader = swf_reader.open_swf(path)
+        with f:
+            tag_count = sprite_count = sprite_bytes = 0
+            for code, length in reader.iter_tags():
+                tag_count += 1
+                if code == TAG_DEFINE_SPRITE and length > SPRITE_MIN_LEN:
+                    sprite_count += 1
+                    sprite_bytes += length
+            return SwfSummary(reader.version, reader.file_length, tag_count, sprite_count, sprite_bytes)
+    except (OSError, SwfFormatError, zlib.error, lzma.LZMAError, struct.error) as e:
+        logging.debug(f"扫描SWF失败 {path}: {e}")
+        return None
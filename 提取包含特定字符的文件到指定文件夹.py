@@ -1,24 +1,39 @@
 import os
 import shutil
 
-def find_and_copy_files(source_dir, target_dir, search_string):
+from content_index import ContentIndex
+from file_index import FileIndex
+from output_archive import INDEX_SUFFIX, ExportArchive, read_output, split_member_path
+import process_pool
+
+def find_and_copy_files(source_dir, target_dir, search_string, file_index=None):
     """
     查找source_dir及其子文件夹下所有包含search_string的文件，
     并将它们复制到target_dir中。
-    
+    归档模式导出的 exported.zip 直接按它的偏移索引查找成员文件名，不用解压喵~
+    给出 file_index 时从文件名索引查找，source_dir 还没收录过的先整体收录一次喵~
+
     :param source_dir: 要搜索的源文件夹路径
     :param target_dir: 目标文件夹路径，找到的文件将被复制到这里
     :param search_string: 用以匹配文件名的字符串
+    :param file_index: file_index.FileIndex，为 None 时遍历目录
     """
     if not os.path.exists(target_dir):
         os.makedirs(target_dir)
 
+    if file_index is not None:
+        copy_from_index(file_index, source_dir, target_dir, search_string)
+        return
+
     for root, dirs, files in os.walk(source_dir):
         for file in files:
+            if file.endswith(".zip") and file + INDEX_SUFFIX in files:
+                copy_from_archive(os.path.join(root, file), target_dir, search_string)
+                continue
             if search_string in file:
                 src_file_path = os.path.join(root, file)
                 tgt_file_path = os.path.join(target_dir, file)
-                
+
                 # 如果目标文件夹中已经有同名文件，则跳过或可以选择覆盖
                 if not os.path.exists(tgt_file_path):
                     shutil.copy2(src_file_path, tgt_file_path)  # copy2 保留元数据
@@ -26,10 +41,88 @@ def find_and_copy_files(source_dir, target_dir, search_string):
                 else:
                     print(f"File {tgt_file_path} already exists. Skipping.")
 
+def copy_from_index(file_index, source_dir, target_dir, search_string):
+    """按文件名索引查找并复制；索引里已经不存在的文件顺手移除喵~"""
+    if not file_index.covers(source_dir):
+        print(f"首次收录 {source_dir} 到文件名索引……")
+        file_index.index_tree(source_dir)
+    missing = copy_paths(file_index.search(search_string, under=source_dir), target_dir)
+    if missing:
+        file_index.remove(missing)
+        print(f"{len(missing)} 个文件已经不存在，已从索引中移除")
+
+def find_and_copy_by_content(source_dir, target_dir, patterns, content_index):
+    """
+    按内容查找source_dir下包含patterns中任一关键词的 .as 脚本，列出匹配的行，
+    并将这些脚本复制到target_dir中。source_dir 还没收录过的先整体收录一次喵~
+
+    :param patterns: 关键词列表，一次查找全部
+    :param content_index: content_index.ContentIndex
+    """
+    if not os.path.exists(target_dir):
+        os.makedirs(target_dir)
+    if not content_index.covers(source_dir):
+        print(f"首次收录 {source_dir} 中的脚本到内容索引……")
+        content_index.index_tree(source_dir)
+    matches = content_index.search(patterns, under=source_dir)
+    for match in matches:
+        print(f"{match.path}:{match.line}: [{match.pattern}] {match.text}")
+    missing = copy_paths(list(dict.fromkeys(match.path for match in matches)), target_dir)
+    if missing:
+        content_index.remove(missing)
+        print(f"{len(missing)} 个文件已经不存在，已从索引中移除")
+
+def copy_paths(paths, target_dir):
+    """把索引查到的文件(可以是归档成员)复制到target_dir，返回已经不存在的路径喵~"""
+    missing = []
+    for path in paths:
+        archived = split_member_path(path)
+        file = archived[1].rsplit("/", 1)[-1] if archived else os.path.basename(path)
+        tgt_file_path = os.path.join(target_dir, file)
+        if os.path.exists(tgt_file_path):
+            print(f"File {tgt_file_path} already exists. Skipping.")
+            continue
+        try:
+            if archived:
+                data = read_output(path)
+                with open(tgt_file_path, "wb") as f:
+                    f.write(data)
+            else:
+                shutil.copy2(path, tgt_file_path)
+        except (OSError, KeyError):
+            missing.append(path)
+            continue
+        print(f"Copied {path} to {tgt_file_path}")
+    return missing
+
+def copy_from_archive(archive_path, target_dir, search_string):
+    """从导出归档中复制文件名包含search_string的成员喵~"""
+    with ExportArchive(archive_path) as archive:
+        for name in archive.names():
+            file = name.rsplit("/", 1)[-1]
+            if search_string not in file:
+                continue
+            tgt_file_path = os.path.join(target_dir, file)
+            if not os.path.exists(tgt_file_path):
+                with open(tgt_file_path, "wb") as f:
+                    f.write(archive.read(name))
+                print(f"Copied {archive_path}!/{name} to {tgt_file_path}")
+            else:
+                print(f"File {tgt_file_path} already exists. Skipping.")
+
 if __name__ == "__main__":
     # 用户需要提供源文件夹、目标文件夹以及搜索字符串
     source_directory = input("源文件夹: ")
     target_directory = input("目标文件夹: ")
-    search_string = input("搜索字符串: ")
+    by_content = input("按内容搜索 .as 脚本? (y/N): ").strip().lower() == "y"
+    search_string = input("搜索关键词(多个用空格分隔): " if by_content else "搜索字符串: ")
 
-    find_and_copy_files(source_directory, target_directory, search_string)
+    if by_content:
+        content_index = ContentIndex()
+        find_and_copy_by_content(source_directory, target_directory, search_string.split(), content_index)
+        content_index.close()
+        process_pool.shutdown_pool()
+    else:
+        file_index = FileIndex()
+        find_and_copy_files(source_directory, target_directory, search_string, file_index)
+        file_index.close()
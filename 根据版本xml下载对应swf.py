@@ -4,17 +4,41 @@ import xml.etree.ElementTree as ET
 from tqdm import tqdm
 import concurrent.futures
 import time
+from typing import List, Optional
 from urllib.parse import urljoin
 
+from asset_store import AssetStore, NegativeCache
+from concurrency import AimdController, HostRateLimiter
+from metrics import LIVE
+from origins import OriginPool
+
 class SwfDownloader:
-    def __init__(self, xml_path: str, save_dir: str):
+    def __init__(self, xml_path: Optional[str], save_dir: str, asset_store: AssetStore = None,
+                 negative_cache: NegativeCache = None, origin_pool: OriginPool = None):
         self.xml_path = xml_path
         self.save_dir = save_dir
-        self.base_url = "http://aola.100bt.com/play/"
+        self.origin_pool = origin_pool or OriginPool()  # 多源站故障切换与对冲请求
+        self.asset_store = asset_store  # 按(n, v)索引的本地仓库，命中时不再下载
+        self.negative_cache = negative_cache  # 已确认404的(n, v)，TTL内不再请求
+        self.base_url = self.origin_pool.primary
         self.failed_downloads = []
         self.retry_attempts = 3  # 重试次数
         self.retry_delay = 2     # 重试间隔(秒)
+        self.rate_limit = 50.0   # 每个主机每秒最多请求数
+        self.rate_burst = 20.0   # 令牌桶容量
+        self.max_concurrency = 64  # 自适应并发上限
+        self.concurrency = AimdController(initial=5, max_limit=self.max_concurrency)
+        self.rate_limiter = HostRateLimiter(self.rate_limit, self.rate_burst)
+        self.on_downloaded = None  # 每个文件落盘后的回调，用于边下载边导出
+        self.metrics = None  # RunMetrics，设置后记录每个请求的延迟和字节数
+        # xml_path 可以稍后用 load 指定(例如流水线中由差异阶段生成)
+        self.swf_urls = self.parse_xml() if xml_path else []
+
+    def load(self, xml_path: str) -> list:
+        """改为下载另一个XML清单中的文件"""
+        self.xml_path = xml_path
         self.swf_urls = self.parse_xml()
+        return self.swf_urls
         
     def parse_xml(self) -> list:
         """解析XML文件获取所有SWF文件路径"""
@@ -27,34 +51,77 @@ class SwfDownloader:
                 if 'n' in elem.attrib:
                     swf_path = elem.attrib['n'] + '.swf'
                     full_url = urljoin(self.base_url, swf_path)
-                    urls.append((full_url, swf_path))
+                    urls.append((full_url, swf_path, elem.attrib.get('v', '')))
                     
             return urls
         except Exception as e:
             print(f"解析XML文件出错: {str(e)}")
             return []
             
+    def fetch(self, url: str):
+        """在限速和自适应并发控制下请求单个URL"""
+        self.rate_limiter.acquire(url)
+        with self.concurrency.slot(), LIVE.tracking("downloads_in_flight"):
+            start = time.monotonic()
+            try:
+                response = requests.get(url, timeout=10)
+            except Exception:
+                latency = time.monotonic() - start
+                self.concurrency.record(latency, 0, None)
+                LIVE.incr("http_requests_total", status="error")
+                if self.metrics:
+                    self.metrics.record("download", "http", latency, bytes=0, status=None, url=url)
+                raise
+            latency = time.monotonic() - start
+            self.concurrency.record(latency, len(response.content), response.status_code)
+            LIVE.incr("http_requests_total", status=response.status_code)
+            LIVE.incr("download_bytes_total", len(response.content))
+            if self.metrics:
+                self.metrics.record("download", "http", latency, bytes=len(response.content),
+                                    status=response.status_code, url=url)
+            return response
+
+    def local_path(self, url_info: tuple) -> str:
+        """SWF文件在本地的保存路径"""
+        return os.path.join(self.save_dir, url_info[1])
+
+    def notify_downloaded(self, url_info: tuple):
+        """文件落盘后立即交给下游(如导出器)"""
+        if self.on_downloaded:
+            self.on_downloaded(self.local_path(url_info))
+
     def download_file(self, url_info: tuple, attempt: int = 1) -> bool:
         """下载单个SWF文件,支持重试"""
-        url, relative_path = url_info
-        save_path = os.path.join(self.save_dir, relative_path)
+        url, relative_path, version = url_info
+        save_path = self.local_path(url_info)
+        asset_name = relative_path[:-len('.swf')]
         
         # 如果文件已存在且大小大于0,跳过下载
         if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
             return True
+
+        # 仓库里已有同一(n, v)的文件,直接链接过来
+        if self.asset_store and version and self.asset_store.link_into(asset_name, version, save_path):
+            return True
             
         try:
-            response = requests.get(url, timeout=10)
+            _, response = self.origin_pool.fetch(relative_path, self.fetch)
             if response.status_code == 200:
                 # 确保目录存在
                 os.makedirs(os.path.dirname(save_path), exist_ok=True)
                 # 写入文件
                 with open(save_path, 'wb') as f:
                     f.write(response.content)
+                if self.asset_store:
+                    self.asset_store.put(asset_name, version, save_path)
+                if self.negative_cache:
+                    self.negative_cache.discard(asset_name, version)
                 return True
             elif response.status_code == 404:
-                # 404错误不重试
+                # 404错误不重试，记入404缓存
                 self.failed_downloads.append((url, f"HTTP 404"))
+                if self.negative_cache:
+                    self.negative_cache.add(asset_name, version)
                 return False
             else:
                 # 其他错误考虑重试
@@ -73,82 +140,117 @@ class SwfDownloader:
                 self.failed_downloads.append((url, f"{str(e)} after {attempt} attempts"))
                 return False
 
+    def pending_urls(self) -> List[tuple]:
+        """需要下载的文件，跳过TTL内确认过404的"""
+        if not self.negative_cache:
+            return list(self.swf_urls)
+        pending = [url_info for url_info in self.swf_urls
+                   if not self.negative_cache.is_missing(url_info[1][:-len('.swf')], url_info[2])]
+        skipped = len(self.swf_urls) - len(pending)
+        if skipped:
+            print(f"跳过 {skipped} 个已知404的文件 (设置 AOLA_RECHECK_MISSING=1 可强制重新检查)")
+        return pending
+
+    def reset_controls(self, max_workers: int = 5):
+        """每轮下载重新开始自适应并发和限速，max_workers 作为初始并发数"""
+        self.concurrency = AimdController(initial=max_workers,
+                                          max_limit=max(self.max_concurrency, max_workers))
+        self.rate_limiter = HostRateLimiter(self.rate_limit, self.rate_burst)
+
+    def download_one(self, url_info: tuple) -> Optional[str]:
+        """下载单个文件，成功返回本地路径，失败返回None(失败原因记入 failed_downloads)"""
+        try:
+            ok = self.download_file(url_info)
+        except Exception as e:
+            self.failed_downloads.append((url_info[0], str(e)))
+            return None
+        return self.local_path(url_info) if ok else None
+
+    def retry_candidates(self) -> List[tuple]:
+        """取出可以重试的失败项(404不重试，但保留在失败记录中，便于写入错误日志)"""
+        url_infos = {url_info[0]: url_info for url_info in self.swf_urls}
+        retry_urls = [url_infos[url] for url, error in self.failed_downloads
+                      if "HTTP 404" not in error and url in url_infos]
+        self.failed_downloads = [(url, error) for url, error in self.failed_downloads
+                                 if "HTTP 404" in error]
+        return retry_urls
+
     def retry_failed_downloads(self):
         """重试下载失败的文件"""
         if not self.failed_downloads:
             return 0, 0
             
         print("\n开始重试下载失败的文件...")
-        retry_urls = []
-        
-        # 筛选出非404错误的URL
-        for url, error in self.failed_downloads:
-            if "HTTP 404" not in error:
-                relative_path = url.replace(self.base_url, '')
-                retry_urls.append((url, relative_path))
-        
+        retry_urls = self.retry_candidates()
         if not retry_urls:
             print("没有需要重试的文件")
             return 0, 0
-            
-        # 清空之前的失败记录
-        self.failed_downloads = []
         
         # 重试下载
         successful = 0
         failed = 0
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(self.download_file, url_info): url_info 
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency.max_limit) as executor:
+            futures = {executor.submit(self.download_one, url_info): url_info 
                       for url_info in retry_urls}
             
             with tqdm(total=len(retry_urls), desc="重试进度") as pbar:
                 for future in concurrent.futures.as_completed(futures):
-                    try:
-                        if future.result():
-                            successful += 1
-                        else:
-                            failed += 1
-                    except Exception as e:
+                    if future.result():
+                        successful += 1
+                        self.notify_downloaded(futures[future])
+                    else:
                         failed += 1
                     pbar.update(1)
                     
         return successful, failed
 
-    def download_all(self, max_workers: int = 5):
-        """批量下载所有SWF文件"""
+    def download_all(self, max_workers: int = 5, on_downloaded=None):
+        """批量下载所有SWF文件
+
+        max_workers 只作为初始并发数，实际并发由 AIMD 控制器根据网络情况调整
+        on_downloaded 会在每个文件落盘后以本地路径调用，便于下游立即处理
+        """
+        if on_downloaded is not None:
+            self.on_downloaded = on_downloaded
         if not self.swf_urls:
             print("没有找到需要下载的文件")
             return 0, 0
+
+        pending_urls = self.pending_urls()
+        if not pending_urls:
+            return 0, 0
             
-        total_files = len(self.swf_urls)
+        total_files = len(pending_urls)
         successful = 0
         failed = 0
         
         print(f"找到 {total_files} 个SWF文件需要下载")
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(self.download_file, url_info): url_info 
-                      for url_info in self.swf_urls}
+        self.reset_controls(max_workers)
+        pool_size = min(self.concurrency.max_limit, total_files)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=pool_size) as executor:
+            futures = {executor.submit(self.download_one, url_info): url_info 
+                      for url_info in pending_urls}
             
             with tqdm(total=total_files, desc="下载进度") as pbar:
                 for future in concurrent.futures.as_completed(futures):
-                    url_info = futures[future]
-                    try:
-                        if future.result():
-                            successful += 1
-                        else:
-                            failed += 1
-                    except Exception as e:
+                    if future.result():
+                        successful += 1
+                        self.notify_downloaded(futures[future])
+                    else:
                         failed += 1
-                        self.failed_downloads.append((url_info[0], str(e)))
                     pbar.update(1)
+                    pbar.set_postfix(并发=self.concurrency.limit)
         
         # 重试失败的下载
         if self.failed_downloads:
             retry_successful, retry_failed = self.retry_failed_downloads()
             successful += retry_successful
-            failed = retry_failed  # 更新最终的失败数
+            failed -= retry_successful  # 更新最终的失败数
+
+        if self.negative_cache:
+            self.negative_cache.save()
             
         return successful, failed
 
@@ -169,7 +271,8 @@ def main():
         workers = int(input("请输入同时下载的数量（建议5-10）: ").strip())
         
         # 创建下载器实例
-        downloader = SwfDownloader(xml_path, save_dir)
+        downloader = SwfDownloader(xml_path, save_dir, asset_store=AssetStore(),
+                                   negative_cache=NegativeCache())
         
         # 开始计时
         start_time = time.time()
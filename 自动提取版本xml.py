@@ -3,45 +3,135 @@ import xml.etree.ElementTree as ET
 import subprocess
 import os
 from tqdm import tqdm
-import re
 import time
+import json
+import random
 import logging
-from typing import Optional, Tuple
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from origins import OriginPool
+from log_setup import setup_logging
+from swf_reader import extract_binary_data, RELEASE_DATE_RE
+
+class PollScheduler:
+    def __init__(self, history_path: str, min_interval: float = 5.0, max_interval: float = 120.0,
+                 cold_max_interval: float = 30.0, backoff: float = 1.5, jitter: float = 0.2):
+        """根据历史更新时间自适应调整轮询间隔喵~
+
+        历史上出现过更新的时段(同一星期几的同一小时，或任意一天的同一小时)及其前后一小时
+        视为发布窗口，窗口内按 min_interval 轮询；窗口外每次未变化就乘以 backoff 退避，
+        最长 max_interval。历史记录不足3条时最长只退避到 cold_max_interval 喵~
+        """
+        self.history_path = history_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cold_max_interval = cold_max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.current = min_interval
+        self.history = []
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                self.history = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取更新历史失败: {e}")
+        self._rebuild()
+
+    def _rebuild(self):
+        self.by_week_hour = Counter()
+        self.by_hour = Counter()
+        for ts in self.history:
+            t = time.localtime(ts)
+            self.by_week_hour[(t.tm_wday, t.tm_hour)] += 1
+            self.by_hour[t.tm_hour] += 1
+
+    def record_release(self, ts: Optional[float] = None):
+        """记录一次检测到更新的时间喵~"""
+        self.history.append(ts or time.time())
+        self.history = self.history[-500:]
+        self._rebuild()
+        self.current = self.min_interval
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            with open(self.history_path, 'w', encoding='utf-8') as f:
+                json.dump(self.history, f)
+        except OSError as e:
+            logging.warning(f"保存更新历史失败: {e}")
+
+    def in_release_window(self, ts: Optional[float] = None) -> bool:
+        """当前是否处于历史发布窗口(前后一小时)喵~"""
+        t = time.localtime(ts or time.time())
+        for delta in (-1, 0, 1):
+            hour = (t.tm_hour + delta) % 24
+            wday = (t.tm_wday + (t.tm_hour + delta) // 24) % 7
+            if self.by_week_hour[(wday, hour)] >= 1 or self.by_hour[hour] >= 2:
+                return True
+        return False
+
+    def next_interval(self) -> float:
+        """本次未检测到变化，计算下一次轮询前的等待时间(带抖动)喵~"""
+        if self.in_release_window():
+            self.current = self.min_interval
+        else:
+            cap = self.max_interval if len(self.history) >= 3 else self.cold_max_interval
+            self.current = min(cap, max(self.min_interval, self.current * self.backoff))
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
 
 class VersionMonitor:
-    def __init__(self):
+    def __init__(self, origin_pool: Optional[OriginPool] = None):
         self.setup_logging()
         self.current_version = None
         self.new_version = None
+        self.ffdec_path = ""
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.origin_pool = origin_pool or OriginPool()
+        self.session = requests.Session()
+        # 每个URL的 ETag/Last-Modified 以及对应的版本号，用于条件请求
+        self.validators: Dict[str, Tuple[Optional[str], Optional[str], str]] = {}
+        self.poll_requests = 0
+        self.not_modified = 0
 
     def setup_logging(self):
         """设置日志喵~"""
-        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"version_monitor_{time.strftime('%Y%m%d_%H%M%S')}.log")
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        setup_logging("version_monitor")
+
+    def conditional_get(self, url: str):
+        """带 If-None-Match/If-Modified-Since 的GET，未变化时服务器返回304且没有body喵~"""
+        headers = {}
+        etag, last_modified, _ = self.validators.get(url, (None, None, None))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = self.session.get(url, headers=headers, timeout=10)
+        response.url_requested = url
+        return response
 
-    def get_version(self) -> Optional[str]:
+    def get_version(self, quiet: bool = False) -> Optional[str]:
         """从start.xml获取版本号喵~"""
         try:
-            logging.info("正在获取版本信息...")
-            url = "http://aola.100bt.com/play/start~1.xml"
-            response = requests.get(url)
+            if not quiet:
+                logging.info("正在获取版本信息...")
+            _, response = self.origin_pool.fetch("start~1.xml", self.conditional_get)
+            self.poll_requests += 1
+            url = response.url_requested
+            if response.status_code == 304 and url in self.validators:
+                # 未变化，不需要解析
+                self.not_modified += 1
+                return self.validators[url][2]
             response.raise_for_status()
             
             root = ET.fromstring(response.content)
             version = root.find('.//v').text
+            self.validators[url] = (response.headers.get('ETag'),
+                                    response.headers.get('Last-Modified'), version)
             
-            logging.info(f"获取到版本号: {version}")
+            if not quiet:
+                logging.info(f"获取到版本号: {version}")
             return version
             
         except Exception as e:
@@ -72,13 +162,33 @@ class VersionMonitor:
             logging.error(f"处理版本 {version} 时出错: {e}")
             return False
 
+    def prepare_version(self, version: str) -> Optional[str]:
+        """下载并解包指定版本到 versions/<版本号>/binary，返回该版本的XML清单路径喵~
+
+        每个版本使用独立目录，持续监控时处理旧版本不会被新下载的文件覆盖喵~
+        """
+        try:
+            version_dir = os.path.join(self.base_dir, "versions", version)
+            binary_dir = os.path.join(version_dir, "binary")
+            os.makedirs(version_dir, exist_ok=True)
+            swf_path = os.path.join(version_dir, f"versiondata_{version}.swf")
+            if not self.download_swf(version, swf_path) or not self.extract_binary(swf_path, binary_dir):
+                return None
+            xml_files = [os.path.join(binary_dir, f) for f in os.listdir(binary_dir) if f.endswith('.xml')]
+            if not xml_files:
+                logging.error(f"版本 {version} 中没有找到XML清单")
+                return None
+            return max(xml_files, key=os.path.getmtime)
+        except Exception as e:
+            logging.error(f"处理版本 {version} 时出错: {e}")
+            return None
+
     def download_swf(self, version: str, save_path: str) -> bool:
         """下载版本SWF文件喵~"""
         try:
             logging.info(f"\n开始下载版本 {version} 的文件...")
-            url = f"http://aola.100bt.com/play/versiondata~{version}.swf"
-            
-            response = requests.get(url, stream=True)
+            _, response = self.origin_pool.fetch(f"versiondata~{version}.swf",
+                                                 lambda url: requests.get(url, stream=True))
             response.raise_for_status()
             
             total_size = int(response.headers.get('content-length', 0))
@@ -102,11 +212,35 @@ class VersionMonitor:
             return False
 
     def extract_binary(self, swf_path: str, output_dir: str) -> bool:
+        """解包SWF文件喵~
+
+        优先在进程内直接读取 DefineBinaryData，失败时再使用FFDec喵~
+        """
+        logging.info("\n开始解包SWF文件...")
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            start = time.perf_counter()
+            written = extract_binary_data(swf_path, output_dir)
+            if written:
+                logging.info(f"解包完成! 用时 {time.perf_counter() - start:.3f} 秒, 文件保存在: {output_dir}")
+                self.remove_swf(swf_path)
+                return True
+            logging.warning("SWF中没有找到binaryData，改用FFDec解包")
+        except Exception as e:
+            logging.warning(f"进程内解包失败，改用FFDec解包: {e}")
+        return self.extract_binary_ffdec(swf_path, output_dir)
+
+    def remove_swf(self, swf_path: str):
+        """解包后自动删除SWF文件喵~"""
+        try:
+            os.remove(swf_path)
+            logging.info("SWF文件已自动删除")
+        except Exception as e:
+            logging.warning(f"删除SWF文件失败: {e}")
+
+    def extract_binary_ffdec(self, swf_path: str, output_dir: str) -> bool:
         """使用FFDec解包SWF文件喵~"""
         try:
-            logging.info("\n开始解包SWF文件...")
-            os.makedirs(output_dir, exist_ok=True)
-            
             # 构建命令
             cmd = [
                 "java",
@@ -125,14 +259,7 @@ class VersionMonitor:
             if result.returncode == 0:
                 logging.info(f"解包完成! 文件保存在: {output_dir}")
                 self.rename_xml_files(output_dir)
-                
-                # 自动删除SWF文件
-                try:
-                    os.remove(swf_path)
-                    logging.info("SWF文件已自动删除")
-                except Exception as e:
-                    logging.warning(f"删除SWF文件失败: {e}")
-                    
+                self.remove_swf(swf_path)
                 return True
             else:
                 logging.error(f"解包失败: {result.stderr}")
@@ -164,19 +291,24 @@ class VersionMonitor:
                         logging.info(f"已重命名: {file} -> {file}.xml")
 
     def get_release_date(self, file_path: str) -> Optional[str]:
-        """从XML文件中获取发布日期喵~"""
+        """从XML文件开头获取发布日期喵~"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                match = re.search(r'releaseDate="([^"]+)"', content)
+            with open(file_path, 'rb') as f:
+                head = f.read(64 * 1024)
+                match = RELEASE_DATE_RE.search(head)
                 if match:
-                    return match.group(1).replace('-', '')
+                    return match.group(1).decode('utf-8', 'replace').replace('-', '')
         except Exception as e:
             logging.error(f"获取发布日期失败: {e}")
         return None
 
     def monitor_version_change(self, interval: int = 5) -> Tuple[Optional[str], Optional[str]]:
-        """监控版本变化并下载两个版本喵~"""
+        """监控版本变化并下载两个版本喵~
+
+        interval 为发布窗口内的最短轮询间隔，窗口外会自动退避喵~
+        """
+        scheduler = PollScheduler(os.path.join(self.base_dir, "cache", "release_history.json"),
+                                  min_interval=interval)
         try:
             # 获取并下载当前版本
             self.current_version = self.get_version()
@@ -192,18 +324,20 @@ class VersionMonitor:
             logging.info(f"开始监控版本变化...")
             
             while True:
-                time.sleep(interval)
-                new_version = self.get_version()
+                time.sleep(scheduler.next_interval())
+                new_version = self.get_version(quiet=True)
                 if new_version:
                     new_prefix = new_version[:8]
                     if new_prefix != current_prefix:
                         logging.info(f"检测到版本变化: {current_prefix} → {new_prefix}")
+                        scheduler.record_release()
                         self.new_version = new_version
                         # 下载新版本
                         if self.download_and_extract(new_version, True):
                             return self.current_version, new_version
                         return None, None
-                    logging.info(f"等待更新中... ({current_prefix})")
+                    logging.info(f"等待更新中... ({current_prefix}) 下次轮询约 {scheduler.current:.0f} 秒后, "
+                                 f"304 命中 {self.not_modified}/{self.poll_requests}")
                     
         except KeyboardInterrupt:
             logging.info("\n监控已停止")
@@ -212,6 +346,43 @@ class VersionMonitor:
             logging.error(f"监控异常: {e}")
             return None, None
 
+    def watch(self, on_change, interval: int = 5, stop_event: Optional[threading.Event] = None):
+        """持续监控版本变化，直到 stop_event 被设置喵~
+
+        每检测到一次变化就调用 on_change(旧版本, 新版本, 旧XML, 新XML)，
+        然后以新版本为基准继续监控；回调应尽快返回(例如只把任务放进队列)喵~
+        """
+        stop_event = stop_event or threading.Event()
+        scheduler = PollScheduler(os.path.join(self.base_dir, "cache", "release_history.json"),
+                                  min_interval=interval)
+        baseline = None
+        while not stop_event.is_set():
+            if baseline is None:
+                version = self.get_version()
+                xml_path = self.prepare_version(version) if version else None
+                if xml_path:
+                    baseline = (version, xml_path)
+                    logging.info(f"当前版本: {version}，开始持续监控...")
+                else:
+                    stop_event.wait(scheduler.next_interval())
+                continue
+
+            stop_event.wait(scheduler.next_interval())
+            if stop_event.is_set():
+                break
+            new_version = self.get_version(quiet=True)
+            if not new_version or new_version[:8] == baseline[0][:8]:
+                continue
+
+            logging.info(f"检测到版本变化: {baseline[0][:8]} → {new_version[:8]}")
+            new_xml = self.prepare_version(new_version)
+            if not new_xml:
+                # 下次轮询时重试
+                continue
+            scheduler.record_release()
+            on_change(baseline[0], new_version, baseline[1], new_xml)
+            baseline = (new_version, new_xml)
+
     def run(self, ffdec_path: str):
         """运行版本监控喵~"""
         self.ffdec_path = ffdec_path